@@ -0,0 +1,421 @@
+"""Durable SQLite storage for agent checkpoints as compact binary deltas.
+
+Each checkpoint of a thread is stored either as a full snapshot or as a delta
+against the checkpoint before it. Deltas record only the keys that changed,
+and lists that grew by appending (such as ``conversation_history``) store just
+the new items, so the cost of a checkpoint tracks the size of the step rather
+than the size of the state. A snapshot is written once the deltas since the
+previous snapshot outweigh it, which keeps replay bounded: loading a
+checkpoint reads the latest snapshot at or before it plus the deltas after.
+
+:mod:`app.agent.saver` adapts this store to LangGraph's checkpointer API.
+"""
+from __future__ import annotations
+
+import pickle
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+SNAPSHOT = 0
+DELTA = 1
+
+# Operations recorded in a delta, applied at a key path into the state.
+_SET = 0
+_DELETE = 1
+_EXTEND = 2
+
+# Payloads shorter than this are stored uncompressed; zlib rarely pays off.
+_COMPRESS_MIN_BYTES = 256
+_RAW = b"\x00"
+_ZLIB = b"\x01"
+
+KeyPath = Tuple[Any, ...]
+
+
+class StoredCheckpoint(NamedTuple):
+    """A checkpoint materialised from the store."""
+
+    thread_id: str
+    namespace: str
+    checkpoint_id: str
+    parent_id: Optional[str]
+    seq: int
+    state: Dict[str, Any]
+    metadata: Dict[str, Any]
+
+
+class StoredWrite(NamedTuple):
+    """A pending write recorded against a checkpoint."""
+
+    task_id: str
+    channel: str
+    value: Any
+
+
+class _Head(NamedTuple):
+    checkpoint_id: str
+    seq: int
+    state: Dict[str, Any]
+    chain: int
+    delta_bytes: int
+    snapshot_bytes: int
+
+
+def encode(value: Any) -> bytes:
+    """Serialise ``value`` to a compact, self-describing binary blob."""
+
+    raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(raw) >= _COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, 1)
+        if len(packed) < len(raw):
+            return _ZLIB + packed
+    return _RAW + raw
+
+
+def decode(blob: bytes) -> Any:
+    blob = bytes(blob)
+    body = blob[1:]
+    return pickle.loads(zlib.decompress(body) if blob[:1] == _ZLIB else body)
+
+
+def _detach(value: Any) -> Any:
+    """Copy the containers ``diff_state`` inspects so later in-place edits are seen.
+
+    Items already inside a list are shared, not copied: appended entries are
+    treated as immutable records, which is what keeps diffs cheap.
+    """
+
+    if isinstance(value, dict):
+        return {key: _detach(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def diff_state(old: Dict[str, Any], new: Dict[str, Any], path: KeyPath = ()) -> List[Tuple[int, KeyPath, Any]]:
+    """Return the operations that turn ``old`` into ``new``.
+
+    Nested dictionaries are diffed key by key and a list whose old contents are
+    an unchanged prefix of the new list is recorded as an extension.
+    """
+
+    ops: List[Tuple[int, KeyPath, Any]] = []
+    for key, value in new.items():
+        key_path = path + (key,)
+        if key not in old:
+            ops.append((_SET, key_path, value))
+            continue
+        previous = old[key]
+        if previous is value:
+            continue
+        if isinstance(previous, dict) and isinstance(value, dict):
+            ops.extend(diff_state(previous, value, key_path))
+        elif isinstance(previous, list) and isinstance(value, list) and len(value) >= len(previous):
+            # List comparison short-circuits on identity, so shared entries cost
+            # a pointer compare each.
+            if value[: len(previous)] == previous:
+                if len(value) > len(previous):
+                    ops.append((_EXTEND, key_path, value[len(previous) :]))
+            else:
+                ops.append((_SET, key_path, value))
+        elif type(previous) is not type(value) or previous != value:
+            ops.append((_SET, key_path, value))
+    for key in old:
+        if key not in new:
+            ops.append((_DELETE, path + (key,), None))
+    return ops
+
+
+def apply_delta(state: Dict[str, Any], ops: Sequence[Tuple[int, KeyPath, Any]]) -> Dict[str, Any]:
+    """Apply ``ops`` from :func:`diff_state` to ``state`` in place and return it.
+
+    ``state`` must own its containers, as a freshly decoded snapshot does.
+    """
+
+    for op, key_path, value in ops:
+        target = state
+        for key in key_path[:-1]:
+            target = target[key]
+        key = key_path[-1]
+        if op == _SET:
+            target[key] = value
+        elif op == _DELETE:
+            target.pop(key, None)
+        elif isinstance(target[key], list):
+            target[key].extend(value)
+        else:
+            target[key] = target[key] + value
+    return state
+
+
+class SQLiteDeltaStore:
+    """Thread-safe checkpoint store backed by a single SQLite file.
+
+    Checkpoints are keyed by ``(thread_id, namespace)`` and numbered in write
+    order. A new snapshot is taken when the deltas written since the last one
+    reach its size (``min_snapshot_bytes`` at least) or ``max_chain`` deltas,
+    and whenever a checkpoint does not extend the thread's latest one.
+    """
+
+    def __init__(self, path: Path, *, max_chain: int = 256, min_snapshot_bytes: int = 4096) -> None:
+        if max_chain < 1:
+            raise ValueError("max_chain must be at least 1")
+        self.path = Path(path)
+        self.max_chain = max_chain
+        self.min_snapshot_bytes = min_snapshot_bytes
+        self._lock = threading.RLock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._heads: Dict[Tuple[str, str], _Head] = {}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                " thread_id TEXT NOT NULL, namespace TEXT NOT NULL, seq INTEGER NOT NULL,"
+                " checkpoint_id TEXT NOT NULL, parent_id TEXT, kind INTEGER NOT NULL,"
+                " payload BLOB NOT NULL, metadata BLOB NOT NULL,"
+                " PRIMARY KEY (thread_id, namespace, seq));"
+                "CREATE UNIQUE INDEX IF NOT EXISTS checkpoints_by_id"
+                " ON checkpoints (thread_id, namespace, checkpoint_id);"
+                "CREATE TABLE IF NOT EXISTS writes ("
+                " thread_id TEXT NOT NULL, namespace TEXT NOT NULL, checkpoint_id TEXT NOT NULL,"
+                " task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, value BLOB NOT NULL,"
+                " PRIMARY KEY (thread_id, namespace, checkpoint_id, task_id, idx));"
+            )
+            self._connection = connection
+        return self._connection
+
+    def put(
+        self,
+        thread_id: str,
+        checkpoint_id: str,
+        state: Dict[str, Any],
+        *,
+        namespace: str = "",
+        parent_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """Persist ``state`` as the newest checkpoint of a thread and return its sequence number."""
+
+        with self._lock:
+            connection = self._db()
+            with connection:
+                # Hold the write lock while reading the head, so another store
+                # writing the same thread cannot move it before this row lands.
+                connection.execute("BEGIN IMMEDIATE")
+                head = self._head(thread_id, namespace)
+                seq = head.seq + 1 if head is not None else 0
+                kind, payload = SNAPSHOT, b""
+                if head is not None and parent_id == head.checkpoint_id:
+                    payload = encode(diff_state(head.state, state))
+                    budget = max(head.snapshot_bytes, self.min_snapshot_bytes)
+                    if head.chain < self.max_chain and head.delta_bytes + len(payload) < budget:
+                        kind = DELTA
+                if kind == SNAPSHOT:
+                    payload = encode(state)
+                connection.execute(
+                    "INSERT INTO checkpoints"
+                    " (thread_id, namespace, seq, checkpoint_id, parent_id, kind, payload, metadata)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, namespace, seq, checkpoint_id, parent_id, kind, payload, encode(metadata or {})),
+                )
+            if kind == SNAPSHOT:
+                head = _Head(checkpoint_id, seq, _detach(state), 0, 0, len(payload))
+            else:
+                head = _Head(
+                    checkpoint_id,
+                    seq,
+                    _detach(state),
+                    head.chain + 1,
+                    head.delta_bytes + len(payload),
+                    head.snapshot_bytes,
+                )
+            self._heads[(thread_id, namespace)] = head
+            return seq
+
+    def _head(self, thread_id: str, namespace: str) -> Optional[_Head]:
+        head = self._heads.get((thread_id, namespace))
+        newest = self._db().execute(
+            "SELECT seq, checkpoint_id FROM checkpoints WHERE thread_id = ? AND namespace = ?"
+            " ORDER BY seq DESC LIMIT 1",
+            (thread_id, namespace),
+        ).fetchone()
+        if newest is None:
+            self._heads.pop((thread_id, namespace), None)
+            return None
+        if head is not None and (head.seq, head.checkpoint_id) == tuple(newest):
+            return head
+        # First write since the process started, or another store wrote the
+        # thread since: rebuild the tail from disk.
+        latest = self.get(thread_id, namespace=namespace)
+        if latest is None:
+            return None
+        connection = self._db()
+        snapshot_seq, snapshot_bytes = connection.execute(
+            "SELECT seq, length(payload) FROM checkpoints WHERE thread_id = ? AND namespace = ? AND kind = ?"
+            " AND seq <= ? ORDER BY seq DESC LIMIT 1",
+            (thread_id, namespace, SNAPSHOT, latest.seq),
+        ).fetchone()
+        delta_bytes = connection.execute(
+            "SELECT coalesce(sum(length(payload)), 0) FROM checkpoints"
+            " WHERE thread_id = ? AND namespace = ? AND seq > ? AND seq <= ?",
+            (thread_id, namespace, snapshot_seq, latest.seq),
+        ).fetchone()[0]
+        head = _Head(
+            latest.checkpoint_id,
+            latest.seq,
+            _detach(latest.state),
+            latest.seq - snapshot_seq,
+            delta_bytes,
+            snapshot_bytes,
+        )
+        self._heads[(thread_id, namespace)] = head
+        return head
+
+    def get(
+        self, thread_id: str, *, namespace: str = "", checkpoint_id: Optional[str] = None
+    ) -> Optional[StoredCheckpoint]:
+        """Load a checkpoint (the latest by default) from its snapshot and following deltas."""
+
+        with self._lock:
+            connection = self._db()
+            if checkpoint_id is None:
+                row = connection.execute(
+                    "SELECT max(seq) FROM checkpoints WHERE thread_id = ? AND namespace = ?",
+                    (thread_id, namespace),
+                ).fetchone()
+            else:
+                row = connection.execute(
+                    "SELECT seq FROM checkpoints WHERE thread_id = ? AND namespace = ? AND checkpoint_id = ?",
+                    (thread_id, namespace, checkpoint_id),
+                ).fetchone()
+            if row is None or row[0] is None:
+                return None
+            return self._materialise(thread_id, namespace, row[0])
+
+    def _materialise(self, thread_id: str, namespace: str, seq: int) -> StoredCheckpoint:
+        connection = self._db()
+        rows = connection.execute(
+            "SELECT seq, checkpoint_id, parent_id, kind, payload, metadata FROM checkpoints"
+            " WHERE thread_id = ? AND namespace = ? AND seq <= ? AND seq >= ("
+            "  SELECT max(seq) FROM checkpoints WHERE thread_id = ? AND namespace = ? AND kind = ? AND seq <= ?"
+            " ) ORDER BY seq",
+            (thread_id, namespace, seq, thread_id, namespace, SNAPSHOT, seq),
+        ).fetchall()
+        state: Dict[str, Any] = {}
+        for _, _, _, kind, payload, _ in rows:
+            state = decode(payload) if kind == SNAPSHOT else apply_delta(state, decode(payload))
+        row_seq, checkpoint_id, parent_id, _, _, metadata = rows[-1]
+        return StoredCheckpoint(thread_id, namespace, checkpoint_id, parent_id, row_seq, state, decode(metadata))
+
+    def list(
+        self,
+        thread_id: Optional[str] = None,
+        *,
+        namespace: Optional[str] = None,
+        before: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[StoredCheckpoint]:
+        """Yield checkpoints newest first, optionally only those older than ``before``."""
+
+        with self._lock:
+            clauses, params = [], []
+            if thread_id is not None:
+                clauses.append("thread_id = ?")
+                params.append(thread_id)
+            if namespace is not None:
+                clauses.append("namespace = ?")
+                params.append(namespace)
+            if before is not None:
+                clauses.append(
+                    "seq < (SELECT seq FROM checkpoints AS b WHERE b.thread_id = checkpoints.thread_id"
+                    " AND b.namespace = checkpoints.namespace AND b.checkpoint_id = ?)"
+                )
+                params.append(before)
+            where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+            query = f"SELECT thread_id, namespace, seq FROM checkpoints{where} ORDER BY thread_id, namespace, seq DESC"
+            if limit is not None:
+                query += f" LIMIT {int(limit)}"
+            keys = self._db().execute(query, params).fetchall()
+        for key_thread, key_namespace, seq in keys:
+            with self._lock:
+                yield self._materialise(key_thread, key_namespace, seq)
+
+    def put_writes(
+        self,
+        thread_id: str,
+        checkpoint_id: str,
+        task_id: str,
+        writes: Sequence[Tuple[str, Any]],
+        *,
+        namespace: str = "",
+    ) -> None:
+        """Record pending ``(channel, value)`` writes produced by a task."""
+
+        rows = [
+            (thread_id, namespace, checkpoint_id, task_id, index, channel, encode(value))
+            for index, (channel, value) in enumerate(writes)
+        ]
+        with self._lock:
+            connection = self._db()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO writes (thread_id, namespace, checkpoint_id, task_id, idx, channel, value)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def get_writes(self, thread_id: str, checkpoint_id: str, *, namespace: str = "") -> List[StoredWrite]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT task_id, channel, value FROM writes"
+                " WHERE thread_id = ? AND namespace = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, namespace, checkpoint_id),
+            ).fetchall()
+        return [StoredWrite(task_id, channel, decode(value)) for task_id, channel, value in rows]
+
+    def prune(self, thread_id: str, *, namespace: str = "") -> int:
+        """Delete checkpoints older than the thread's latest snapshot; return rows removed."""
+
+        with self._lock:
+            connection = self._db()
+            row = connection.execute(
+                "SELECT max(seq) FROM checkpoints WHERE thread_id = ? AND namespace = ? AND kind = ?",
+                (thread_id, namespace, SNAPSHOT),
+            ).fetchone()
+            if row is None or row[0] is None:
+                return 0
+            with connection:
+                connection.execute(
+                    "DELETE FROM writes WHERE thread_id = ? AND namespace = ? AND checkpoint_id IN ("
+                    " SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND namespace = ? AND seq < ?)",
+                    (thread_id, namespace, thread_id, namespace, row[0]),
+                )
+                cursor = connection.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ? AND namespace = ? AND seq < ?",
+                    (thread_id, namespace, row[0]),
+                )
+            return cursor.rowcount
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            connection = self._db()
+            with connection:
+                connection.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                connection.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            for key in [key for key in self._heads if key[0] == thread_id]:
+                del self._heads[key]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            self._heads.clear()
@@ -1,84 +1,397 @@
 """LangGraph orchestration skeleton for the Lean Concepts Agent."""
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Dict
+import asyncio
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from langgraph.graph import END, StateGraph
-
-from app.config import get_settings
-from app.tools import WasteDetector
+from app.similarity import get_similarity_index
+from app.text import AnalysedText
+from app.tools.registry import get_tool_registry
+from app.tracing import atraced, configure_from_settings, traced
 
+from .history import ConversationHistory, get_conversation_history
+from .prompts import PROMPT_FILES, get_prompt_registry
 from .state import AgentState
 
-PROMPT_FILES = {
-    "system": "system_v1.jinja",
-    "planner": "planner_v1.jinja",
-    "critic": "critic_v1.jinja",
-    "finalizer": "finalizer_v1.jinja",
-}
-
+if TYPE_CHECKING:
+    from langgraph.graph import StateGraph
 
-def _build_jinja_env() -> Environment:
-    settings = get_settings()
-    loader = FileSystemLoader(Path(settings.prompt_dir))
-    return Environment(loader=loader, autoescape=select_autoescape(enabled_extensions=("jinja", "yaml")))
+    from app.similarity import SimilarityIndex
 
 
 def load_prompt(name: str) -> str:
-    env = _build_jinja_env()
-    template_name = PROMPT_FILES[name]
-    template = env.get_template(template_name)
-    return template.render()
+    return get_prompt_registry().render(PROMPT_FILES[name])
 
 
-def build_graph() -> StateGraph:
-    """Return a configured LangGraph state machine."""
+def known_calls(state: AgentState) -> List[Dict[str, Any]]:
+    registry = get_tool_registry()
+    # Calls arrive as ToolCall models once the graph has validated the state.
+    calls = [call if isinstance(call, dict) else call.model_dump() for call in state.pending_tool_calls]
+    # The registry skips unknown tools, so drop them here to keep calls and
+    # results aligned.
+    return [call for call in calls if registry.get(call["tool_name"]) is not None]
 
-    graph = StateGraph(AgentState)
 
-    def planner(state: AgentState) -> AgentState:
+# Run-config flag set by :meth:`AgentGraph.stream` when the caller consumes custom chunks.
+FORWARD_INSIGHTS = "forward_insights"
+
+
+def insight_writer() -> Optional[Callable[[str, Any], None]]:
+    """Return a callback forwarding streamed tool insights to LangGraph's custom stream.
+
+    In a run started by ``graph.stream(..., stream_mode="custom")`` (or ``astream``),
+    every insight reaches the caller as ``{"tool_name": ..., "insight": ...}`` as soon
+    as the tool yields it. Any other run has no consumer for them, and ``None`` is
+    returned so tools run as usual.
+    """
+
+    from langgraph.config import get_config, get_stream_writer
+
+    try:
+        config = get_config()
+    except RuntimeError:
+        return None
+    if not config.get("configurable", {}).get(FORWARD_INSIGHTS):
+        return None
+    writer = get_stream_writer()
+
+    def forward(tool_name: str, insight: Any) -> None:
+        writer({"tool_name": tool_name, "insight": insight.to_dict()})
+
+    return forward
+
+
+class AgentNodes:
+    """The planner, preprocessor, tool router and finaliser node implementations.
+
+    Shared by the compiled graph, which runs them one session at a time, and
+    :meth:`AgentGraph.batch`, which runs each of them over many sessions.
+    """
+
+    # Goals whose preprocessed text is kept for the tool router. The analysis
+    # stays out of AgentState so checkpoints and traces do not carry it.
+    analysed_entries = 64
+
+    def __init__(
+        self,
+        history: ConversationHistory,
+        index: Optional["SimilarityIndex"] = None,
+        threshold: float = 0.9,
+    ) -> None:
+        self.history = history
+        self.index = index
+        self.threshold = threshold
+        self._analyse = lru_cache(maxsize=self.analysed_entries)(AnalysedText.from_text)
+
+    @classmethod
+    def from_settings(cls) -> "AgentNodes":
+        from app.config import get_settings
+
+        configure_from_settings()
+        get_prompt_registry().warm_up()
+        return cls(get_conversation_history(), get_similarity_index(), get_settings().similarity_threshold)
+
+    def planner(self, state: AgentState) -> AgentState:
+        from app.tools.waste_detector import WasteDetector
+
         prompt = load_prompt("planner")
         _ = prompt
-        state.pending_tool_calls.append(
-            {
-                "tool_name": WasteDetector.name,
-                "arguments": {"process_description": state.user_goal},
-            }
-        )
+        match = self.index.lookup(state.user_goal, self.threshold) if self.index is not None else None
+        if match is not None:
+            # A near-identical process was analysed before: reuse its result.
+            self.history.record(
+                state,
+                WasteDetector.name,
+                match.output,
+                {"reused": {"row": match.row, "similarity": round(match.score, 4)}},
+            )
+            return state
+        arguments = {"process_description": state.user_goal}
+        if state.session_id is not None:
+            arguments["session"] = state.session_id
+        state.pending_tool_calls.append({"tool_name": WasteDetector.name, "arguments": arguments})
         return state
 
-    def tool_router(state: AgentState) -> AgentState:
-        catalogue: Dict[str, WasteDetector] = {WasteDetector.name: WasteDetector()}
-        next_calls = []
-        for call in state.pending_tool_calls:
-            tool = catalogue.get(call["tool_name"])
-            if tool is None:
-                continue
-            result = tool.run(call["arguments"])
-            state.conversation_history.append({"tool": call["tool_name"], "result": result})
-        state.pending_tool_calls = next_calls
+    async def aplanner(self, state: AgentState) -> AgentState:
+        if self.index is None:
+            # Prompts are served from memory, so planning never blocks the loop.
+            return self.planner(state)
+        return await asyncio.to_thread(self.planner, state)
+
+    def preprocessor(self, state: AgentState) -> AgentState:
+        # Tokenise the goal once for every tool call queued by the planner.
+        # Session calls rescan only the edited part of the goal instead.
+        self.analysed(state)
+        return state
+
+    async def apreprocessor(self, state: AgentState) -> AgentState:
+        return self.preprocessor(state)
+
+    def analysed(self, state: AgentState) -> Optional[AnalysedText]:
+        """Return the shared analysis of ``state.user_goal``, or ``None`` when no tool needs it."""
+
+        if state.session_id is not None or not state.pending_tool_calls:
+            return None
+        return self._analyse(state.user_goal)
+
+    def record_results(self, state: AgentState, calls, results) -> None:
+        from app.tools.waste_detector import WasteDetector
+
+        for call, (tool_name, result) in zip(calls, results):
+            self.history.record(state, tool_name, result)
+            if self.index is not None and tool_name == WasteDetector.name:
+                # Later planners can answer near-identical goals from this result.
+                self.index.add(call["arguments"]["process_description"], result)
+
+    def tool_router(self, state: AgentState) -> AgentState:
+        registry = get_tool_registry()
+        calls = known_calls(state)
+        self.record_results(state, calls, registry.dispatch(calls, self.analysed(state), insight_writer()))
+        state.pending_tool_calls = []
         return state
 
-    def finalizer(state: AgentState) -> AgentState:
+    async def atool_router(self, state: AgentState) -> AgentState:
+        registry = get_tool_registry()
+        calls = known_calls(state)
+        results = await registry.adispatch(calls, self.analysed(state), insight_writer())
+        if self.index is not None:
+            await asyncio.to_thread(self.record_results, state, calls, results)
+        else:
+            self.record_results(state, calls, results)
+        state.pending_tool_calls = []
+        return state
+
+    def route_batch(self, states: Sequence[AgentState]) -> List[Optional[Exception]]:
+        """Run the pending calls of ``states`` grouped per tool; return each session's error."""
+
+        calls = [known_calls(state) for state in states]
+        outcomes = get_tool_registry().dispatch_batch(calls, [self.analysed(state) for state in states])
+        return self._record_batch(states, calls, outcomes)
+
+    async def aroute_batch(self, states: Sequence[AgentState]) -> List[Optional[Exception]]:
+        calls = [known_calls(state) for state in states]
+        outcomes = await get_tool_registry().adispatch_batch(calls, [self.analysed(state) for state in states])
+        if self.index is not None:
+            return await asyncio.to_thread(self._record_batch, states, calls, outcomes)
+        return self._record_batch(states, calls, outcomes)
+
+    def _record_batch(self, states, calls, outcomes) -> List[Optional[Exception]]:
+        errors: List[Optional[Exception]] = []
+        for state, session_calls, outcome in zip(states, calls, outcomes):
+            if isinstance(outcome, Exception):
+                errors.append(outcome)
+                continue
+            self.record_results(state, session_calls, outcome)
+            state.pending_tool_calls = []
+            errors.append(None)
+        return errors
+
+    def finalizer(self, state: AgentState) -> AgentState:
         prompt = load_prompt("finalizer")
         _ = prompt
-        if state.conversation_history:
-            last_tool = state.conversation_history[-1]
-            summary = last_tool["result"].get("summary", "")
+        if state.latest_result is not None:
+            summary = state.latest_result["result"].get("summary", "")
         else:
             summary = "No tools were executed."
         state.final_response = summary
         return state
 
-    graph.add_node("planner", planner)
-    graph.add_node("tool_router", tool_router)
-    graph.add_node("finalizer", finalizer)
+    async def afinalizer(self, state: AgentState) -> AgentState:
+        return self.finalizer(state)
+
+
+def build_graph(nodes: Optional[AgentNodes] = None) -> "StateGraph":
+    """Return a configured LangGraph state machine.
+
+    Every node has a synchronous and an asynchronous implementation, so the
+    compiled graph supports both ``invoke`` and ``ainvoke``. Under ``ainvoke``
+    tool calls are awaited on the event loop, letting many sessions overlap.
+    """
+
+    # The graph stack is imported on first use so that modules which only touch
+    # prompts or state stay cheap to import.
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import END, StateGraph
+
+    nodes = nodes if nodes is not None else AgentNodes.from_settings()
+    graph = StateGraph(AgentState)
+
+    for name, func, afunc in (
+        ("planner", nodes.planner, nodes.aplanner),
+        ("preprocessor", nodes.preprocessor, nodes.apreprocessor),
+        ("tool_router", nodes.tool_router, nodes.atool_router),
+        ("finalizer", nodes.finalizer, nodes.afinalizer),
+    ):
+        graph.add_node(
+            name,
+            RunnableLambda(traced("node", name, func), afunc=atraced("node", name, afunc), name=name),
+        )
 
     graph.set_entry_point("planner")
-    graph.add_edge("planner", "tool_router")
+    graph.add_edge("planner", "preprocessor")
+    graph.add_edge("preprocessor", "tool_router")
     graph.add_edge("tool_router", "finalizer")
     graph.add_edge("finalizer", END)
 
     return graph
+
+
+class AgentGraph:
+    """A compiled agent graph whose ``batch``/``abatch`` group tool calls across sessions.
+
+    ``invoke``, ``ainvoke`` and every other attribute are those of the compiled
+    graph. A batch instead runs each node over all of its sessions in turn and
+    dispatches their tool calls together, grouped per tool, so every tool runs
+    once per batch rather than once per session. Final states are returned as
+    dicts, like ``invoke``. Batches given a ``config``, or on a graph with a
+    checkpointer, go through the compiled graph so checkpoints are written.
+    """
+
+    def __init__(self, compiled: Any, nodes: AgentNodes) -> None:
+        self.compiled = compiled
+        self.nodes = nodes
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.compiled, name)
+
+    def invoke(self, input: Any, config: Optional[Mapping[str, Any]] = None, **kwargs: Any) -> Any:
+        return self.compiled.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[Mapping[str, Any]] = None, **kwargs: Any) -> Any:
+        return await self.compiled.ainvoke(input, config, **kwargs)
+
+    def stream(
+        self,
+        input: Any,
+        config: Optional[Mapping[str, Any]] = None,
+        *,
+        stream_mode: Any = None,
+        **kwargs: Any,
+    ) -> Any:
+        """The compiled graph's ``stream``; ``"custom"`` mode also carries tool insights."""
+
+        return self.compiled.stream(input, _streaming(config, stream_mode), stream_mode=stream_mode, **kwargs)
+
+    def astream(
+        self,
+        input: Any,
+        config: Optional[Mapping[str, Any]] = None,
+        *,
+        stream_mode: Any = None,
+        **kwargs: Any,
+    ) -> Any:
+        return self.compiled.astream(input, _streaming(config, stream_mode), stream_mode=stream_mode, **kwargs)
+
+    def batch(
+        self,
+        inputs: Sequence[Any],
+        config: Optional[Mapping[str, Any]] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> List[Any]:
+        """Run ``inputs`` (``AgentState``s or dicts) through the agent as one batch."""
+
+        if not self._groupable(config, kwargs):
+            return self.compiled.batch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+        nodes = self.nodes
+        states, errors = _start(inputs)
+        _each("planner", nodes.planner, states, errors)
+        _each("preprocessor", nodes.preprocessor, states, errors)
+        live = [index for index, error in enumerate(errors) if error is None]
+        route = traced("batch", "tool_router", nodes.route_batch)
+        for index, error in zip(live, route([states[index] for index in live])):
+            errors[index] = error
+        _each("finalizer", nodes.finalizer, states, errors)
+        return _finish(states, errors, return_exceptions)
+
+    async def abatch(
+        self,
+        inputs: Sequence[Any],
+        config: Optional[Mapping[str, Any]] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> List[Any]:
+        """Asynchronous :meth:`batch`; tool batches run in worker threads."""
+
+        if not self._groupable(config, kwargs):
+            return await self.compiled.abatch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+        nodes = self.nodes
+        states, errors = _start(inputs)
+        if nodes.index is None:
+            _each("planner", nodes.planner, states, errors)
+        else:
+            # Similarity lookups touch disk, so plan off the event loop.
+            await asyncio.to_thread(_each, "planner", nodes.planner, states, errors)
+        _each("preprocessor", nodes.preprocessor, states, errors)
+        live = [index for index, error in enumerate(errors) if error is None]
+        route = atraced("batch", "tool_router", nodes.aroute_batch)
+        for index, error in zip(live, await route([states[index] for index in live])):
+            errors[index] = error
+        _each("finalizer", nodes.finalizer, states, errors)
+        return _finish(states, errors, return_exceptions)
+
+    def _groupable(self, config: Optional[Mapping[str, Any]], kwargs: Dict[str, Any]) -> bool:
+        return config is None and not kwargs and getattr(self.compiled, "checkpointer", None) is None
+
+
+def _streaming(config: Optional[Mapping[str, Any]], stream_mode: Any) -> Optional[Mapping[str, Any]]:
+    # Ask the tool router to forward insights only when custom chunks are consumed.
+    modes = [stream_mode] if isinstance(stream_mode, str) else list(stream_mode or ())
+    if "custom" not in modes:
+        return config
+    config = dict(config or {})
+    config["configurable"] = {**config.get("configurable", {}), FORWARD_INSIGHTS: True}
+    return config
+
+
+def _start(inputs: Sequence[Any]) -> Tuple[List[Optional[AgentState]], List[Optional[Exception]]]:
+    # Work on copies so callers' states are left as they were, as with invoke.
+    states: List[Optional[AgentState]] = []
+    errors: List[Optional[Exception]] = []
+    for value in inputs:
+        try:
+            data = value.model_dump() if isinstance(value, AgentState) else dict(value)
+            states.append(AgentState.model_validate(data))
+            errors.append(None)
+        except Exception as exc:  # noqa: BLE001 - reported per session
+            states.append(None)
+            errors.append(exc)
+    return states, errors
+
+
+def _each(name: str, node, states: List[Optional[AgentState]], errors: List[Optional[Exception]]) -> None:
+    def stage(live: List[int]) -> None:
+        for index in live:
+            try:
+                node(states[index])
+            except Exception as exc:  # noqa: BLE001 - reported per session
+                errors[index] = exc
+
+    traced("batch", name, stage)([index for index, error in enumerate(errors) if error is None])
+
+
+def _finish(
+    states: List[Optional[AgentState]], errors: List[Optional[Exception]], return_exceptions: bool
+) -> List[Any]:
+    if not return_exceptions:
+        for error in errors:
+            if error is not None:
+                raise error
+    return [error if error is not None else state.model_dump() for state, error in zip(states, errors)]
+
+
+def compile_graph(**kwargs: Any) -> AgentGraph:
+    """Build and compile the agent graph; ``kwargs`` go to ``StateGraph.compile``."""
+
+    nodes = AgentNodes.from_settings()
+    return AgentGraph(build_graph(nodes).compile(**kwargs), nodes)
+
+
+@lru_cache(maxsize=1)
+def get_compiled_graph() -> AgentGraph:
+    """Return the process-wide compiled agent graph, built on first use."""
+
+    return compile_graph()
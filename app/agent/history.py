@@ -0,0 +1,210 @@
+"""Bounded conversation history for long-running agent sessions.
+
+``AgentState.conversation_history`` stays a plain list of entries so graph
+nodes, checkpoints and clients keep working, but tool results are appended
+through :class:`ConversationHistory`, which enforces a byte (or approximate
+token) budget. When the budget is exceeded, older entries are compacted in
+one batch: full results become short summaries, optionally with a
+reference to the full result kept in a :class:`ResultArchive`, and the oldest
+summaries are folded into a single digest entry. Recent entries are never
+compacted, and the latest result is always available as
+``AgentState.latest_result``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from app.tracing import payload_size
+
+from .state import AgentState
+
+# Rough conversion used when a budget is expressed in model tokens.
+BYTES_PER_TOKEN = 4
+# Longest string kept verbatim in a compacted entry.
+SUMMARY_TEXT_LIMIT = 200
+# After compacting, history shrinks to this fraction of the budget so the
+# next compaction is many turns away.
+LOW_WATER_RATIO = 0.75
+
+Summariser = Callable[[str, Dict[str, Any]], Dict[str, Any]]
+
+
+def summarise_result(tool_name: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep the short scalar fields of a result and the length of its lists."""
+
+    summary: Dict[str, Any] = {}
+    for key, value in result.items():
+        if isinstance(value, str):
+            summary[key] = value if len(value) <= SUMMARY_TEXT_LIMIT else value[: SUMMARY_TEXT_LIMIT - 1] + "…"
+        elif value is None or isinstance(value, (bool, int, float)):
+            summary[key] = value
+        elif isinstance(value, (list, tuple, dict)):
+            summary[f"{key}_count"] = len(value)
+    return summary
+
+
+class ResultArchive:
+    """Content-addressed SQLite store for tool results evicted from history."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("CREATE TABLE IF NOT EXISTS results (ref TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._connection = connection
+        return self._connection
+
+    def put(self, result: Dict[str, Any]) -> str:
+        """Store ``result`` and return the reference recorded in history."""
+
+        value = json.dumps(result, sort_keys=True, separators=(",", ":"), default=str)
+        ref = hashlib.sha256(value.encode("utf-8")).hexdigest()
+        with self._lock:
+            connection = self._db()
+            with connection:
+                connection.execute("INSERT OR IGNORE INTO results (ref, value) VALUES (?, ?)", (ref, value))
+        return ref
+
+    def get(self, ref: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute("SELECT value FROM results WHERE ref = ?", (ref,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class ConversationHistory:
+    """Append tool results to an agent state while keeping history within budget.
+
+    Entries come in three shapes:
+
+    * ``{"tool": name, "result": {...}}`` for the ``keep_recent`` newest turns
+      and anything appended since the last compaction;
+    * ``{"tool": name, "summary": {...}, "ref": ref, "compacted": True}`` for
+      compacted turns, where ``ref`` resolves through :meth:`resolve` when an
+      archive is configured (``None`` otherwise);
+    * one leading ``{"tool": "*", "digest": {...}, "compacted": True}`` entry
+      counting the turns that were folded away entirely.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024,
+        *,
+        keep_recent: int = 8,
+        archive: Optional[ResultArchive] = None,
+        summariser: Summariser = summarise_result,
+    ) -> None:
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+        if keep_recent < 1:
+            raise ValueError("keep_recent must be at least 1")
+        self.max_bytes = max_bytes
+        self.keep_recent = keep_recent
+        self.archive = archive
+        self.summariser = summariser
+
+    @classmethod
+    def for_tokens(cls, max_tokens: int, **kwargs: Any) -> "ConversationHistory":
+        """Build a history whose budget is expressed in approximate model tokens."""
+
+        return cls(max_tokens * BYTES_PER_TOKEN, **kwargs)
+
+    @classmethod
+    def from_settings(cls) -> "ConversationHistory":
+        from app.config import get_settings
+
+        settings = get_settings()
+        archive = ResultArchive(settings.history_archive_path) if settings.history_archive_path else None
+        return cls(settings.history_max_bytes, keep_recent=settings.history_keep_recent, archive=archive)
+
+    def record(
+        self,
+        state: AgentState,
+        tool_name: str,
+        result: Dict[str, Any],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Append a tool result to ``state`` and compact older entries if over budget.
+
+        ``metadata`` is merged into the entry, e.g. to note that a result was
+        reused from an earlier analysis.
+        """
+
+        entry = {"tool": tool_name, "result": result, **(metadata or {})}
+        state.conversation_history.append(entry)
+        state.latest_result = entry
+        state.history_bytes += payload_size(entry)
+        if state.history_bytes > self.max_bytes:
+            self.compact(state)
+
+    def compact(self, state: AgentState) -> None:
+        """Shrink ``state.conversation_history`` below the low-water mark."""
+
+        history = state.conversation_history
+        target = int(self.max_bytes * LOW_WATER_RATIO)
+        recent_from = max(len(history) - self.keep_recent, 0)
+        for index in range(recent_from):
+            entry = history[index]
+            if not entry.get("compacted"):
+                history[index] = self._summarise(entry)
+
+        sizes = [payload_size(entry) for entry in history]
+        total = sum(sizes)
+        digest_entry = history[0] if history and history[0].get("tool") == "*" else None
+        start = 1 if digest_entry is not None else 0
+        folded = start
+        # Fold the oldest summaries into the digest until the budget is met.
+        while total > target and folded < recent_from:
+            total -= sizes[folded]
+            folded += 1
+        if folded > start:
+            digest = dict(digest_entry["digest"]) if digest_entry is not None else {"turns": 0, "tools": {}}
+            tools = dict(digest["tools"])
+            for entry in history[start:folded]:
+                tools[entry["tool"]] = tools.get(entry["tool"], 0) + 1
+            digest = {"turns": digest["turns"] + folded - start, "tools": tools}
+            new_digest = {"tool": "*", "digest": digest, "compacted": True}
+            history[:folded] = [new_digest]
+            total += payload_size(new_digest) - (sizes[0] if digest_entry is not None else 0)
+        state.history_bytes = total
+
+    def _summarise(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        result = entry.get("result")
+        if not isinstance(result, dict):
+            return {"tool": entry.get("tool"), "summary": {}, "ref": None, "compacted": True}
+        ref = self.archive.put(result) if self.archive is not None else None
+        return {"tool": entry["tool"], "summary": self.summariser(entry["tool"], result), "ref": ref, "compacted": True}
+
+    def resolve(self, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the full result behind a history entry, fetching archived results."""
+
+        if "result" in entry:
+            return entry["result"]
+        ref = entry.get("ref")
+        if ref is None or self.archive is None:
+            return None
+        return self.archive.get(ref)
+
+
+@lru_cache(maxsize=1)
+def get_conversation_history() -> ConversationHistory:
+    """Return the process-wide history policy configured from settings."""
+
+    return ConversationHistory.from_settings()
+
@@ -0,0 +1,81 @@
+"""Process-wide registry of compiled prompt templates."""
+from __future__ import annotations
+
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from jinja2 import Template
+
+PROMPT_FILES = {
+    "system": "system_v1.jinja",
+    "planner": "planner_v1.jinja",
+    "critic": "critic_v1.jinja",
+    "finalizer": "finalizer_v1.jinja",
+}
+
+
+class PromptRegistry:
+    """Own one Jinja environment and the compiled templates built from it.
+
+    The environment runs with ``auto_reload`` so a template is re-parsed only
+    when its file's mtime changes; otherwise the compiled template is served
+    from the environment's cache. Templates rendered without context are
+    memoised until the compiled template is replaced. An optional bytecode
+    cache directory lets fresh processes skip compilation altogether.
+    """
+
+    def __init__(self, prompt_dir: Path, bytecode_cache_dir: Optional[Path] = None) -> None:
+        from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+        bytecode_cache = None
+        if bytecode_cache_dir is not None:
+            Path(bytecode_cache_dir).mkdir(parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(str(bytecode_cache_dir))
+        self.env = Environment(
+            loader=FileSystemLoader(Path(prompt_dir)),
+            autoescape=select_autoescape(enabled_extensions=("jinja", "yaml")),
+            auto_reload=True,
+            cache_size=-1,
+            bytecode_cache=bytecode_cache,
+        )
+        self._rendered: Dict[str, Tuple["Template", str]] = {}
+        self._lock = threading.Lock()
+
+    def get_template(self, name: str) -> "Template":
+        """Return the compiled template for a ``PROMPT_FILES`` key or file name."""
+
+        return self.env.get_template(PROMPT_FILES.get(name, name))
+
+    def render(self, name: str, **context: Any) -> str:
+        """Render a prompt, reusing the static rendering when no context is given."""
+
+        template_name = PROMPT_FILES.get(name, name)
+        template = self.env.get_template(template_name)
+        if context:
+            return template.render(**context)
+        cached = self._rendered.get(template_name)
+        if cached is not None and cached[0] is template:
+            return cached[1]
+        rendered = template.render()
+        with self._lock:
+            self._rendered[template_name] = (template, rendered)
+        return rendered
+
+    def warm_up(self) -> None:
+        """Compile and pre-render every template listed in ``PROMPT_FILES``."""
+
+        for name in PROMPT_FILES:
+            self.render(name)
+
+
+@lru_cache(maxsize=1)
+def get_prompt_registry() -> PromptRegistry:
+    """Return the process-wide :class:`PromptRegistry` configured from settings."""
+
+    from app.config import get_settings
+
+    settings = get_settings()
+    return PromptRegistry(settings.prompt_dir, settings.prompt_bytecode_cache_dir)
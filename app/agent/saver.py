@@ -0,0 +1,186 @@
+"""LangGraph checkpointer persisting sessions to a local SQLite file.
+
+Importing this module requires ``langgraph``; the storage engine itself lives
+in :mod:`app.agent.checkpoint` and only needs the standard library.
+"""
+from __future__ import annotations
+
+import asyncio
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+from .checkpoint import SQLiteDeltaStore, StoredCheckpoint
+
+
+class SQLiteDeltaSaver(BaseCheckpointSaver):
+    """Checkpointer storing each graph step as a compact delta in SQLite.
+
+    Usable without the Postgres instance in ``Settings.database_url``::
+
+        graph = build_graph().compile(checkpointer=SQLiteDeltaSaver("sessions.sqlite3"))
+        graph.invoke(state, {"configurable": {"thread_id": "session-42"}})
+    """
+
+    def __init__(self, path: Path, *, max_chain: int = 256, min_snapshot_bytes: int = 4096) -> None:
+        super().__init__()
+        self.store = SQLiteDeltaStore(Path(path), max_chain=max_chain, min_snapshot_bytes=min_snapshot_bytes)
+
+    def _tuple(self, stored: StoredCheckpoint) -> CheckpointTuple:
+        config: RunnableConfig = {
+            "configurable": {
+                "thread_id": stored.thread_id,
+                "checkpoint_ns": stored.namespace,
+                "checkpoint_id": stored.checkpoint_id,
+            }
+        }
+        parent_config: Optional[RunnableConfig] = None
+        if stored.parent_id is not None:
+            parent_config = {
+                "configurable": {
+                    "thread_id": stored.thread_id,
+                    "checkpoint_ns": stored.namespace,
+                    "checkpoint_id": stored.parent_id,
+                }
+            }
+        writes = self.store.get_writes(stored.thread_id, stored.checkpoint_id, namespace=stored.namespace)
+        return CheckpointTuple(
+            config=config,
+            checkpoint=stored.state,  # type: ignore[arg-type]
+            metadata=stored.metadata,  # type: ignore[arg-type]
+            parent_config=parent_config,
+            pending_writes=[(write.task_id, write.channel, write.value) for write in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        stored = self.store.get(
+            str(configurable["thread_id"]),
+            namespace=configurable.get("checkpoint_ns", ""),
+            checkpoint_id=get_checkpoint_id(config),
+        )
+        return self._tuple(stored) if stored is not None else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        configurable = (config or {}).get("configurable", {})
+        thread_id = configurable.get("thread_id")
+        stored_items = self.store.list(
+            str(thread_id) if thread_id is not None else None,
+            namespace=configurable.get("checkpoint_ns"),
+            before=get_checkpoint_id(before) if before else None,
+            # Metadata filters are applied after loading, so the limit must be too.
+            limit=None if filter else limit,
+        )
+        remaining = limit
+        for stored in stored_items:
+            if filter and any(stored.metadata.get(key) != value for key, value in filter.items()):
+                continue
+            yield self._tuple(stored)
+            if remaining is not None:
+                remaining -= 1
+                if remaining <= 0:
+                    return
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        namespace = configurable.get("checkpoint_ns", "")
+        self.store.put(
+            thread_id,
+            checkpoint["id"],
+            dict(checkpoint),
+            namespace=namespace,
+            parent_id=configurable.get("checkpoint_id"),
+            metadata=dict(metadata),
+        )
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": namespace, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        self.store.put_writes(
+            str(configurable["thread_id"]),
+            configurable["checkpoint_id"],
+            task_id,
+            writes,
+            namespace=configurable.get("checkpoint_ns", ""),
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.store.delete_thread(str(thread_id))
+
+    # SQLite calls are short and local, so the async API offloads to a thread.
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+@lru_cache(maxsize=1)
+def get_checkpointer() -> Optional[SQLiteDeltaSaver]:
+    """Return the process-wide checkpointer, or ``None`` when ``Settings.checkpoint_path`` is unset."""
+
+    from app.config import get_settings
+
+    path = get_settings().checkpoint_path
+    return SQLiteDeltaSaver(path) if path is not None else None
@@ -26,12 +26,24 @@ class AgentState(BaseModel):
     )
     conversation_history: List[Dict[str, Any]] = Field(
         default_factory=list,
-        description="Chronological log of interactions and tool results.",
+        description="Chronological log of interactions and tool results, compacted to a budget.",
+    )
+    latest_result: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Most recent history entry with its full tool result.",
+    )
+    history_bytes: int = Field(
+        default=0,
+        description="Approximate size of conversation_history, maintained by ConversationHistory.",
     )
     pending_tool_calls: List[ToolCall] = Field(
         default_factory=list,
         description="Queue of tool invocations produced by the planner node.",
     )
+    session_id: Optional[str] = Field(
+        default=None,
+        description="Incremental analysis session for successive edits of user_goal.",
+    )
     final_response: Optional[str] = Field(
         default=None,
         description="Natural language answer returned to the client UI.",
@@ -0,0 +1,400 @@
+"""Streaming batch pipeline that scores large corpora with any tool."""
+from __future__ import annotations
+
+import json
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from app.tools.base import BaseTool
+from app.tracing import LatencyHistogram
+
+if TYPE_CHECKING:
+    from app.dedup import Assignment, NearDuplicateIndex
+
+Record = Tuple[str, Dict[str, Any]]
+
+_DONE = object()
+# How often a blocked queue operation re-checks whether the pipeline stopped.
+_POLL_S = 0.1
+# Records that cannot be parsed carry their error under this key; the pipeline
+# still routes them through the tool so output order is preserved.
+INVALID_RECORD_KEY = "__batch_error__"
+
+
+class BatchSummary(NamedTuple):
+    """Throughput and latency statistics for a finished batch run."""
+
+    records: int
+    errors: int
+    input_bytes: int
+    elapsed_s: float
+    p50_latency_s: float
+    p99_latency_s: float
+    # Time the tool spent executing the analysed records, summed over workers.
+    analysis_s: float = 0.0
+    # Near-duplicate suppression, when enabled: records answered from another
+    # record's analysis, the clusters they formed, time spent hashing and the
+    # estimated analysis time saved.
+    duplicates: int = 0
+    clusters: int = 0
+    dedup_s: float = 0.0
+    saved_s: float = 0.0
+
+    @property
+    def records_per_s(self) -> float:
+        return self.records / self.elapsed_s if self.elapsed_s else 0.0
+
+    def describe(self) -> str:
+        megabytes = self.input_bytes / 1_000_000
+        text = (
+            f"Processed {self.records} records ({self.errors} errors, {megabytes:.1f} MB) in "
+            f"{self.elapsed_s:.2f}s: {self.records_per_s:.1f} records/s, "
+            f"latency p50 {self.p50_latency_s * 1000:.1f}ms p99 {self.p99_latency_s * 1000:.1f}ms"
+        )
+        if self.clusters:
+            share = self.duplicates / self.records if self.records else 0.0
+            text += (
+                f"; {self.duplicates} near-duplicates ({share:.1%}) answered from {self.clusters} representatives, "
+                f"saving ~{self.saved_s:.2f}s of analysis for {self.dedup_s:.2f}s of hashing"
+            )
+        return text
+
+
+def iter_jsonl_records(stream: TextIO) -> Iterator[Record]:
+    """Yield ``(id, tool_input)`` pairs from JSON lines.
+
+    Each line is a JSON object holding the tool input. An ``id`` key, if
+    present, is removed from the input and used as the record id; otherwise the
+    line number is used. Malformed lines are yielded as invalid records so
+    they are reported as per-record errors instead of aborting the batch.
+    """
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield str(line_number), {INVALID_RECORD_KEY: f"Invalid JSON: {exc}"}
+            continue
+        if not isinstance(record, dict):
+            yield str(line_number), {INVALID_RECORD_KEY: "Each line must be a JSON object"}
+            continue
+        record_id = record.pop("id", line_number)
+        yield str(record_id), record
+
+
+def iter_directory_records(directory: Path, pattern: str = "*.txt") -> Iterator[Record]:
+    """Yield one record per matching file, read lazily in sorted order."""
+
+    for path in sorted(directory.rglob(pattern)):
+        if path.is_file():
+            text = path.read_text(encoding="utf-8", errors="replace")
+            yield str(path.relative_to(directory)), {"process_description": text.strip()}
+
+
+class _Stopped(Exception):
+    """Raised in the main loop when the writer has failed and stopped draining."""
+
+
+class _Representative:
+    """A record analysed on behalf of its near-duplicates."""
+
+    __slots__ = ("key", "record_id", "index", "outcome")
+
+    def __init__(self, key: int, record_id: str, index: int) -> None:
+        self.key = key
+        self.record_id = record_id
+        self.index = index
+        # ``(ok, JSON output or error message)`` once the analysis finishes.
+        self.outcome: Optional[Tuple[bool, str]] = None
+
+
+class BatchPipeline:
+    """Read, analyse and write records concurrently with bounded memory.
+
+    A reader thread feeds a bounded input queue, the tool's
+    :meth:`BaseTool.run_many` fans records out to worker processes, and a
+    writer thread drains a bounded output queue. Full queues block the stage
+    upstream of them, so at most ``queue_size`` records plus the records in
+    flight on the workers are held at any time.
+
+    With a ``dedup`` index, records are clustered as they are read and only
+    one representative per cluster of near-identical descriptions is
+    analysed. Each duplicate is written with its representative's output and
+    a ``"duplicate_of"`` reference to the representative's id. Only records
+    whose other inputs are identical are clustered together. Serialised
+    outputs are kept for at most ``dedup_outcomes`` clusters, least recently
+    used first out; a duplicate of a cluster whose output was dropped is
+    analysed again.
+    """
+
+    def __init__(
+        self,
+        tool: BaseTool,
+        *,
+        workers: Optional[int] = None,
+        chunksize: int = 32,
+        ordered: bool = True,
+        queue_size: int = 1024,
+        dedup: Optional["NearDuplicateIndex"] = None,
+        dedup_chunk: int = 64,
+        dedup_outcomes: int = 4096,
+    ) -> None:
+        self.tool = tool
+        self.workers = workers
+        self.chunksize = chunksize
+        self.ordered = ordered
+        self.queue_size = queue_size
+        self.dedup = dedup
+        self.dedup_chunk = dedup_chunk
+        self.dedup_outcomes = dedup_outcomes
+
+    def run(self, records: Iterable[Record], output: TextIO) -> BatchSummary:
+        inbox: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        outbox: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        pending: Dict[int, Tuple[str, float, Optional[str]]] = {}
+        failures: list = []
+        input_bytes = 0
+        dedup = self.dedup
+        dedup_before = dedup.stats if dedup is not None else None
+        # Representatives by cluster key (the record's position in the input)
+        # while the index remembers them, and by tool index until analysed.
+        clusters: Dict[int, _Representative] = {}
+        analysing: Dict[int, _Representative] = {}
+        # Keys of the clusters whose output is kept, least recently used first.
+        answered: "OrderedDict[int, None]" = OrderedDict()
+        duplicates = 0
+        # Duplicates waiting to be written after the result for a tool index.
+        followers: Dict[int, List[Tuple[str, float, _Representative]]] = {}
+
+        # Highest tool index whose result has been written, for ordered runs.
+        last_written = -1
+        # Set when a stage fails or the run ends early, so no stage waits on a
+        # queue that nobody will drain again.
+        stopped = threading.Event()
+
+        def put(target: "queue.Queue[Any]", item: Any) -> bool:
+            while not stopped.is_set():
+                try:
+                    target.put(item, timeout=_POLL_S)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def emit(item: Tuple[str, float, bool]) -> None:
+            if not put(outbox, item):
+                raise _Stopped()
+
+        def write_duplicate(record_id: str, enqueued: float, representative: _Representative) -> None:
+            assert representative.outcome is not None
+            ok, payload = representative.outcome
+            if ok:
+                line = (
+                    f'{{"id":{json.dumps(record_id)},"output":{payload},'
+                    f'"duplicate_of":{json.dumps(representative.record_id)}}}'
+                )
+            else:
+                line = json.dumps(
+                    {"id": record_id, "error": payload, "duplicate_of": representative.record_id},
+                    separators=(",", ":"),
+                )
+            emit((line, time.perf_counter() - enqueued, ok))
+
+        def read() -> None:
+            try:
+                for record in records:
+                    if not put(inbox, record):
+                        return
+            except BaseException as exc:  # noqa: BLE001 - surfaced by the main thread
+                failures.append(exc)
+            finally:
+                put(inbox, _DONE)
+
+        def received() -> Iterator[List[Record]]:
+            size = self.dedup_chunk if dedup is not None else 1
+            while True:
+                try:
+                    item = inbox.get(timeout=_POLL_S)
+                except queue.Empty:
+                    if stopped.is_set():
+                        return
+                    continue
+                if item is _DONE:
+                    return
+                # Take whatever else is already queued, up to a chunk.
+                chunk = [item]
+                while len(chunk) < size:
+                    try:
+                        item = inbox.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        yield chunk
+                        return
+                    chunk.append(item)
+                yield chunk
+
+        def inputs() -> Iterator[Dict[str, Any]]:
+            nonlocal input_bytes, duplicates
+            index = 0
+            position = 0
+            for chunk in received():
+                enqueued = time.perf_counter()
+                assignments = self._cluster(chunk, position) if dedup is not None else None
+                for offset, (record_id, data) in enumerate(chunk):
+                    input_bytes += len(data.get("process_description") or "")
+                    assignment = assignments[offset] if assignments is not None else None
+                    if assignment is not None:
+                        if assignment.evicted is not None:
+                            clusters.pop(assignment.evicted, None)
+                            answered.pop(assignment.evicted, None)
+                        # A duplicate whose cluster output was dropped is analysed again.
+                        representative = (
+                            clusters.get(assignment.representative) if assignment.representative is not None else None
+                        )
+                        if representative is not None:
+                            duplicates += 1
+                            if representative.key in answered:
+                                answered.move_to_end(representative.key)
+                            # In input order, a duplicate is written right after the
+                            # record analysed just before it.
+                            after = index - 1 if self.ordered else representative.index
+                            if (last_written >= after) if self.ordered else (representative.outcome is not None):
+                                write_duplicate(record_id, enqueued, representative)
+                            else:
+                                followers.setdefault(after, []).append((record_id, enqueued, representative))
+                            continue
+                        if assignment.stored:
+                            key = position + offset
+                            representative = clusters[key] = _Representative(key, record_id, index)
+                            analysing[index] = representative
+                    pending[index] = (record_id, enqueued, data.get(INVALID_RECORD_KEY))
+                    index += 1
+                    yield data
+                position += len(chunk)
+
+        histogram = LatencyHistogram()
+        counts = {"records": 0, "errors": 0}
+        analysed = 0
+        analysis_s = 0.0
+
+        def write() -> None:
+            try:
+                while True:
+                    item = outbox.get()
+                    if item is _DONE:
+                        return
+                    line, latency, ok = item
+                    output.write(line + "\n")
+                    histogram.record(latency)
+                    counts["records"] += 1
+                    counts["errors"] += 0 if ok else 1
+            except BaseException as exc:  # noqa: BLE001 - surfaced by the main thread
+                failures.append(exc)
+                stopped.set()
+
+        started = time.perf_counter()
+        reader = threading.Thread(target=read, name="batch-reader", daemon=True)
+        writer = threading.Thread(target=write, name="batch-writer", daemon=True)
+        reader.start()
+        writer.start()
+        results = self.tool.run_many(inputs(), workers=self.workers, chunksize=self.chunksize, ordered=self.ordered)
+        try:
+            for result in results:
+                record_id, enqueued, invalid = pending.pop(result.index)
+                analysed += 1
+                analysis_s += result.seconds
+                ok = result.ok and invalid is None
+                representative = analysing.pop(result.index, None)
+                if representative is not None:
+                    # Duplicates reuse the serialised output.
+                    payload = json.dumps(result.output, separators=(",", ":")) if ok else invalid or result.error
+                    representative.outcome = (ok, payload)
+                    if representative.key in clusters:
+                        answered[representative.key] = None
+                        if len(answered) > self.dedup_outcomes:
+                            # Pending followers still hold the dropped representative.
+                            clusters.pop(answered.popitem(last=False)[0], None)
+                if ok and representative is not None:
+                    line = f'{{"id":{json.dumps(record_id)},"output":{representative.outcome[1]}}}'
+                elif ok:
+                    line = json.dumps({"id": record_id, "output": result.output}, separators=(",", ":"))
+                else:
+                    line = json.dumps({"id": record_id, "error": invalid or result.error}, separators=(",", ":"))
+                emit((line, time.perf_counter() - enqueued, ok))
+                last_written = result.index
+                for duplicate in followers.pop(result.index, ()):
+                    write_duplicate(*duplicate)
+        except _Stopped:
+            # The writer failed; its error is raised below.
+            pass
+        finally:
+            # Shut down the worker pool before waiting for the other stages.
+            results.close()
+            put(outbox, _DONE)
+            writer.join()
+            stopped.set()
+        reader.join()
+        output.flush()
+        if failures:
+            raise failures[0]
+
+        elapsed = time.perf_counter() - started
+        summary = BatchSummary(
+            records=counts["records"],
+            errors=counts["errors"],
+            input_bytes=input_bytes,
+            elapsed_s=elapsed,
+            p50_latency_s=histogram.percentile(50),
+            p99_latency_s=histogram.percentile(99),
+            analysis_s=analysis_s,
+        )
+        if dedup is None or dedup_before is None:
+            return summary
+        after = dedup.stats
+        hashing = after.seconds - dedup_before.seconds
+        # Assume each skipped record would have cost the mean measured analysis
+        # time; start-up, I/O and queue waits are not saved by skipping it.
+        saved = analysis_s / analysed * duplicates if analysed else 0.0
+        return summary._replace(
+            duplicates=duplicates,
+            clusters=after.representatives - dedup_before.representatives,
+            dedup_s=hashing,
+            saved_s=saved,
+        )
+
+    def _cluster(self, chunk: List[Record], position: int) -> List[Optional["Assignment"]]:
+        """Place the chunk's records in the dedup index; ``None`` for records it skips."""
+
+        assert self.dedup is not None
+        field = self.tool.text_field
+        items = []
+        offsets = []
+        for offset, (_, data) in enumerate(chunk):
+            text = data.get(field) if field is not None else None
+            if not isinstance(text, str) or INVALID_RECORD_KEY in data:
+                continue
+            try:
+                # Records are only interchangeable when their other inputs match.
+                context = json.dumps({key: value for key, value in data.items() if key != field}, sort_keys=True)
+            except (TypeError, ValueError):
+                continue
+            items.append((position + offset, text, context))
+            offsets.append(offset)
+        assignments: List[Optional["Assignment"]] = [None] * len(chunk)
+        for offset, assignment in zip(offsets, self.dedup.assign_many(items)):
+            assignments[offset] = assignment
+        return assignments
+
+
+def open_output(path: Optional[Path]) -> TextIO:
+    if path is None or str(path) == "-":
+        return sys.stdout
+    return open(path, "w", encoding="utf-8")
@@ -1,15 +1,22 @@
 """Application configuration utilities for the Lean Concepts Agent."""
 from __future__ import annotations
 
+import os
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
 
 from pydantic import BaseModel, Field
-from pydantic_settings import BaseSettings
 
+try:
+    from pydantic_settings import BaseSettings
+except ImportError:
+    # Without pydantic-settings, settings are read from the environment by
+    # ``_from_environment`` (``.env`` files are not supported then).
+    BaseSettings = None  # type: ignore[assignment,misc]
 
-class Settings(BaseSettings):
+
+class Settings(BaseSettings or BaseModel):  # type: ignore[misc]
     """Runtime configuration loaded from environment variables."""
 
     openai_api_key: Optional[str] = Field(
@@ -28,14 +35,112 @@ class Settings(BaseSettings):
         default=Path("prompts"),
         description="Base directory where prompt templates are stored.",
     )
+    prompt_bytecode_cache_dir: Optional[Path] = Field(
+        default=None,
+        description="Directory for cached Jinja bytecode. Disabled when unset.",
+    )
+    ruleset_dir: Path = Field(
+        default=Path("rulesets"),
+        description="Directory of JSON/YAML waste taxonomies selectable per WasteDetector call.",
+    )
+    ruleset_check_interval: float = Field(
+        default=1.0,
+        description="Seconds between checks of a ruleset file for changes.",
+    )
+    cache_dir: Optional[Path] = Field(
+        default=None,
+        description="Directory for the on-disk tool result cache. Disabled when unset.",
+    )
+    cache_max_entries: int = Field(
+        default=1024,
+        description="Maximum number of tool results kept in the in-memory cache.",
+    )
+    history_max_bytes: int = Field(
+        default=256 * 1024,
+        description="Budget for conversation history per session before older turns are compacted.",
+    )
+    history_keep_recent: int = Field(
+        default=8,
+        description="Number of newest history entries always kept with their full results.",
+    )
+    history_archive_path: Optional[Path] = Field(
+        default=None,
+        description="SQLite file keeping full results of compacted history entries. Disabled when unset.",
+    )
+    checkpoint_path: Optional[Path] = Field(
+        default=None,
+        description="SQLite file for durable session checkpoints. Disabled when unset.",
+    )
+    similarity_index_dir: Optional[Path] = Field(
+        default=None,
+        description="Directory of the local index of past analyses reused by the planner. Disabled when unset.",
+    )
+    similarity_threshold: float = Field(
+        default=0.9,
+        description="Minimum cosine similarity for the planner to reuse a stored analysis.",
+    )
+    server_host: str = Field(
+        default="127.0.0.1",
+        description="Interface the HTTP analysis service binds to.",
+    )
+    server_port: int = Field(
+        default=8080,
+        description="Port of the HTTP analysis service.",
+    )
+    server_max_batch_size: int = Field(
+        default=64,
+        description="Most requests the service runs in one batched call per pipeline.",
+    )
+    server_max_batch_wait: float = Field(
+        default=0.005,
+        description="Longest a request waits for more requests to share its batch, in seconds.",
+    )
+    server_max_queue: int = Field(
+        default=1024,
+        description="Requests queued per pipeline before new ones are shed with 503.",
+    )
+    server_max_queue_wait: Optional[float] = Field(
+        default=1.0,
+        description="Requests queued longer than this many seconds are shed with 503. Disabled when unset.",
+    )
+    server_max_body_bytes: int = Field(
+        default=8 * 1024 * 1024,
+        description="Largest request body the service accepts.",
+    )
 
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
 
 
+def _parse_bool(value: str) -> bool:
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+_PARSERS: Dict[str, Callable[[str], Any]] = {"str": str, "int": int, "float": float, "bool": _parse_bool, "Path": Path}
+
+
+def _from_environment() -> Dict[str, Any]:
+    """Field values set as (case-insensitive) environment variables, parsed per annotation."""
+
+    environment = {name.upper(): value for name, value in os.environ.items()}
+    values: Dict[str, Any] = {}
+    for name, annotation in Settings.__annotations__.items():
+        raw = environment.get(name.upper())
+        if raw is None:
+            continue
+        kind = str(annotation).replace("Optional[", "").rstrip("]")
+        try:
+            values[name] = _PARSERS.get(kind, str)(raw)
+        except ValueError as exc:
+            raise ValueError(f"Invalid value for {name.upper()}: {raw!r}") from exc
+    return values
+
+
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
     """Return a cached instance of :class:`Settings`."""
 
+    if BaseSettings is None:
+        return Settings.model_validate(_from_environment())
     return Settings()  # type: ignore[arg-type]
@@ -0,0 +1,284 @@
+"""Streaming near-duplicate detection with MinHash signatures and LSH.
+
+Bulk submissions often hold many lightly edited copies of one narrative.
+:class:`NearDuplicateIndex` clusters them as they stream past: each text gets a
+MinHash signature over its 8-byte shingles (one-permutation hashing into
+``num_perm`` bins, densified by rotation), candidates are found through banded
+LSH tables, and a text whose estimated Jaccard similarity to a stored
+representative reaches ``threshold`` is reported as that representative's
+duplicate. Every other text becomes a representative itself.
+
+Memory is fixed when the index is created: representatives live in a ring of
+``capacity`` slots, and the oldest is forgotten when a new one needs its slot,
+so tens of millions of records stream through in the same footprint. Texts are
+signed in chunks with a handful of vectorised NumPy operations, a small
+fraction of what analysing them costs.
+
+NumPy is an optional dependency and is imported on first use.
+"""
+from __future__ import annotations
+
+import math
+import time
+from typing import TYPE_CHECKING, Dict, Hashable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Odd 64-bit multiplier (the golden ratio) used to mix shingles and band keys.
+_MIX = 0x9E3779B97F4A7C15
+_SHINGLE_BYTES = 8
+
+
+class Assignment(NamedTuple):
+    """Where :meth:`NearDuplicateIndex.assign_many` placed one text.
+
+    ``representative`` is the key of the stored text this one duplicates, or
+    ``None`` when the text was not a duplicate. ``stored`` tells whether the
+    text became a representative itself, and ``evicted`` is the key of the
+    representative forgotten to make room for it, if any.
+    """
+
+    representative: Optional[Hashable] = None
+    stored: bool = False
+    evicted: Optional[Hashable] = None
+
+
+class DedupStats(NamedTuple):
+    """Counters for a :class:`NearDuplicateIndex`."""
+
+    records: int
+    duplicates: int
+    representatives: int
+    unsigned: int
+    seconds: float
+
+    @property
+    def duplicate_ratio(self) -> float:
+        return self.duplicates / self.records if self.records else 0.0
+
+
+def lsh_rows(threshold: float, num_perm: int, recall: float = 0.95) -> int:
+    """Rows per LSH band: the most selective banding that still finds ``recall`` of pairs at ``threshold``."""
+
+    rows = num_perm
+    while rows > 1:
+        bands = num_perm // rows
+        if 1 - (1 - threshold**rows) ** bands >= recall:
+            return rows
+        rows //= 2
+    return 1
+
+
+class NearDuplicateIndex:
+    """Cluster near-identical texts in a stream, one representative per cluster.
+
+    ``threshold`` is the Jaccard similarity of 8-byte shingle sets (after
+    lowercasing) above which a text counts as a duplicate. ``capacity`` bounds
+    the representatives kept; at the default threshold each slot costs about
+    340 bytes (signature, context, key and band-table entries), 44 MB for the
+    default capacity. Callers keep their own per-cluster results on top of
+    that; :class:`app.batch.BatchPipeline` bounds those separately. Texts
+    shorter than one shingle are never signed and always reported as
+    non-duplicates. Not thread-safe.
+    """
+
+    num_perm = 64
+
+    def __init__(self, threshold: float = 0.9, *, capacity: int = 1 << 17) -> None:
+        import numpy as np
+
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.threshold = threshold
+        self.capacity = capacity
+        self.rows = lsh_rows(threshold, self.num_perm)
+        self.bands = self.num_perm // self.rows
+        # Matching signature entries needed to reach the threshold.
+        self._required = math.ceil(threshold * self.num_perm - 1e-9)
+        self._table_bits = max(4, (capacity * 2 - 1).bit_length())
+        # Each band table maps a band key to a slot + 1 (0 is empty). A newer
+        # representative overwrites an older one sharing its bucket.
+        self._tables = np.zeros((self.bands, 1 << self._table_bits), dtype=np.int32)
+        self._band_range = np.arange(self.bands)
+        self._signatures = np.zeros((capacity, self.num_perm), dtype=np.uint32)
+        self._contexts = np.zeros(capacity, dtype=np.int64)
+        self._keys: List[Optional[Hashable]] = [None] * capacity
+        self._next_slot = 0
+        self._records = 0
+        self._duplicates = 0
+        self._representatives = 0
+        self._unsigned = 0
+        self._seconds = 0.0
+
+    @property
+    def stats(self) -> DedupStats:
+        return DedupStats(self._records, self._duplicates, self._representatives, self._unsigned, self._seconds)
+
+    def signatures(self, texts: Sequence[str]) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Return ``(signatures, signed)``: one row of ``num_perm`` values per text.
+
+        ``signed`` is false for texts too short to hold a shingle; their rows
+        are meaningless.
+        """
+
+        import numpy as np
+
+        count = len(texts)
+        bins = self.num_perm
+        bin_shift = np.uint64(64 - (bins.bit_length() - 1))
+        parts = [text.lower().encode("utf-8") for text in texts]
+        lengths = np.fromiter(map(len, parts), dtype=np.int64, count=count)
+        # Each text is padded to whole 8-byte blocks plus at least one more, so
+        # a shingle starting in a text's blocks never reaches the next text.
+        blocks = (lengths + 2 * _SHINGLE_BYTES - 1) // _SHINGLE_BYTES
+        buffer = b"".join(part.ljust(size * _SHINGLE_BYTES, b"\0") for part, size in zip(parts, blocks.tolist()))
+        total = len(buffer) // _SHINGLE_BYTES
+
+        # Row ``offset`` holds the shingles starting ``offset`` bytes into each block.
+        shingles = np.zeros((_SHINGLE_BYTES, total), dtype=np.uint64)
+        for offset in range(_SHINGLE_BYTES):
+            available = (len(buffer) - offset) // _SHINGLE_BYTES
+            shingles[offset, :available] = np.frombuffer(buffer, dtype=np.uint64, count=available, offset=offset)
+        owner = np.repeat(np.arange(count, dtype=np.int64), blocks)
+        last_start = (np.cumsum(blocks) - blocks) * _SHINGLE_BYTES + lengths - _SHINGLE_BYTES
+        starts = np.arange(total, dtype=np.int64) * _SHINGLE_BYTES
+        valid = starts[None, :] + np.arange(_SHINGLE_BYTES)[:, None] <= last_start[owner][None, :]
+
+        mix = np.uint64(_MIX)
+        hashes = shingles
+        hashes *= mix
+        hashes ^= hashes >> np.uint64(32)
+        hashes *= mix
+        # One-permutation hashing: the top bits pick a bin, each bin keeps its minimum.
+        slots = (owner << (bins.bit_length() - 1))[None, :] | (hashes >> bin_shift).view(np.int64)
+        slots[~valid] = count * bins
+        minima = np.full(count * bins + 1, np.iinfo(np.uint64).max, dtype=np.uint64)
+        np.minimum.at(minima, slots.ravel(), hashes.ravel())
+        signatures = minima[:-1].reshape(count, bins)
+        signed = lengths >= _SHINGLE_BYTES
+        self._densify(signatures)
+        # Keep the 32 bits below the bin index, which every entry of a column shares.
+        return ((signatures << (bin_shift - np.uint64(32))) >> np.uint64(32)).astype(np.uint32), signed
+
+    @staticmethod
+    def _densify(signatures: "np.ndarray") -> None:
+        # Empty bins borrow the next non-empty bin's value (circularly), offset
+        # by the distance, so short texts still compare bin for bin.
+        import numpy as np
+
+        empty = signatures == np.iinfo(np.uint64).max
+        if not empty.any():
+            return
+        bins = signatures.shape[1]
+        positions = np.arange(2 * bins)
+        filled = np.concatenate([~empty, ~empty], axis=1)
+        following = np.where(filled, positions, 2 * bins)
+        following = np.minimum.accumulate(following[:, ::-1], axis=1)[:, ::-1][:, :bins]
+        rows, columns = np.nonzero(empty)
+        sources = following[rows, columns]
+        found = sources < 2 * bins
+        rows, columns, sources = rows[found], columns[found], sources[found]
+        distance = (sources - columns).astype(np.uint64)
+        signatures[rows, columns] = signatures[rows, sources % bins] + distance * np.uint64(_MIX)
+
+    def _band_slots(self, signatures: "np.ndarray", contexts: "np.ndarray") -> "np.ndarray":
+        # Band keys start from the context, so texts in different contexts
+        # never compete for a bucket.
+        import numpy as np
+
+        keys = np.repeat(contexts.view(np.uint64)[:, None], self.bands, axis=1)
+        banded = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        mix = np.uint64(_MIX)
+        for row in range(self.rows):
+            keys *= mix
+            keys += banded[:, :, row]
+        keys *= mix
+        return (keys >> np.uint64(64 - self._table_bits)).astype(np.int64)
+
+    def assign_many(self, items: Sequence[Tuple[Hashable, str, Optional[Hashable]]]) -> List[Assignment]:
+        """Place each ``(key, text, context)`` item, in order.
+
+        Only texts with equal ``context`` (for example the other tool inputs
+        they were submitted with) can be duplicates of each other. Later items
+        may duplicate earlier items of the same call.
+        """
+
+        import numpy as np
+
+        if not items:
+            return []
+        started = time.perf_counter()
+        signatures, signed = self.signatures([text for _, text, _ in items])
+        contexts = np.fromiter(
+            (hash(context) if context is not None else 0 for _, _, context in items), dtype=np.int64, count=len(items)
+        )
+        buckets = self._band_slots(signatures, contexts)
+        # Candidates and their agreement as of the start of the chunk, in bulk.
+        candidates = self._tables[self._band_range, buckets] - 1
+        agreement = self._agreement(candidates, signatures[:, None, :], contexts[:, None])
+        best = agreement.argmax(axis=1)
+        best_agreement = agreement[np.arange(len(items)), best]
+        # Items whose candidates this chunk changed are re-checked one by one.
+        flat_buckets = (buckets + self._band_range * (1 << self._table_bits)).tolist()
+        written_buckets: Dict[int, int] = {}
+        written_slots: Set[int] = set()
+
+        assignments: List[Assignment] = []
+        for index, (key, _, _) in enumerate(items):
+            if not signed[index]:
+                self._unsigned += 1
+                assignments.append(Assignment())
+                continue
+            row = candidates[index]
+            if not written_slots.isdisjoint(row.tolist()):
+                # A candidate's slot was reused by this chunk: look it up afresh.
+                match = self._best_match(buckets[index], signatures[index], contexts[index])
+            else:
+                score = int(best_agreement[index])
+                match = int(row[best[index]]) if score >= self._required else None
+                fresh = [written_buckets[bucket] for bucket in flat_buckets[index] if bucket in written_buckets]
+                if fresh:
+                    fresh_slots = np.array(fresh)
+                    fresh_agreement = self._agreement(fresh_slots, signatures[index], contexts[index])
+                    top = int(fresh_agreement.argmax())
+                    if fresh_agreement[top] >= self._required and fresh_agreement[top] > score:
+                        match = fresh[top]
+            if match is not None:
+                self._duplicates += 1
+                assignments.append(Assignment(self._keys[match]))
+                continue
+            slot = self._next_slot
+            self._next_slot = (slot + 1) % self.capacity
+            evicted = self._keys[slot]
+            self._keys[slot] = key
+            self._signatures[slot] = signatures[index]
+            self._contexts[slot] = contexts[index]
+            self._tables[self._band_range, buckets[index]] = slot + 1
+            written_buckets.update(dict.fromkeys(flat_buckets[index], slot))
+            written_slots.add(slot)
+            self._representatives += 1
+            assignments.append(Assignment(stored=True, evicted=evicted))
+        self._records += len(items)
+        self._seconds += time.perf_counter() - started
+        return assignments
+
+    def _agreement(self, candidates: "np.ndarray", signatures: "np.ndarray", contexts: "np.ndarray") -> "np.ndarray":
+        # Signature entries each candidate shares with its text; 0 for empty
+        # buckets and for representatives submitted in another context.
+        import numpy as np
+
+        agreement = np.count_nonzero(self._signatures[candidates] == signatures, axis=-1)
+        agreement[(candidates < 0) | (self._contexts[candidates] != contexts)] = 0
+        return agreement
+
+    def _best_match(self, buckets: "np.ndarray", signature: "np.ndarray", context: int) -> Optional[int]:
+        candidates = self._tables[self._band_range, buckets] - 1
+        agreement = self._agreement(candidates, signature, context)
+        best = int(agreement.argmax())
+        return int(candidates[best]) if agreement[best] >= self._required else None
+
+    def assign(self, key: Hashable, text: str, context: Optional[Hashable] = None) -> Assignment:
+        return self.assign_many([(key, text, context)])[0]
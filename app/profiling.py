@@ -0,0 +1,298 @@
+"""Deterministic CPU and allocation profiling for CLI runs.
+
+:class:`Profiler` runs a callable under :mod:`cProfile` and :mod:`tracemalloc`
+and turns the result into a :class:`ProfileReport`: a per-stage breakdown
+(imports, file read, input validation, matching, output dumping), the most
+expensive functions, peak traced memory and the largest allocation sites.
+Reports are written as a text summary, a JSON document suitable for diffing
+between runs, and a ``.pstats`` file for ``python -m pstats`` or snakeviz.
+
+Stages are derived from the profile itself by matching function names (see
+:data:`STAGES`), so the code being profiled carries no instrumentation.
+Only the profiling thread is measured; work done in worker processes is not.
+"""
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+REPORT_FILENAME = "report.txt"
+JSON_FILENAME = "profile.json"
+PSTATS_FILENAME = "profile.pstats"
+
+FunctionKey = Tuple[str, int, str]
+
+
+class StageRule(NamedTuple):
+    """Attribute a function's cumulative time to a stage.
+
+    ``filename`` and ``function`` are glob patterns matched against the
+    profile's function keys (built-ins have filename ``"~"``). With ``caller``
+    (``"filename-glob:function-glob"``) only calls made directly from a
+    matching caller count. ``weight=-1`` subtracts time already counted by
+    another rule of the stage, such as reads nested inside a streaming scan.
+    """
+
+    filename: str
+    function: str
+    caller: Optional[str] = None
+    weight: float = 1.0
+
+
+_READS = "<method 'read*' of '_io.*' objects>"
+
+STAGES: Dict[str, Sequence[StageRule]] = {
+    "imports": (StageRule("<frozen importlib._bootstrap>", "_find_and_load"),),
+    "file read": (
+        StageRule("~", _READS),
+        StageRule("~", _READS, caller="<frozen importlib._bootstrap_external>:get_data", weight=-1.0),
+    ),
+    "input validation": (StageRule("*/app/tools/base.py", "parse_input"),),
+    "matching": (
+        StageRule("*/app/tools/waste_detector.py", "_run"),
+        StageRule("*/app/tools/waste_detector.py", "_run_analysed"),
+        StageRule("*/app/tools/waste_detector.py", "analyze_stream"),
+        # Streaming analysis (iter_run/iter_file): rulesets and the stream are set
+        # up eagerly, and the scan runs as the ``insights`` generator is consumed.
+        StageRule("*/app/tools/waste_detector.py", "iter_run"),
+        StageRule("*/app/tools/base.py", "parse_input", caller="*/app/tools/waste_detector.py:iter_run", weight=-1.0),
+        StageRule("*/app/tools/waste_detector.py", "iter_file"),
+        StageRule("*/app/tools/waste_detector.py", "insights"),
+        StageRule("~", _READS, caller="*/app/tools/keyword_matcher.py:_windows", weight=-1.0),
+    ),
+    "output dumping": (
+        StageRule("*", "model_dump*", caller="*/app/*:*"),
+        StageRule("*/json/__init__.py", "dumps", caller="*/app/batch.py:*"),
+    ),
+}
+
+
+class StageTiming(NamedTuple):
+    seconds: float
+    calls: int
+
+
+class FunctionTiming(NamedTuple):
+    function: str
+    calls: int
+    own_s: float
+    cumulative_s: float
+
+
+class AllocationSite(NamedTuple):
+    site: str
+    size_bytes: int
+    blocks: int
+
+
+class ProfileReport(NamedTuple):
+    """Summary of one profiled run."""
+
+    label: str
+    wall_s: float
+    cpu_s: float
+    stages: Dict[str, StageTiming]
+    functions: List[FunctionTiming]
+    peak_bytes: int
+    allocations: List[AllocationSite]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "label": self.label,
+            "wall_s": self.wall_s,
+            "cpu_s": self.cpu_s,
+            "stages": {name: timing._asdict() for name, timing in self.stages.items()},
+            "functions": [timing._asdict() for timing in self.functions],
+            "peak_bytes": self.peak_bytes,
+            "allocations": [site._asdict() for site in self.allocations],
+        }
+
+    def render(self) -> str:
+        """Return the human-readable report."""
+
+        lines = [f"Profile of {self.label}: {self.wall_s:.3f}s wall, {self.cpu_s:.3f}s CPU", "", "Stages:"]
+        profiled = sum(timing.seconds for timing in self.stages.values())
+        for name, timing in self.stages.items():
+            share = timing.seconds / self.wall_s * 100 if self.wall_s else 0.0
+            lines.append(f"  {name:<18} {timing.seconds:>9.4f}s {share:>5.1f}%  {timing.calls:>8} calls")
+        other = max(self.wall_s - profiled, 0.0)
+        lines.append(f"  {'other':<18} {other:>9.4f}s {other / self.wall_s * 100 if self.wall_s else 0.0:>5.1f}%")
+        lines += ["", f"Peak traced memory: {_format_bytes(self.peak_bytes)}", "", "Top allocation sites:"]
+        for site in self.allocations:
+            lines.append(f"  {_format_bytes(site.size_bytes):>10} {site.blocks:>8} blocks  {site.site}")
+        lines += ["", "Top functions by cumulative time:"]
+        for timing in self.functions:
+            lines.append(
+                f"  {timing.cumulative_s:>9.4f}s cum {timing.own_s:>9.4f}s own {timing.calls:>8}  {timing.function}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def _matches(key: FunctionKey, filename: str, function: str) -> bool:
+    return fnmatchcase(key[0].replace(os.sep, "/"), filename) and fnmatchcase(key[2], function)
+
+
+def _describe(key: FunctionKey) -> str:
+    filename, line, function = key
+    return function if filename == "~" else f"{filename}:{line}({function})"
+
+
+def stage_timings(stats: pstats.Stats, stages: Dict[str, Sequence[StageRule]] = STAGES) -> Dict[str, StageTiming]:
+    """Attribute cumulative time in ``stats`` to each stage."""
+
+    table = stats.stats  # type: ignore[attr-defined]
+    timings: Dict[str, StageTiming] = {}
+    for stage, rules in stages.items():
+        seconds = 0.0
+        calls = 0
+        counted = {rule.function for rule in rules if rule.weight > 0}
+        for rule in rules:
+            for key, (_, total_calls, _, cumulative, callers) in table.items():
+                if not _matches(key, rule.filename, rule.function):
+                    continue
+                if rule.caller is None:
+                    edges = [(total_calls, cumulative)]
+                else:
+                    caller_file, _, caller_function = rule.caller.rpartition(":")
+                    edges = [
+                        (edge[1], edge[3])
+                        for caller, edge in callers.items()
+                        if _matches(caller, caller_file, caller_function)
+                    ]
+                for edge_calls, edge_seconds in edges:
+                    seconds += rule.weight * edge_seconds
+                    # Calls are only taken back when the same function was counted.
+                    if rule.weight > 0:
+                        calls += edge_calls
+                    elif rule.function in counted:
+                        calls -= edge_calls
+        timings[stage] = StageTiming(max(seconds, 0.0), calls)
+    return timings
+
+
+class Profiler:
+    """Run a callable under cProfile and tracemalloc and summarise the run.
+
+    tracemalloc only reports what is live when a snapshot is taken, so while
+    the callable runs a background thread snapshots every
+    ``snapshot_interval`` seconds and the report keeps the largest snapshot:
+    the allocation sites at the highest memory observed. Both tools slow the
+    profiled code down, CPU-bound code typically by 1.5-3x.
+    """
+
+    def __init__(self, *, top: int = 25, snapshot_interval: float = 0.25, frames: int = 1) -> None:
+        self.top = top
+        self.snapshot_interval = snapshot_interval
+        self.frames = frames
+        self.profile: Optional[cProfile.Profile] = None
+        self.report: Optional[ProfileReport] = None
+
+    def run(self, label: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call ``func`` under the profilers and store the :class:`ProfileReport`."""
+
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        best: List[Optional[tracemalloc.Snapshot]] = [None]
+        best_size = [0]
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def keep_if_largest() -> None:
+            current = tracemalloc.get_traced_memory()[0]
+            with lock:
+                if current <= best_size[0]:
+                    return
+                best_size[0] = current
+                best[0] = tracemalloc.take_snapshot()
+
+        def sample() -> None:
+            while not stop.wait(self.snapshot_interval):
+                keep_if_largest()
+
+        sampler = threading.Thread(target=sample, name="profile-snapshots", daemon=True)
+        profile = cProfile.Profile()
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        sampler.start()
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            wall_s = time.perf_counter() - wall_started
+            cpu_s = time.process_time() - cpu_started
+            stop.set()
+            sampler.join()
+            keep_if_largest()
+            peak = tracemalloc.get_traced_memory()[1]
+            if not already_tracing:
+                tracemalloc.stop()
+            self.profile = profile
+            self.report = self._summarise(label, profile, wall_s, cpu_s, peak, best[0])
+
+    def _summarise(
+        self,
+        label: str,
+        profile: cProfile.Profile,
+        wall_s: float,
+        cpu_s: float,
+        peak: int,
+        snapshot: Optional[tracemalloc.Snapshot],
+    ) -> ProfileReport:
+        stats = pstats.Stats(profile)
+        table = stats.stats  # type: ignore[attr-defined]
+        ranked = sorted(table.items(), key=lambda item: item[1][3], reverse=True)
+        functions = [
+            FunctionTiming(_describe(key), total_calls, own, cumulative)
+            for key, (_, total_calls, own, cumulative, _) in ranked[: self.top]
+        ]
+        allocations: List[AllocationSite] = []
+        if snapshot is not None:
+            snapshot = snapshot.filter_traces(
+                (
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, threading.__file__),
+                    tracemalloc.Filter(False, __file__),
+                )
+            )
+            for statistic in snapshot.statistics("lineno")[: self.top]:
+                frame = statistic.traceback[0]
+                allocations.append(AllocationSite(f"{frame.filename}:{frame.lineno}", statistic.size, statistic.count))
+        return ProfileReport(label, wall_s, cpu_s, stage_timings(stats), functions, peak, allocations)
+
+    def write(self, directory: Path) -> Dict[str, Path]:
+        """Write the text report, JSON summary and pstats dump into ``directory``."""
+
+        if self.report is None or self.profile is None:
+            raise RuntimeError("Nothing has been profiled yet")
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = {
+            "report": directory / REPORT_FILENAME,
+            "json": directory / JSON_FILENAME,
+            "pstats": directory / PSTATS_FILENAME,
+        }
+        paths["report"].write_text(self.report.render(), encoding="utf-8")
+        paths["json"].write_text(json.dumps(self.report.to_dict(), indent=2) + "\n", encoding="utf-8")
+        self.profile.dump_stats(str(paths["pstats"]))
+        return paths
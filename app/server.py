@@ -0,0 +1,603 @@
+"""Asyncio HTTP service exposing the tools and the agent graph.
+
+Endpoints (JSON in, JSON out, HTTP/1.1 with keep-alive):
+
+* ``POST /v1/tools/<name>`` runs a registered tool on the request body;
+* ``POST /v1/agent`` runs the compiled graph on ``{"user_goal": ..., "mode": ...}``;
+* ``GET /metrics`` reports queue depth, shed requests, batch sizes and latency
+  percentiles per pipeline in the Prometheus text format (``?format=json``
+  for JSON);
+* ``GET /healthz``.
+
+Requests to one pipeline are collected by a :class:`MicroBatcher` and executed
+as a single batched call (:meth:`BaseTool.run_many` in-process, or the
+graph's ``abatch``). Each pipeline's queue is bounded: when it is full, or a
+request has waited longer than ``max_queue_wait``, the request is shed with
+``503 Service Unavailable`` and a ``Retry-After`` header instead of adding
+latency for everyone behind it.
+
+Only the standard library is used; the graph endpoint is enabled when the
+LangGraph stack is installed.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from http import HTTPStatus
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+from urllib.parse import parse_qs, urlsplit
+
+from app.tools.base import ToolExecutionError
+from app.tracing import LatencyHistogram
+
+if TYPE_CHECKING:
+    from app.tools.base import BaseTool
+    from app.tools.registry import ToolRegistry
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# A batch handler returns one result per item; an exception instance in place
+# of a result fails only that item.
+BatchHandler = Callable[[List[T]], Union[Sequence[Any], Awaitable[Sequence[Any]]]]
+
+MAX_HEADER_LINES = 100
+SERVER_NAME = "lean-agent"
+
+
+class Overloaded(RuntimeError):
+    """Raised when a request is shed because its pipeline is saturated."""
+
+
+class BatcherStats:
+    """Counters and latency histograms of one :class:`MicroBatcher`."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.shed = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_items = 0
+        self.max_batch_size = 0
+        self.latency = LatencyHistogram()
+        self.queue_wait = LatencyHistogram()
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.batched_items / self.batches if self.batches else 0.0
+
+
+class MicroBatcher(Generic[T, R]):
+    """Group concurrent submissions into batches for one handler call.
+
+    A batch is dispatched when it holds ``max_batch_size`` items or, at the
+    latest, ``max_wait`` seconds after its first item arrived. The wait is
+    adaptive: after a batch of one the next batch is dispatched without
+    lingering, so an idle service answers at single-request latency and only
+    waits for company once requests actually overlap. While a batch runs, new
+    requests queue up and form the next one.
+
+    Synchronous handlers run in a worker thread so the event loop keeps
+    accepting requests. Must be started from a running event loop.
+    """
+
+    def __init__(
+        self,
+        handler: BatchHandler,
+        *,
+        max_batch_size: int = 64,
+        max_wait: float = 0.005,
+        max_queue: int = 1024,
+        max_queue_wait: Optional[float] = 1.0,
+    ) -> None:
+        if max_batch_size < 1 or max_queue < 1:
+            raise ValueError("max_batch_size and max_queue must be at least 1")
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.stats = BatcherStats()
+        self._queue: Optional["asyncio.Queue[Tuple[T, asyncio.Future, float]]"] = None
+        self._filled: Optional[asyncio.Event] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._linger = False
+        self._in_flight = 0
+
+    @property
+    def depth(self) -> int:
+        """Requests waiting for a batch, excluding the batch being executed."""
+
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue(self.max_queue)
+        self._filled = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop batching and fail every request still queued."""
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(Overloaded("Server is shutting down"))
+
+    async def submit(self, item: T) -> R:
+        """Queue ``item`` and return its result once its batch has run.
+
+        Raises :class:`Overloaded` when the queue is full or the item waited
+        longer than ``max_queue_wait`` for a batch.
+        """
+
+        if self._queue is None or self._filled is None:
+            raise RuntimeError("MicroBatcher.start() has not been called")
+        stats = self.stats
+        stats.requests += 1
+        started = time.perf_counter()
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future, started))
+        except asyncio.QueueFull:
+            stats.shed += 1
+            raise Overloaded(f"Queue full ({self.max_queue} requests waiting)") from None
+        if self._queue.qsize() >= self.max_batch_size:
+            self._filled.set()
+        try:
+            return await future
+        finally:
+            stats.latency.record(time.perf_counter() - started)
+
+    async def _run(self) -> None:
+        assert self._queue is not None and self._filled is not None
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            if self._linger and queue.qsize() < self.max_batch_size - 1:
+                self._filled.clear()
+                try:
+                    await asyncio.wait_for(self._filled.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            while len(batch) < self.max_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            self._linger = len(batch) > 1
+            await self._execute(batch)
+
+    async def _execute(self, batch: List[Tuple[T, asyncio.Future, float]]) -> None:
+        stats = self.stats
+        now = time.perf_counter()
+        live: List[Tuple[T, asyncio.Future]] = []
+        for item, future, enqueued in batch:
+            if future.done():
+                # The client went away while waiting.
+                continue
+            waited = now - enqueued
+            stats.queue_wait.record(waited)
+            if self.max_queue_wait is not None and waited > self.max_queue_wait:
+                stats.shed += 1
+                future.set_exception(Overloaded(f"Waited {waited:.2f}s for a batch"))
+                continue
+            live.append((item, future))
+        if not live:
+            return
+
+        stats.batches += 1
+        stats.batched_items += len(live)
+        stats.max_batch_size = max(stats.max_batch_size, len(live))
+        items = [item for item, _ in live]
+        self._in_flight = len(live)
+        try:
+            if asyncio.iscoroutinefunction(self.handler):
+                results = await self.handler(items)
+            else:
+                results = await asyncio.to_thread(self.handler, items)
+            if len(results) != len(items):
+                raise ToolExecutionError(f"Batch handler returned {len(results)} results for {len(items)} items")
+        except Exception as exc:  # noqa: BLE001 - delivered to every caller in the batch
+            results = [exc] * len(items)
+        finally:
+            self._in_flight = 0
+        for (_, future), result in zip(live, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                stats.errors += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def tool_batch_handler(tool: "BaseTool") -> Callable[[List[Dict[str, Any]]], List[Any]]:
+    """Run a batch of tool inputs in one in-process :meth:`BaseTool.run_many` call."""
+
+    def handle(items: List[Dict[str, Any]]) -> List[Any]:
+        return [
+            result.output if result.ok else ToolExecutionError(result.error)
+            for result in tool.run_many(items, workers=1, chunksize=len(items))
+        ]
+
+    return handle
+
+
+def graph_batch_handler(compiled: Any) -> Callable[[List[Any]], Awaitable[List[Any]]]:
+    """Run a batch of agent states through one ``abatch`` call of a compiled graph.
+
+    With an :class:`~app.agent.graph.AgentGraph` the batch's tool calls run
+    grouped per tool.
+    """
+
+    async def handle(states: List[Any]) -> List[Any]:
+        results = await compiled.abatch(states, return_exceptions=True)
+        return [
+            result
+            if isinstance(result, BaseException)
+            else {"final_response": result.get("final_response"), "latest_result": result.get("latest_result")}
+            for result in results
+        ]
+
+    return handle
+
+
+class HttpError(Exception):
+    """An error answered with ``status`` and a JSON ``{"error": message}`` body."""
+
+    def __init__(self, status: HTTPStatus, message: str, *, close: bool = False) -> None:
+        super().__init__(message)
+        self.status = status
+        self.close = close
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    headers: Dict[str, str]
+    body: bytes
+    keep_alive: bool
+
+
+class Response(NamedTuple):
+    status: HTTPStatus
+    body: bytes
+    content_type: str = "application/json"
+    headers: Tuple[Tuple[str, str], ...] = ()
+
+
+def _json_response(status: HTTPStatus, document: Any, headers: Tuple[Tuple[str, str], ...] = ()) -> Response:
+    body = json.dumps(document, separators=(",", ":"), default=str).encode("utf-8")
+    return Response(status, body, headers=headers)
+
+
+async def _read_line(reader: asyncio.StreamReader) -> bytes:
+    try:
+        return await reader.readline()
+    except ValueError:
+        # ``readline`` raises this when a line is longer than the stream limit.
+        raise HttpError(
+            HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request line or header too long", close=True
+        ) from None
+
+
+async def read_request(reader: asyncio.StreamReader, max_body_bytes: int) -> Optional[Request]:
+    """Read one HTTP/1.x request, or return ``None`` when the client closed the connection."""
+
+    line = await _read_line(reader)
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line", close=True) from None
+    headers: Dict[str, str] = {}
+    for _ in range(MAX_HEADER_LINES):
+        header = await _read_line(reader)
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers", close=True)
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HttpError(HTTPStatus.LENGTH_REQUIRED, "Chunked bodies are not supported", close=True)
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length", close=True) from None
+    if length > max_body_bytes:
+        raise HttpError(
+            HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body exceeds {max_body_bytes} bytes", close=True
+        )
+    body = await reader.readexactly(length) if length else b""
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    url = urlsplit(target)
+    return Request(method.upper(), url.path, parse_qs(url.query), headers, body, keep_alive)
+
+
+def encode_response(response: Response, keep_alive: bool) -> bytes:
+    lines = [
+        f"HTTP/1.1 {response.status.value} {response.status.phrase}",
+        f"Server: {SERVER_NAME}",
+        f"Content-Type: {response.content_type}",
+        f"Content-Length: {len(response.body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    lines.extend(f"{name}: {value}" for name, value in response.headers)
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + response.body
+
+
+class AnalysisServer:
+    """HTTP front end that micro-batches requests per tool and for the agent graph.
+
+    ``tools`` maps tool names to tool instances (by default every tool of the
+    process-wide registry); ``graph`` is a compiled LangGraph graph, or
+    ``None`` to disable ``/v1/agent``. Batching and shedding parameters apply
+    to each pipeline separately.
+    """
+
+    def __init__(
+        self,
+        tools: Dict[str, "BaseTool"],
+        graph: Any = None,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        max_batch_size: int = 64,
+        max_batch_wait: float = 0.005,
+        max_queue: int = 1024,
+        max_queue_wait: Optional[float] = 1.0,
+        max_body_bytes: int = 8 * 1024 * 1024,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.max_body_bytes = max_body_bytes
+        self.started_at = time.time()
+
+        def batcher(handler: BatchHandler) -> MicroBatcher:
+            return MicroBatcher(
+                handler,
+                max_batch_size=max_batch_size,
+                max_wait=max_batch_wait,
+                max_queue=max_queue,
+                max_queue_wait=max_queue_wait,
+            )
+
+        self.pipelines: Dict[str, MicroBatcher] = {
+            f"tool:{name}": batcher(tool_batch_handler(tool)) for name, tool in tools.items()
+        }
+        if graph is not None:
+            self.pipelines["agent"] = batcher(graph_batch_handler(graph))
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    @classmethod
+    def from_registry(cls, registry: "ToolRegistry", graph: Any = None, **options: Any) -> "AnalysisServer":
+        tools = {name: registry.get(name) for name in registry.names()}
+        return cls(tools, graph, **options)  # type: ignore[arg-type]
+
+    @classmethod
+    def from_settings(cls, **overrides: Any) -> "AnalysisServer":
+        """Build a server for the default tools and, if LangGraph is installed, the agent graph."""
+
+        from importlib.util import find_spec
+
+        from app.config import get_settings
+        from app.tools.registry import get_tool_registry
+
+        settings = get_settings()
+        graph = None
+        if find_spec("langgraph") is not None:
+            from app.agent.graph import get_compiled_graph
+
+            graph = get_compiled_graph()
+        options = {
+            "host": settings.server_host,
+            "port": settings.server_port,
+            "max_batch_size": settings.server_max_batch_size,
+            "max_batch_wait": settings.server_max_batch_wait,
+            "max_queue": settings.server_max_queue,
+            "max_queue_wait": settings.server_max_queue_wait,
+            "max_body_bytes": settings.server_max_body_bytes,
+        }
+        options.update({key: value for key, value in overrides.items() if value is not None})
+        return cls.from_registry(get_tool_registry(), graph, **options)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """The bound ``(host, port)``; useful with ``port=0``."""
+
+        if self._server is None:
+            raise RuntimeError("Server is not running")
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self) -> None:
+        for pipeline in self.pipelines.values():
+            pipeline.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for pipeline in self.pipelines.values():
+            await pipeline.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, self.max_body_bytes)
+                except HttpError as exc:
+                    response = _json_response(exc.status, {"error": str(exc)})
+                    writer.write(encode_response(response, keep_alive=not exc.close))
+                    await writer.drain()
+                    if exc.close:
+                        return
+                    continue
+                if request is None:
+                    return
+                response = await self.handle(request)
+                writer.write(encode_response(response, request.keep_alive))
+                await writer.drain()
+                if not request.keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, request: Request) -> Response:
+        """Route ``request`` and turn errors into JSON responses."""
+
+        try:
+            if request.path == "/healthz" and request.method == "GET":
+                return _json_response(HTTPStatus.OK, {"status": "ok", "pipelines": sorted(self.pipelines)})
+            if request.path == "/metrics" and request.method == "GET":
+                if request.query.get("format") == ["json"]:
+                    return _json_response(HTTPStatus.OK, self.metrics())
+                return Response(HTTPStatus.OK, self.render_metrics().encode("utf-8"), "text/plain; version=0.0.4")
+            if request.path == "/v1/agent":
+                return await self._submit("agent", request, self._agent_state)
+            if request.path.startswith("/v1/tools/"):
+                return await self._submit(f"tool:{request.path[len('/v1/tools/'):]}", request, _json_object)
+            raise HttpError(HTTPStatus.NOT_FOUND, f"No route for {request.path}")
+        except HttpError as exc:
+            return _json_response(exc.status, {"error": str(exc)})
+        except Overloaded as exc:
+            return _json_response(HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(exc)}, (("Retry-After", "1"),))
+        except ToolExecutionError as exc:
+            return _json_response(HTTPStatus.UNPROCESSABLE_ENTITY, {"error": str(exc)})
+        except Exception as exc:  # noqa: BLE001 - reported to the client
+            return _json_response(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(exc).__name__}: {exc}"})
+
+    async def _submit(self, name: str, request: Request, parse: Callable[[bytes], Any]) -> Response:
+        pipeline = self.pipelines.get(name)
+        if pipeline is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Unknown pipeline {name.partition(':')[2] or name!r}")
+        if request.method != "POST":
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST")
+        return _json_response(HTTPStatus.OK, await pipeline.submit(parse(request.body)))
+
+    @staticmethod
+    def _agent_state(body: bytes) -> Any:
+        from app.agent.state import AgentState
+
+        document = _json_object(body)
+        if not isinstance(document.get("user_goal"), str):
+            raise HttpError(HTTPStatus.UNPROCESSABLE_ENTITY, "'user_goal' must be a string")
+        session_id = document.get("session_id")
+        if session_id is not None and not isinstance(session_id, str):
+            raise HttpError(HTTPStatus.UNPROCESSABLE_ENTITY, "'session_id' must be a string")
+        return AgentState(
+            user_goal=document["user_goal"], mode=document.get("mode", "optimizer"), session_id=session_id
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-pipeline queue depth, counters and latency percentiles."""
+
+        document: Dict[str, Any] = {"uptime_s": time.time() - self.started_at, "pipelines": {}}
+        for name, pipeline in self.pipelines.items():
+            stats = pipeline.stats
+            document["pipelines"][name] = {
+                "queue_depth": pipeline.depth,
+                "in_flight": pipeline.in_flight,
+                "queue_capacity": pipeline.max_queue,
+                "requests": stats.requests,
+                "shed": stats.shed,
+                "errors": stats.errors,
+                "batches": stats.batches,
+                "mean_batch_size": stats.mean_batch_size,
+                "max_batch_size": stats.max_batch_size,
+                "latency": stats.latency.summary(),
+                "queue_wait": stats.queue_wait.summary(),
+            }
+        return document
+
+    def render_metrics(self) -> str:
+        """Render :meth:`metrics` in the Prometheus text exposition format."""
+
+        families: Dict[str, Tuple[str, List[str]]] = {}
+
+        def add(metric: str, kind: str, labels: str, value: float) -> None:
+            families.setdefault(metric, (kind, []))[1].append(f"{metric}{{{labels}}} {value:.9g}")
+
+        for name, pipeline in self.pipelines.items():
+            stats = pipeline.stats
+            labels = f'pipeline="{name}"'
+            add("lean_agent_queue_depth", "gauge", labels, pipeline.depth)
+            add("lean_agent_in_flight", "gauge", labels, pipeline.in_flight)
+            add("lean_agent_requests_total", "counter", labels, stats.requests)
+            add("lean_agent_shed_total", "counter", labels, stats.shed)
+            add("lean_agent_errors_total", "counter", labels, stats.errors)
+            add("lean_agent_batches_total", "counter", labels, stats.batches)
+            add("lean_agent_batched_requests_total", "counter", labels, stats.batched_items)
+            for metric, histogram in (
+                ("lean_agent_latency_seconds", stats.latency),
+                ("lean_agent_queue_wait_seconds", stats.queue_wait),
+            ):
+                for q in (50, 90, 99):
+                    add(metric, "summary", f'{labels},quantile="{q / 100}"', histogram.percentile(q))
+                families[metric][1].append(f"{metric}_sum{{{labels}}} {histogram.total:.9g}")
+                families[metric][1].append(f"{metric}_count{{{labels}}} {histogram.count}")
+        lines: List[str] = []
+        for metric, (kind, samples) in families.items():
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def _json_object(body: bytes) -> Dict[str, Any]:
+    try:
+        document = json.loads(body or b"{}")
+    except ValueError as exc:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {exc}") from None
+    if not isinstance(document, dict):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "The request body must be a JSON object")
+    return document
+
+
+def serve(server: AnalysisServer, on_ready: Optional[Callable[[Tuple[str, int]], None]] = None) -> None:
+    """Run ``server`` until interrupted."""
+
+    async def main() -> None:
+        await server.start()
+        if on_ready is not None:
+            on_ready(server.address)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,400 @@
+"""Local similarity index over past analyses.
+
+Process descriptions are embedded as hashed TF-IDF vectors (unigrams and
+bigrams hashed into a fixed number of signed buckets) and stored row by row in
+a memory-mapped NumPy matrix, with descriptions and their analyses kept in
+SQLite alongside. Small indexes are searched exhaustively; large ones are
+narrowed with SimHash signatures first (see :class:`SimilarityIndex`). Nothing
+needs training, and exact repeats are answered from a hash lookup before any
+vector search.
+
+:class:`AnalysisIndex` is the interface the agent depends on, so a pgvector
+backed implementation can replace :class:`SimilarityIndex` later.
+
+NumPy is an optional dependency and is imported on first use.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, Optional, Protocol, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+# Multiplier mixing two token hashes into a bigram hash (Knuth's golden ratio).
+_BIGRAM_MULTIPLIER = 0x9E3779B1
+_HASH_CACHE_SIZE = 1 << 20
+# Rows scanned per matrix-vector product during a search.
+_SEARCH_CHUNK_ROWS = 1 << 17
+VECTORS_FILENAME = "vectors.f32"
+SIGNATURES_FILENAME = "signatures.u64"
+PAYLOADS_FILENAME = "analyses.sqlite3"
+
+
+class Match(NamedTuple):
+    """A stored analysis returned by a similarity search."""
+
+    score: float
+    row: int
+    description: str
+    output: Dict[str, Any]
+
+
+class AnalysisIndex(Protocol):
+    """Store of past analyses searchable by description similarity."""
+
+    def add(self, description: str, output: Dict[str, Any]) -> int:
+        ...
+
+    def search(self, description: str, k: int = 5) -> List[Match]:
+        ...
+
+    def lookup(self, description: str, threshold: float) -> Optional[Match]:
+        ...
+
+
+def _normalise_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class HashedTfidfVectoriser:
+    """Embed texts with the hashing trick and sublinear, signed term frequencies.
+
+    Each unigram and bigram is hashed with CRC-32; the low bits pick one of
+    ``dim`` buckets and the top bit a sign, so collisions tend to cancel
+    instead of accumulate. IDF weights are supplied by the caller, which lets
+    the index keep document frequencies up to date as it grows.
+    """
+
+    def __init__(self, dim: int = 256) -> None:
+        if dim < 2 or dim & (dim - 1):
+            raise ValueError("dim must be a power of two")
+        self.dim = dim
+        self._hashes: Dict[str, int] = {}
+
+    def _hash(self, token: str) -> int:
+        value = self._hashes.get(token)
+        if value is None:
+            if len(self._hashes) >= _HASH_CACHE_SIZE:
+                self._hashes.clear()
+            value = self._hashes[token] = zlib.crc32(token.encode("utf-8"))
+        return value
+
+    def term_frequencies(self, texts: Sequence[str]) -> "np.ndarray":
+        """Return a ``len(texts) × dim`` array of signed, sublinear term frequencies."""
+
+        import numpy as np
+
+        hashes: List[int] = []
+        lengths: List[int] = []
+        hash_token = self._hash
+        for text in texts:
+            tokens = _TOKEN.findall(text.lower())
+            hashes.extend([hash_token(token) for token in tokens])
+            lengths.append(len(tokens))
+
+        documents = len(texts)
+        unigram = np.asarray(hashes, dtype=np.uint64)
+        rows = np.repeat(np.arange(documents, dtype=np.int64), lengths)
+        same_document = rows[1:] == rows[:-1]
+        bigram = ((unigram[:-1] * np.uint64(_BIGRAM_MULTIPLIER) + unigram[1:]) & np.uint64(0xFFFFFFFF))[same_document]
+        features = np.concatenate((unigram, bigram))
+        feature_rows = np.concatenate((rows, rows[:-1][same_document]))
+
+        buckets = (features & np.uint64(self.dim - 1)).astype(np.int64)
+        signs = np.where(features >> np.uint64(31) & np.uint64(1), -1.0, 1.0)
+        counts = np.bincount(feature_rows * self.dim + buckets, weights=signs, minlength=documents * self.dim)
+        counts = counts.reshape(documents, self.dim)
+        return (np.sign(counts) * np.log1p(np.abs(counts))).astype(np.float32)
+
+    @staticmethod
+    def idf(document_frequency: "np.ndarray", documents: int) -> "np.ndarray":
+        import numpy as np
+
+        return (np.log((1.0 + documents) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+
+    @staticmethod
+    def normalise(vectors: "np.ndarray") -> "np.ndarray":
+        import numpy as np
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class _GrowableMatrix:
+    """A memory-mapped 2-D array on disk whose row capacity doubles on demand."""
+
+    def __init__(self, path: Path, dtype: "np.dtype", width: int) -> None:
+        import numpy as np
+
+        self.path = path
+        self.dtype = dtype
+        self.width = width
+        self.array: Optional["np.memmap"] = None
+        self.capacity = 0
+        if path.exists():
+            self.capacity = path.stat().st_size // (width * dtype.itemsize)
+            if self.capacity:
+                self.array = np.memmap(path, dtype=dtype, mode="r+", shape=(self.capacity, width))
+
+    def reserve(self, rows: int) -> "np.memmap":
+        import numpy as np
+
+        if self.array is not None and rows <= self.capacity:
+            return self.array
+        capacity = max(rows, self.capacity * 2, 1024)
+        self.flush()
+        self.array = None
+        with open(self.path, "ab") as handle:
+            handle.truncate(capacity * self.width * self.dtype.itemsize)
+        self.capacity = capacity
+        self.array = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(capacity, self.width))
+        return self.array
+
+    def flush(self) -> None:
+        if self.array is not None:
+            self.array.flush()
+
+
+def _popcount(values: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    table = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+    return table[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+class SimilarityIndex:
+    """Cosine search over a memory-mapped matrix of analyses.
+
+    Up to ``exact_rows`` stored analyses are searched exhaustively. Larger
+    indexes first rank rows by the Hamming distance between 256-bit SimHash
+    signatures (random-hyperplane LSH, 32 bytes per row) and rescore only the
+    closest ``candidates`` rows exactly, so latency tracks the size of the
+    signature array rather than the full matrix.
+
+    Vectors are weighted with the IDF in effect when they are added; document
+    frequencies keep accumulating, so queries use the current IDF. For
+    near-duplicate detection, which is what the index serves, the drift is
+    negligible once a few thousand analyses are stored.
+    """
+
+    signature_bits = 256
+    signature_seed = 20240611
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        dim: int = 256,
+        exact_rows: int = 50_000,
+        candidates: int = 4096,
+    ) -> None:
+        import numpy as np
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.exact_rows = exact_rows
+        self.candidates = candidates
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.directory / PAYLOADS_FILENAME, timeout=30, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " row INTEGER PRIMARY KEY, text_hash TEXT NOT NULL, description TEXT NOT NULL, output TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS analyses_by_hash ON analyses (text_hash);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB NOT NULL);"
+        )
+        meta = dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+        # An existing index keeps the dimensionality it was created with.
+        self.dim = int(meta.get("dim", dim))
+        self.vectoriser = HashedTfidfVectoriser(self.dim)
+        self._count = int(meta.get("count", 0))
+        frequencies = meta.get("df")
+        self._document_frequency = (
+            np.frombuffer(frequencies, dtype=np.int64).copy()
+            if frequencies is not None
+            else np.zeros(self.dim, dtype=np.int64)
+        )
+        self._hyperplanes = (
+            np.random.default_rng(self.signature_seed)
+            .standard_normal((self.signature_bits, self.dim))
+            .astype(np.float32)
+        )
+        self._vectors = _GrowableMatrix(self.directory / VECTORS_FILENAME, np.dtype(np.float32), self.dim)
+        self._signatures = _GrowableMatrix(
+            self.directory / SIGNATURES_FILENAME, np.dtype(np.uint64), self.signature_bits // 64
+        )
+
+    def __len__(self) -> int:
+        return self._count
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """Return L2-normalised TF-IDF vectors for ``texts`` under the current IDF."""
+
+        with self._lock:
+            idf = self.vectoriser.idf(self._document_frequency, max(self._count, 1))
+            return self.vectoriser.normalise(self.vectoriser.term_frequencies(texts) * idf)
+
+    def sign(self, vectors: "np.ndarray") -> "np.ndarray":
+        """Return the SimHash signature of each vector as rows of 64-bit words."""
+
+        import numpy as np
+
+        bits = (vectors @ self._hyperplanes.T) > 0
+        return np.packbits(bits, axis=1, bitorder="little").view(np.uint64)
+
+    def add(self, description: str, output: Dict[str, Any]) -> int:
+        return self.add_many([(description, output)])[0]
+
+    def add_many(self, items: Iterable[Tuple[str, Dict[str, Any]]], *, batch_size: int = 10_000) -> List[int]:
+        """Store ``(description, output)`` pairs and return their row numbers."""
+
+        from itertools import islice
+
+        rows: List[int] = []
+        iterator = iter(items)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return rows
+            rows.extend(self._add_batch(batch))
+
+    def _add_batch(self, batch: Sequence[Tuple[str, Dict[str, Any]]]) -> List[int]:
+        import numpy as np
+
+        frequencies = self.vectoriser.term_frequencies([description for description, _ in batch])
+        with self._lock:
+            start = self._count
+            count = start + len(batch)
+            self._document_frequency += (frequencies != 0).sum(axis=0)
+            idf = self.vectoriser.idf(self._document_frequency, count)
+            vectors = self.vectoriser.normalise(frequencies * idf)
+            self._vectors.reserve(count)[start:count] = vectors
+            self._signatures.reserve(count)[start:count] = self.sign(vectors)
+            self._vectors.flush()
+            self._signatures.flush()
+            # Rows past the committed count are ignored on reopen, so a crash
+            # between the two writes leaves the index consistent.
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO analyses (row, text_hash, description, output) VALUES (?, ?, ?, ?)",
+                    [
+                        (
+                            start + offset,
+                            _text_hash(description),
+                            description,
+                            json.dumps(output, separators=(",", ":"), default=str),
+                        )
+                        for offset, (description, output) in enumerate(batch)
+                    ],
+                )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [
+                        ("dim", self.dim),
+                        ("count", count),
+                        ("df", self._document_frequency.astype(np.int64).tobytes()),
+                    ],
+                )
+            self._count = count
+            return list(range(start, count))
+
+    def _fetch(self, row: int, score: float) -> Match:
+        description, output = self._db.execute(
+            "SELECT description, output FROM analyses WHERE row = ?", (row,)
+        ).fetchone()
+        return Match(score, row, description, json.loads(output))
+
+    def _scan(self, query: "np.ndarray", k: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        import numpy as np
+
+        matrix = self._vectors.array
+        best_rows: List["np.ndarray"] = []
+        best_scores: List["np.ndarray"] = []
+        for start in range(0, self._count, _SEARCH_CHUNK_ROWS):
+            scores = matrix[start : min(start + _SEARCH_CHUNK_ROWS, self._count)] @ query
+            top = np.argpartition(scores, -k)[-k:] if len(scores) > k else np.arange(len(scores))
+            best_rows.append(top + start)
+            best_scores.append(scores[top])
+        return np.concatenate(best_rows), np.concatenate(best_scores)
+
+    def _rerank(self, query: "np.ndarray", k: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        import numpy as np
+
+        signature = self.sign(query[None, :])[0]
+        counts = _popcount(self._signatures.array[: self._count] ^ signature)
+        # Summing the few word columns one by one beats a short-axis reduction.
+        distances = counts[:, 0].astype(np.uint16)
+        for word in range(1, counts.shape[1]):
+            distances += counts[:, word]
+        shortlist = min(max(self.candidates, k), self._count)
+        # Distances are small integers, so a histogram finds the cut-off in one
+        # pass where argpartition would need several over the whole array.
+        cumulative = np.cumsum(np.bincount(distances, minlength=self.signature_bits + 1))
+        cutoff = int(np.searchsorted(cumulative, shortlist))
+        closer = np.flatnonzero(distances < cutoff)
+        tied = np.flatnonzero(distances == cutoff)[: shortlist - len(closer)]
+        rows = np.sort(np.concatenate((closer, tied)))
+        return rows, self._vectors.array[rows] @ query
+
+    def search(self, description: str, k: int = 5, *, exact: bool = False) -> List[Match]:
+        """Return the ``k`` most similar stored analyses, best first.
+
+        ``exact=True`` forces an exhaustive scan regardless of index size.
+        """
+
+        import numpy as np
+
+        with self._lock:
+            if not self._count:
+                return []
+            query = self.embed([description])[0]
+            if exact or self._count <= self.exact_rows:
+                rows, scores = self._scan(query, k)
+            else:
+                rows, scores = self._rerank(query, k)
+            order = np.argsort(-scores, kind="stable")[:k]
+            return [self._fetch(int(rows[index]), float(scores[index])) for index in order]
+
+    def lookup(self, description: str, threshold: float = 0.9) -> Optional[Match]:
+        """Return the closest analysis if its cosine similarity reaches ``threshold``."""
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT row FROM analyses WHERE text_hash = ? ORDER BY row DESC LIMIT 1", (_text_hash(description),)
+            ).fetchone()
+            if row is not None:
+                return self._fetch(row[0], 1.0)
+            matches = self.search(description, k=1)
+        if matches and matches[0].score >= threshold:
+            return matches[0]
+        return None
+
+    def close(self) -> None:
+        with self._lock:
+            self._vectors.flush()
+            self._signatures.flush()
+            self._db.close()
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(_normalise_text(text).encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def get_similarity_index() -> Optional[SimilarityIndex]:
+    """Return the process-wide index, or ``None`` when ``Settings.similarity_index_dir`` is unset."""
+
+    from app.config import get_settings
+
+    directory = get_settings().similarity_index_dir
+    return SimilarityIndex(directory) if directory is not None else None
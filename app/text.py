@@ -0,0 +1,109 @@
+"""Shared preprocessing of process narratives.
+
+The graph analyses the user's text once per input and hands the resulting
+:class:`AnalysedText` to every tool call on that text (see
+:meth:`app.tools.base.BaseTool.run`), so adding tools does not add another
+pass of lowercasing, tokenisation and sentence splitting per request.
+"""
+from __future__ import annotations
+
+import re
+import sys
+from bisect import bisect_right
+from itertools import accumulate
+from typing import NamedTuple, Optional, Tuple
+
+# Splitting on separators yields tokens and, through their lengths, their
+# offsets in one regex pass.
+_SEPARATOR = re.compile(r"(\W+)")
+# A sentence ends at terminal punctuation followed by whitespace (or the end
+# of the text), or at a blank line.
+_SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)|\n[^\S\n]*\n")
+
+
+def normalise(text: str) -> str:
+    """Lowercase ``text`` character by character, keeping every offset intact.
+
+    The few characters whose lowercase form has a different length (such as
+    ``"İ"``) are left as they are, so offsets into the result are offsets into
+    ``text``.
+    """
+
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(lower if len(lower := char.lower()) == 1 else char for char in text)
+
+
+def _sentence_spans(text: str) -> Tuple[Tuple[int, int], ...]:
+    spans = []
+    start = 0
+    length = len(text)
+    for end in _SENTENCE_END.finditer(text):
+        stop = end.end() if text[end.start()] != "\n" else end.start()
+        while start < stop and text[start].isspace():
+            start += 1
+        if start < stop:
+            spans.append((start, stop))
+        start = end.end()
+    while start < length and text[start].isspace():
+        start += 1
+    if start < length:
+        spans.append((start, len(text.rstrip())))
+    return tuple(spans)
+
+
+class AnalysedText(NamedTuple):
+    """Immutable, preprocessed view of one text.
+
+    ``normalised`` has the same length as ``text``, so every offset applies to
+    both. ``tokens`` are the interned ``\\w+`` runs of ``normalised``, with
+    ``token_starts[i]:token_ends[i]`` locating token ``i``; ``sentences``
+    holds ``(start, end)`` spans with surrounding whitespace trimmed.
+    """
+
+    text: str
+    normalised: str
+    tokens: Tuple[str, ...]
+    token_starts: Tuple[int, ...]
+    token_ends: Tuple[int, ...]
+    sentences: Tuple[Tuple[int, int], ...]
+
+    @classmethod
+    def from_text(cls, text: str) -> "AnalysedText":
+        normalised = normalise(text)
+        parts = _SEPARATOR.split(normalised)
+        offsets = list(accumulate(map(len, parts), initial=0))
+        words = parts[0::2]
+        # Only the first and last pieces can be empty (text starting or ending
+        # with a separator).
+        first = 1 if words[0] == "" else 0
+        last = len(words) - (1 if words[-1] == "" else 0)
+        return cls(
+            text,
+            normalised,
+            tuple(map(sys.intern, words[first:last])),
+            tuple(offsets[0::2][first:last]),
+            tuple(offsets[1::2][first:last]),
+            _sentence_spans(text),
+        )
+
+    def token_at(self, offset: int) -> Optional[int]:
+        """Index of the token covering character ``offset``, if any."""
+
+        index = bisect_right(self.token_starts, offset) - 1
+        if index >= 0 and offset < self.token_ends[index]:
+            return index
+        return None
+
+    def sentence_at(self, offset: int) -> Optional[int]:
+        """Index of the sentence covering character ``offset``, if any."""
+
+        index = bisect_right(self.sentences, (offset, len(self.text) + 1)) - 1
+        if index >= 0 and offset < self.sentences[index][1]:
+            return index
+        return None
+
+    def sentence(self, index: int) -> str:
+        start, end = self.sentences[index]
+        return self.text[start:end]
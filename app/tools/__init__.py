@@ -1,4 +1,45 @@
-"""Tool catalogue exports for the Lean Concepts Agent."""
-from .waste_detector import WasteDetector
+"""Tool catalogue exports for the Lean Concepts Agent.
 
-__all__ = ["WasteDetector"]
+Exports are resolved lazily so importing :mod:`app.tools` does not pay for
+compiling keyword tables or loading tools the caller never uses.
+"""
+from __future__ import annotations
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .base import BaseTool, BatchResult, ToolExecutionError
+    from .cache import ToolCache
+    from .corpus_scorer import CorpusScorer
+    from .registry import ToolRegistry, get_tool_registry
+    from .rulesets import Ruleset, RulesetRegistry
+    from .waste_detector import WasteDetector
+
+_EXPORTS = {
+    "BaseTool": ".base",
+    "BatchResult": ".base",
+    "ToolExecutionError": ".base",
+    "ToolCache": ".cache",
+    "CorpusScorer": ".corpus_scorer",
+    "ToolRegistry": ".registry",
+    "get_tool_registry": ".registry",
+    "Ruleset": ".rulesets",
+    "RulesetRegistry": ".rulesets",
+    "WasteDetector": ".waste_detector",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(__all__))
@@ -1,11 +1,39 @@
 """Common utilities for defining Lean Concepts Agent tools."""
 from __future__ import annotations
 
+import os
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Generic, Type, TypeVar
+from collections import deque
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Deque,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
 from pydantic import BaseModel
 
+from app import tracing
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from app.text import AnalysedText
+
+    from .cache import ToolCache
+
 InputSchema = TypeVar("InputSchema", bound=BaseModel)
 OutputSchema = TypeVar("OutputSchema", bound=BaseModel)
 
@@ -14,6 +42,20 @@ class ToolExecutionError(RuntimeError):
     """Raised when a tool fails to generate a valid response."""
 
 
+class BatchResult(NamedTuple):
+    """Outcome of a single item processed by :meth:`BaseTool.run_many`."""
+
+    index: int
+    output: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    # Time spent executing the item; 0 when it failed validation.
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
 class BaseTool(ABC, Generic[InputSchema, OutputSchema]):
     """Abstract base class that all tools must inherit from."""
 
@@ -21,19 +63,276 @@ class BaseTool(ABC, Generic[InputSchema, OutputSchema]):
     description: str
     input_schema: Type[InputSchema]
     output_schema: Type[OutputSchema]
+    version: str = "1"
+    # Input field holding the narrative the tool analyses, if any. Inputs whose
+    # field matches a supplied AnalysedText are routed to ``_run_analysed``.
+    text_field: Optional[str] = None
+
+    def __init__(self, cache: Optional["ToolCache"] = None) -> None:
+        self.cache = cache
+
+    def cache_token(self) -> str:
+        """Return a token that changes whenever cached results become stale.
+
+        Tools whose behaviour depends on data tables should extend this so
+        edits to those tables invalidate previously cached outputs.
+        """
+
+        return self.version
+
+    def input_token(self, parsed_input: InputSchema) -> Optional[str]:
+        """Return a token for data selected by an individual input, if any.
+
+        Tools whose inputs pick among versioned tables (such as rulesets)
+        override this so a cached result is keyed on the table version it used.
+        """
+
+        return None
+
+    def warm_up(self) -> None:
+        """Prepare expensive resources before the first call. No-op by default."""
 
     def parse_input(self, data: Dict[str, Any]) -> InputSchema:
         """Validate raw input data against the tool's input schema."""
 
         return self.input_schema.model_validate(data)
 
+    def parse_many(self, items: Iterable[Dict[str, Any]]) -> List[InputSchema | Exception]:
+        """Validate several inputs, returning the exception in place of invalid items."""
+
+        parsed: List[InputSchema | Exception] = []
+        for data in items:
+            try:
+                parsed.append(self.parse_input(data))
+            except Exception as exc:  # noqa: BLE001 - reported per item
+                parsed.append(exc)
+        return parsed
+
     @abstractmethod
     def _run(self, parsed_input: InputSchema) -> OutputSchema:
         """Execute the tool and return the validated output."""
 
-    def run(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute the tool with validated input and output schemas."""
+    def _run_analysed(self, parsed_input: InputSchema, analysed: "AnalysedText") -> OutputSchema:
+        """Execute using the shared preprocessing of the input's ``text_field``.
+
+        Tools that tokenise their input override this to reuse ``analysed``
+        instead of processing the text again; by default it is ignored.
+        """
+
+        return self._run(parsed_input)
+
+    def _analysed_for(self, parsed_input: InputSchema, analysed: Optional["AnalysedText"]) -> Optional["AnalysedText"]:
+        if analysed is None or self.text_field is None:
+            return None
+        text = getattr(parsed_input, self.text_field, None)
+        return analysed if text is analysed.text or text == analysed.text else None
+
+    def run(self, data: Dict[str, Any], analysed: Optional["AnalysedText"] = None) -> Dict[str, Any]:
+        """Execute the tool with validated input and output schemas.
+
+        ``analysed`` is the preprocessed form of the input's text, when the
+        caller already has it (see :mod:`app.text`).
+        """
+
+        tracer = tracing.get_tracer()
+        if not tracer.enabled:
+            return self._execute(self.parse_input(data), analysed)
+        with tracer.span("tool", self.name) as span:
+            span.input_bytes = tracing.payload_size(data)
+            result = self._execute(self.parse_input(data), analysed)
+            span.output_bytes = tracing.payload_size(result)
+            return result
+
+    async def _arun(self, parsed_input: InputSchema) -> OutputSchema:
+        """Asynchronous counterpart of :meth:`_run`.
+
+        Tools that only implement :meth:`_run` are offloaded to a worker thread
+        so they never block the event loop; natively async tools override this.
+        """
+
+        import asyncio
+
+        return await asyncio.to_thread(self._run, parsed_input)
+
+    async def arun(self, data: Dict[str, Any], analysed: Optional["AnalysedText"] = None) -> Dict[str, Any]:
+        """Asynchronously execute the tool with validated input and output schemas."""
 
+        tracer = tracing.get_tracer()
+        if not tracer.enabled:
+            return await self._aexecute(data, analysed)
+        with tracer.span("tool", self.name) as span:
+            span.input_bytes = tracing.payload_size(data)
+            result = await self._aexecute(data, analysed)
+            span.output_bytes = tracing.payload_size(result)
+            return result
+
+    async def _acompute(self, parsed_input: InputSchema, analysed: Optional["AnalysedText"]) -> OutputSchema:
+        usable = self._analysed_for(parsed_input, analysed)
+        if usable is None:
+            return await self._arun(parsed_input)
+        import asyncio
+
+        return await asyncio.to_thread(self._run_analysed, parsed_input, usable)
+
+    async def _aexecute(self, data: Dict[str, Any], analysed: Optional["AnalysedText"] = None) -> Dict[str, Any]:
         parsed_input = self.parse_input(data)
-        result = self._run(parsed_input)
+        cache = self.cache
+        if cache is None:
+            return (await self._acompute(parsed_input, analysed)).model_dump()
+        key = cache.key_for(self, parsed_input)
+        cached = cache.get(self, key)
+        if cached is not None:
+            return cached
+        result = await self._acompute(parsed_input, analysed)
+        cache.put(self, key, result)
+        return result.model_dump()
+
+    def _compute(self, parsed_input: InputSchema, analysed: Optional["AnalysedText"]) -> OutputSchema:
+        usable = self._analysed_for(parsed_input, analysed)
+        return self._run(parsed_input) if usable is None else self._run_analysed(parsed_input, usable)
+
+    def _execute(self, parsed_input: InputSchema, analysed: Optional["AnalysedText"] = None) -> Dict[str, Any]:
+        """Run validated input, consulting the result cache when one is attached."""
+
+        cache = self.cache
+        if cache is None:
+            return self._compute(parsed_input, analysed).model_dump()
+        key = cache.key_for(self, parsed_input)
+        cached = cache.get(self, key)
+        if cached is not None:
+            return cached
+        result = self._compute(parsed_input, analysed)
+        cache.put(self, key, result)
         return result.model_dump()
+
+    def run_batch(
+        self,
+        items: Sequence[Dict[str, Any]],
+        analysed: Optional[Sequence[Optional["AnalysedText"]]] = None,
+    ) -> List[Dict[str, Any] | Exception]:
+        """Execute the tool over several inputs in one call, in-process.
+
+        ``analysed`` optionally pairs each input with its preprocessed text. The
+        exception is returned in place of an input that fails, so one bad item
+        never aborts the others.
+        """
+
+        tracer = tracing.get_tracer()
+        if not tracer.enabled:
+            return self._execute_batch(items, analysed)
+        with tracer.span("tool", self.name) as span:
+            span.input_bytes = tracing.payload_size(items)
+            results = self._execute_batch(items, analysed)
+            span.output_bytes = tracing.payload_size([result for result in results if isinstance(result, dict)])
+            return results
+
+    def _execute_batch(
+        self, items: Sequence[Dict[str, Any]], analysed: Optional[Sequence[Optional["AnalysedText"]]]
+    ) -> List[Dict[str, Any] | Exception]:
+        texts = analysed if analysed is not None else [None] * len(items)
+        results: List[Dict[str, Any] | Exception] = []
+        for parsed, text in zip(self.parse_many(items), texts):
+            if isinstance(parsed, Exception):
+                results.append(parsed)
+                continue
+            try:
+                results.append(self._execute(parsed, text))
+            except Exception as exc:  # noqa: BLE001 - reported per item
+                results.append(exc)
+        return results
+
+    def _run_chunk(self, chunk: Sequence[Tuple[int, Dict[str, Any]]]) -> List[BatchResult]:
+        """Validate and execute a chunk of indexed inputs, capturing per-item errors."""
+
+        results: List[BatchResult] = []
+        parsed_items = self.parse_many(data for _, data in chunk)
+        for (index, _), parsed in zip(chunk, parsed_items):
+            if isinstance(parsed, Exception):
+                results.append(BatchResult(index=index, error=_describe_error(parsed)))
+                continue
+            started = time.perf_counter()
+            try:
+                output = self._execute(parsed)
+            except Exception as exc:  # noqa: BLE001 - reported per item
+                results.append(BatchResult(index, error=_describe_error(exc), seconds=time.perf_counter() - started))
+            else:
+                results.append(BatchResult(index, output=output, seconds=time.perf_counter() - started))
+        return results
+
+    def run_many(
+        self,
+        items: Iterable[Dict[str, Any]],
+        *,
+        workers: Optional[int] = None,
+        chunksize: int = 64,
+        ordered: bool = True,
+    ) -> Iterator[BatchResult]:
+        """Execute the tool over many inputs, fanning chunks out to a process pool.
+
+        Results are yielded lazily, either in input order or as chunks complete
+        when ``ordered`` is false. Invalid inputs and failing items produce a
+        :class:`BatchResult` carrying the error instead of aborting the batch.
+        ``workers`` defaults to the CPU count; ``workers=1`` runs in-process.
+        """
+
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+        if chunksize < 1:
+            raise ValueError("chunksize must be at least 1")
+        workers = (os.cpu_count() or 1) if workers is None else workers
+        chunks = _chunked(enumerate(items), chunksize)
+
+        if workers <= 1:
+            for chunk in chunks:
+                yield from self._run_chunk(chunk)
+            return
+
+        # Only a bounded number of chunks are in flight so arbitrarily large
+        # iterables are streamed rather than materialised up front.
+        max_in_flight = workers * 2
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as pool:
+            pending: Deque[Future] = deque()
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < max_in_flight:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                        break
+                    pending.append(pool.submit(_run_worker_chunk, chunk))
+                if not pending:
+                    return
+                if ordered:
+                    yield from pending.popleft().result()
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield from future.result()
+
+
+_WORKER_TOOL: Optional[BaseTool] = None
+
+
+def _init_worker(tool: BaseTool) -> None:
+    global _WORKER_TOOL
+    _WORKER_TOOL = tool
+
+
+def _run_worker_chunk(chunk: Sequence[Tuple[int, Dict[str, Any]]]) -> List[BatchResult]:
+    if _WORKER_TOOL is None:
+        raise ToolExecutionError("Worker process was not initialised with a tool.")
+    return _WORKER_TOOL._run_chunk(chunk)
+
+
+def _chunked(items: Iterable[Tuple[int, Dict[str, Any]]], size: int) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _describe_error(exc: Exception) -> str:
+    return f"{type(exc).__name__}: {exc}"
@@ -0,0 +1,190 @@
+"""Content-addressed result cache shared by Lean Concepts Agent tools."""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from .base import BaseTool
+
+DISK_CACHE_FILENAME = "tool_cache.sqlite3"
+
+
+@dataclass
+class CacheStats:
+    """Counters describing cache effectiveness."""
+
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ToolCache:
+    """Two-tier cache keyed on a stable hash of a tool invocation.
+
+    Keys combine the tool name, its :meth:`BaseTool.cache_token` and the
+    canonical JSON of the validated input. The first tier is a bounded
+    in-memory LRU holding output models; the optional second tier persists the
+    dumped outputs to SQLite under ``directory``. Entries written under an older
+    cache token are purged the first time a tool touches the disk tier, so
+    changing a tool's rules invalidates its stored results automatically.
+    """
+
+    def __init__(self, max_entries: int = 1024, directory: Optional[Path] = None) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory is not None else None
+        self.stats = CacheStats()
+        self._memory: "OrderedDict[str, BaseModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._validated_tokens: Set[str] = set()
+
+    @classmethod
+    def from_settings(cls) -> "ToolCache":
+        """Build a cache configured from :class:`app.config.Settings`."""
+
+        from app.config import get_settings
+
+        settings = get_settings()
+        return cls(max_entries=settings.cache_max_entries, directory=settings.cache_dir)
+
+    def key_for(self, tool: "BaseTool", parsed_input: BaseModel) -> str:
+        """Return the content address of running ``tool`` on ``parsed_input``."""
+
+        document = {"tool": tool.name, "token": tool.cache_token(), "input": parsed_input.model_dump()}
+        input_token = tool.input_token(parsed_input)
+        if input_token is not None:
+            document["input_token"] = input_token
+        payload = json.dumps(
+            document,
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, tool: "BaseTool", key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of the cached output for ``key`` or ``None``."""
+
+        with self._lock:
+            model = self._memory.get(key)
+            if model is not None:
+                self._memory.move_to_end(key)
+                self.stats.hits += 1
+                return model.model_dump()
+            stored = self._disk_get(tool, key)
+            if stored is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            self.stats.disk_hits += 1
+            model = tool.output_schema.model_validate(stored)
+            self._remember(key, model)
+            return model.model_dump()
+
+    def put(self, tool: "BaseTool", key: str, output: BaseModel) -> None:
+        """Store ``output`` under ``key`` in every configured tier."""
+
+        with self._lock:
+            self._remember(key, output)
+            self._disk_put(tool, key, output)
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+
+        with self._lock:
+            self._memory.clear()
+            connection = self._disk()
+            if connection is not None:
+                with connection:
+                    connection.execute("DELETE FROM entries")
+
+    def _remember(self, key: str, output: BaseModel) -> None:
+        self._memory[key] = output
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        if self.directory is None:
+            return None
+        if self._connection is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.directory / DISK_CACHE_FILENAME,
+                timeout=30,
+                check_same_thread=False,
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, tool TEXT NOT NULL, token TEXT NOT NULL, value TEXT NOT NULL)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def _disk_for(self, tool: "BaseTool") -> Optional[sqlite3.Connection]:
+        connection = self._disk()
+        if connection is None:
+            return None
+        token = tool.cache_token()
+        marker = f"{tool.name}\x00{token}"
+        if marker not in self._validated_tokens:
+            with connection:
+                cursor = connection.execute(
+                    "DELETE FROM entries WHERE tool = ? AND token != ?",
+                    (tool.name, token),
+                )
+            self.stats.invalidations += cursor.rowcount
+            self._validated_tokens.add(marker)
+        return connection
+
+    def _disk_get(self, tool: "BaseTool", key: str) -> Optional[Dict[str, Any]]:
+        connection = self._disk_for(tool)
+        if connection is None:
+            return None
+        row = connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _disk_put(self, tool: "BaseTool", key: str, output: BaseModel) -> None:
+        connection = self._disk_for(tool)
+        if connection is None:
+            return
+        value = json.dumps(output.model_dump(), separators=(",", ":"), default=str)
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, tool, token, value) VALUES (?, ?, ?, ?)",
+                (key, tool.name, tool.cache_token(), value),
+            )
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Worker processes start with an empty memory tier and reopen SQLite lazily.
+        return {"max_entries": self.max_entries, "directory": self.directory}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
+
+
+@lru_cache(maxsize=1)
+def get_tool_cache() -> ToolCache:
+    """Return the process-wide :class:`ToolCache` configured from settings."""
+
+    return ToolCache.from_settings()
@@ -0,0 +1,342 @@
+"""Vectorised corpus-level waste scoring built on NumPy.
+
+The scorer tokenises a whole batch in one regex pass, builds a sparse
+document × keyword count matrix and projects it onto keyword categories, so
+fleet-wide reports avoid the per-document validation and output models of
+:class:`~app.tools.waste_detector.WasteDetector`.
+
+NumPy is an optional dependency and is imported on first use. SciPy is not
+required; :meth:`KeywordCountMatrix.to_scipy` converts when it is installed.
+"""
+from __future__ import annotations
+
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from .keyword_matcher import KeywordMatcher
+from .waste_detector import TIMWOODS_MATCHER
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Joins documents for the single scan. It is neither a word character nor
+# whitespace, so no keyword (or multi-word phrase) can match across documents.
+_SEPARATOR = "\x00"
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0)
+
+# Characters the ``re`` module treats as whitespace among ASCII code points.
+_ASCII_WHITESPACE = " \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+# Keyword prefix length (in 7-bit characters) checked by the array prefilter.
+_PREFIX_LENGTH = 4
+
+
+def _prefix_key(prefix: str) -> int:
+    return sum(ord(char) << (7 * step) for step, char in enumerate(prefix))
+
+
+class KeywordCountMatrix(NamedTuple):
+    """Document × keyword hit counts in compressed sparse row layout."""
+
+    indptr: "np.ndarray"
+    indices: "np.ndarray"
+    data: "np.ndarray"
+    shape: Tuple[int, int]
+
+    def rows(self) -> "np.ndarray":
+        """Return the document index of every stored entry."""
+
+        import numpy as np
+
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def toarray(self) -> "np.ndarray":
+        import numpy as np
+
+        dense = np.zeros(self.shape, dtype=self.data.dtype)
+        dense[self.rows(), self.indices] = self.data
+        return dense
+
+    def to_scipy(self) -> Any:
+        """Return the matrix as ``scipy.sparse.csr_matrix`` (requires SciPy)."""
+
+        from scipy.sparse import csr_matrix
+
+        return csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+
+
+class CorpusScores(NamedTuple):
+    """Per-document category counts and scores for a scored corpus.
+
+    ``scores`` are category hits per 1,000 characters, so long and short
+    documents can be compared directly.
+    """
+
+    categories: Tuple[str, ...]
+    keywords: Tuple[str, ...]
+    keyword_counts: KeywordCountMatrix
+    category_counts: "np.ndarray"
+    scores: "np.ndarray"
+    lengths: "np.ndarray"
+
+    def __len__(self) -> int:  # type: ignore[override]
+        return int(self.lengths.shape[0])
+
+    def category_sets(self) -> List[Set[str]]:
+        """Return the detected categories of each document."""
+
+        flagged = self.category_counts > 0
+        return [{self.categories[column] for column in row.nonzero()[0]} for row in flagged]
+
+    def summary(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES, top: Optional[int] = None) -> Dict[str, Any]:
+        """Aggregate the corpus into a JSON-serialisable report.
+
+        ``top_categories`` ranks categories by the number of documents they
+        were detected in, breaking ties by total hits.
+        """
+
+        import numpy as np
+
+        documents = len(self)
+        hits = self.category_counts.sum(axis=0)
+        flagged = (self.category_counts > 0).sum(axis=0)
+        if documents:
+            levels = np.percentile(self.scores, percentiles, axis=0)
+            means = self.scores.mean(axis=0)
+        else:
+            levels = np.zeros((len(percentiles), len(self.categories)))
+            means = np.zeros(len(self.categories))
+
+        per_category: Dict[str, Dict[str, Any]] = {}
+        for column, category in enumerate(self.categories):
+            per_category[category] = {
+                "hits": int(hits[column]),
+                "documents": int(flagged[column]),
+                "document_share": float(flagged[column]) / documents if documents else 0.0,
+                "mean_score": float(means[column]),
+                "percentiles": {f"p{q:g}": float(levels[row, column]) for row, q in enumerate(percentiles)},
+            }
+
+        ranking = sorted(range(len(self.categories)), key=lambda column: (-flagged[column], -hits[column], column))
+        ranked = [self.categories[column] for column in ranking if flagged[column]]
+        return {
+            "documents": documents,
+            "characters": int(self.lengths.sum()),
+            "documents_with_waste": int((self.category_counts.sum(axis=1) > 0).sum()),
+            "top_categories": ranked[:top] if top is not None else ranked,
+            "categories": per_category,
+        }
+
+
+class CorpusScorer:
+    """Score many documents against a keyword table with vectorised operations.
+
+    Category sets agree with :meth:`KeywordMatcher.detect` for every document;
+    counts add one hit per keyword occurrence (a phrase like ``too many`` also
+    counts the nested ``too`` when both are listed).
+    """
+
+    def __init__(self, matcher: KeywordMatcher = TIMWOODS_MATCHER) -> None:
+        import numpy as np
+
+        self.matcher = matcher
+        self.categories = matcher.categories
+        self.keywords = matcher.keywords
+        self._keyword_ids = {keyword: index for index, keyword in enumerate(self.keywords)}
+        category_ids = {category: index for index, category in enumerate(self.categories)}
+        # Keyword → category incidence; a keyword listed by several
+        # categories contributes to each of them.
+        self.projection = np.zeros((len(self.keywords), len(self.categories)), dtype=np.int64)
+        for keyword, index in self._keyword_ids.items():
+            for category in matcher.owners(keyword):
+                self.projection[index, category_ids[category]] = 1
+
+        # Tables for the array prefilter in ``_candidates``. It needs ASCII
+        # keywords; other tables fall back to the plain regex scan.
+        self._prefix_keys: "Optional[List[Tuple[int, np.ndarray]]]" = None
+        if self.keywords and all(keyword.isascii() for keyword in self.keywords):
+            fold = np.array([ord(chr(code).lower()) for code in range(128)], dtype=np.uint8)
+            fold[[ord(char) for char in _ASCII_WHITESPACE]] = ord(" ")
+            self._fold = fold
+            self._word = np.array([chr(code).isalnum() or code == ord("_") for code in range(128)])
+            self._prefix_length = min(_PREFIX_LENGTH, max(len(keyword) for keyword in self.keywords))
+            self._first_chars = np.zeros(128, dtype=bool)
+            self._first_chars[[ord(keyword[0]) for keyword in self.keywords]] = True
+            prefixes: Dict[int, Set[int]] = {}
+            for keyword in self.keywords:
+                prefix = keyword[: self._prefix_length]
+                prefixes.setdefault(len(prefix), set()).add(_prefix_key(prefix))
+            # One sorted key table per prefix length, with the mask selecting
+            # that many characters from a candidate's packed prefix.
+            self._prefix_keys = [
+                ((1 << (7 * length)) - 1, np.array(sorted(keys), dtype=np.uint64))
+                for length, keys in sorted(prefixes.items())
+            ]
+
+    def _candidates(self, text: str) -> "Optional[np.ndarray]":
+        """Return a superset of the offsets where a keyword can start, or ``None``.
+
+        The regex scan tests every character position and dominates scoring
+        time, so candidate offsets are found with array operations over the
+        text's code points first: a keyword can only start where the previous
+        character is not an ASCII word character and the next few characters
+        fold to the start of some keyword. Non-ASCII characters are treated as
+        wildcards (Unicode case folding maps e.g. ``ſ`` onto ``s``), which keeps
+        the filter exact while the regex confirms every candidate.
+        """
+
+        if self._prefix_keys is None:
+            return None
+        import numpy as np
+
+        if text.isascii():
+            codes = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+            other: "Optional[np.ndarray]" = None
+        else:
+            wide = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+            other = wide >= 128
+            codes = np.where(other, 0, wide).astype(np.uint8)
+        folded = self._fold[codes]
+        word = self._word[codes]
+
+        starts = self._first_chars[folded]
+        starts[1:] &= ~word[:-1]
+        if other is not None:
+            starts[1:] |= other[1:] & ~word[:-1]
+            starts[0] |= other[0]
+        candidates = np.flatnonzero(starts)
+
+        width = self._prefix_length
+        padded = np.concatenate((folded, np.zeros(width, dtype=folded.dtype)))
+        keys = np.zeros(len(candidates), dtype=np.uint64)
+        for step in range(width):
+            keys |= padded[candidates + step].astype(np.uint64) << np.uint64(7 * step)
+        hits = np.zeros(len(candidates), dtype=bool)
+        for mask, prefix_keys in self._prefix_keys:
+            masked = keys & np.uint64(mask)
+            slots = np.minimum(np.searchsorted(prefix_keys, masked), len(prefix_keys) - 1)
+            hits |= prefix_keys[slots] == masked
+        if other is not None:
+            padded_other = np.concatenate((other, np.zeros(width, dtype=bool)))
+            for step in range(width):
+                hits |= padded_other[candidates + step]
+        return candidates[hits]
+
+    def count_matrix(self, texts: Sequence[str]) -> Tuple[KeywordCountMatrix, "np.ndarray"]:
+        """Tokenise ``texts`` in one pass into a sparse count matrix and document lengths."""
+
+        import numpy as np
+
+        documents = len(texts)
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=documents)
+        # Offset just past each document's separator; a hit belongs to the
+        # first document whose boundary lies beyond its start.
+        bounds = np.cumsum(lengths + 1)
+        joined = _SEPARATOR.join(texts)
+        starts, spans = self.matcher.locate(joined, self._candidates(joined))
+
+        # Resolve each distinct span once, then expand hits to keywords.
+        span_ids: Dict[str, int] = {}
+        hit_spans = np.fromiter(
+            (span_ids.setdefault(span, len(span_ids)) for span in spans), dtype=np.int64, count=len(spans)
+        )
+        resolved = [self.matcher.resolve(span) for span in span_ids]
+        fanout = np.fromiter((len(hits) for hits in resolved), dtype=np.int64, count=len(resolved))
+        flat_keywords = np.fromiter(
+            (self._keyword_ids[keyword] for hits in resolved for keyword, _ in hits), dtype=np.int64
+        )
+        flat_lengths = np.fromiter((length for hits in resolved for _, length in hits), dtype=np.int64)
+        first = np.concatenate(([0], np.cumsum(fanout)[:-1])) if len(resolved) else np.zeros(0, dtype=np.int64)
+
+        per_hit = fanout[hit_spans] if len(spans) else np.zeros(0, dtype=np.int64)
+        total = int(per_hit.sum())
+        # Index of every (hit, keyword) pair into the flattened resolution table.
+        ramp = np.arange(total) - np.repeat(np.cumsum(per_hit) - per_hit, per_hit)
+        entries = np.repeat(first[hit_spans] if len(spans) else per_hit, per_hit) + ramp
+        keyword_ids = flat_keywords[entries] if total else np.zeros(0, dtype=np.int64)
+        hit_starts = np.repeat(np.asarray(starts, dtype=np.int64), per_hit)
+
+        if self.matcher.whole_words and total:
+            ends = hit_starts + flat_lengths[entries]
+            keep = np.fromiter(
+                (not (end < len(joined) and (joined[end].isalnum() or joined[end] == "_")) for end in ends.tolist()),
+                dtype=bool,
+                count=total,
+            )
+            keyword_ids, hit_starts = keyword_ids[keep], hit_starts[keep]
+
+        doc_ids = np.searchsorted(bounds, hit_starts, side="right")
+        width = len(self.keywords)
+        keys, counts = np.unique(doc_ids * width + keyword_ids, return_counts=True)
+        rows = keys // width
+        indptr = np.searchsorted(rows, np.arange(documents + 1), side="left")
+        matrix = KeywordCountMatrix(indptr, keys % width, counts, (documents, width))
+        return matrix, lengths
+
+    def project(self, matrix: KeywordCountMatrix) -> "np.ndarray":
+        """Sum keyword counts into a dense document × category count array."""
+
+        import numpy as np
+
+        documents = matrix.shape[0]
+        rows = matrix.rows()
+        weighted = matrix.data[:, None] * self.projection[matrix.indices]
+        columns = [
+            np.bincount(rows, weights=weighted[:, column], minlength=documents)
+            for column in range(len(self.categories))
+        ]
+        if not columns:
+            return np.zeros((documents, 0), dtype=np.int64)
+        return np.stack(columns, axis=1).astype(np.int64)
+
+    def score(self, texts: Iterable[str], *, batch_size: int = 50_000) -> CorpusScores:
+        """Score ``texts`` and return per-document and corpus-level results.
+
+        Documents are scanned ``batch_size`` at a time so the joined scan
+        buffer stays bounded; only the compact per-document results are kept.
+        """
+
+        import numpy as np
+
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        matrices: List[KeywordCountMatrix] = []
+        lengths: List["np.ndarray"] = []
+        iterator = iter(texts)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch and matrices:
+                break
+            matrix, batch_lengths = self.count_matrix(batch)
+            matrices.append(matrix)
+            lengths.append(batch_lengths)
+            if len(batch) < batch_size:
+                break
+
+        matrix = matrices[0] if len(matrices) == 1 else _stack_rows(matrices)
+        all_lengths = np.concatenate(lengths)
+        category_counts = self.project(matrix)
+        scale = 1000.0 / np.maximum(all_lengths, 1)
+        return CorpusScores(
+            categories=self.categories,
+            keywords=self.keywords,
+            keyword_counts=matrix,
+            category_counts=category_counts,
+            scores=category_counts * scale[:, None],
+            lengths=all_lengths,
+        )
+
+
+def _stack_rows(matrices: Sequence[KeywordCountMatrix]) -> KeywordCountMatrix:
+    import numpy as np
+
+    offsets = np.cumsum([0] + [int(matrix.indptr[-1]) for matrix in matrices[:-1]])
+    indptr = np.concatenate(
+        [matrices[0].indptr[:1]] + [matrix.indptr[1:] + offset for matrix, offset in zip(matrices, offsets)]
+    )
+    return KeywordCountMatrix(
+        indptr,
+        np.concatenate([matrix.indices for matrix in matrices]),
+        np.concatenate([matrix.data for matrix in matrices]),
+        (sum(matrix.shape[0] for matrix in matrices), matrices[0].shape[1]),
+    )
@@ -0,0 +1,236 @@
+"""Incremental keyword analysis of descriptions that are edited repeatedly.
+
+:class:`IncrementalAnalysis` keeps the text split into segments (ending at
+line breaks and after sentence-ending punctuation) together with the keyword
+hits found in each. A new version of the text is compared with the previous
+one, only the segments overlapping the edit are re-split and rescanned, and
+per-category keyword counts are updated from the difference. The work done
+in Python is proportional to the edit; what remains proportional to the
+document (locating the edit, splicing lists) runs as ``memcmp``-speed C code.
+
+Results are identical to scanning the whole text: every segment ends in
+whitespace, so a keyword without internal whitespace cannot cross into the
+next segment. Keywords with spaces (``"too many"``) can, so for tables that
+contain them the segments just before an edit are rescanned as well, as far
+back as a hit could reach into it.
+"""
+from __future__ import annotations
+
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from itertools import accumulate
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .keyword_matcher import KeywordMatch, KeywordMatcher
+
+# Segments end after a line break or after whitespace following ., ! or ?,
+# including the whole whitespace run.
+_BOUNDARY = re.compile(r"\n\s*|(?<=[.!?])\s+")
+# Comparison step when locating the edited region.
+_BLOCK = 4096
+
+
+def common_prefix(a: str, b: str) -> int:
+    """Length of the longest common prefix of ``a`` and ``b``."""
+
+    limit = min(len(a), len(b))
+    index = 0
+    step = _BLOCK
+    while step:
+        while index + step <= limit and a[index : index + step] == b[index : index + step]:
+            index += step
+        step //= 2
+    return index
+
+
+def common_suffix(a: str, b: str, limit: int) -> int:
+    """Length of the longest common suffix of ``a`` and ``b``, at most ``limit``."""
+
+    end_a = len(a)
+    end_b = len(b)
+    index = 0
+    step = _BLOCK
+    while step:
+        while index + step <= limit:
+            if a[end_a - index - step : end_a - index] != b[end_b - index - step : end_b - index]:
+                break
+            index += step
+        step //= 2
+    return index
+
+
+def _keyword_chars(segment: str) -> int:
+    return len("".join(segment.split()))
+
+
+class UpdateStats(NamedTuple):
+    """How much of the text the last :meth:`IncrementalAnalysis.update` rescanned."""
+
+    segments: int
+    rescanned_segments: int
+    rescanned_chars: int
+
+
+class IncrementalAnalysis:
+    """Per-segment keyword state for successive versions of one text.
+
+    Thread-safe; concurrent updates of one session are serialised.
+    """
+
+    def __init__(self, matcher: KeywordMatcher) -> None:
+        self.matcher = matcher
+        self.text = ""
+        self.stats = UpdateStats(0, 0, 0)
+        self._segments: List[str] = []
+        # Hits starting in each segment, with offsets relative to its start.
+        self._hits: List[Tuple[KeywordMatch, ...]] = []
+        self._counts: Dict[str, Counter] = {category: Counter() for category in matcher.categories}
+        # How many keyword characters a hit can carry across a segment end.
+        multiword = any(" " in keyword for keyword in matcher.keywords)
+        self._reach: Optional[int] = matcher.max_keyword_length if multiword else None
+        self._lock = threading.Lock()
+
+    def update(self, text: str) -> Dict[str, List[str]]:
+        """Analyse ``text``, the new version of the session's text.
+
+        Returns matched keywords per category like :meth:`KeywordMatcher.detect`,
+        with the keywords of each category in sorted order.
+        """
+
+        with self._lock:
+            if text != self.text:
+                self._apply(text)
+            else:
+                self.stats = UpdateStats(len(self._segments), 0, 0)
+            return self.detected()
+
+    def detected(self) -> Dict[str, List[str]]:
+        return {
+            category: sorted(keyword for keyword, count in counts.items() if count > 0)
+            for category, counts in self._counts.items()
+            if any(count > 0 for count in counts.values())
+        }
+
+    def matches(self) -> List[KeywordMatch]:
+        """Every hit in the current text with absolute offsets, in text order."""
+
+        with self._lock:
+            found: List[KeywordMatch] = []
+            for start, hits in zip(accumulate(map(len, self._segments), initial=0), self._hits):
+                found.extend(hit._replace(start=hit.start + start, end=hit.end + start) for hit in hits)
+            return found
+
+    def _apply(self, text: str) -> None:
+        old_text = self.text
+        segments = self._segments
+        ends = list(accumulate(map(len, segments)))
+        prefix = common_prefix(old_text, text)
+        suffix = common_suffix(old_text, text, min(len(old_text), len(text)) - prefix)
+        delta = len(text) - len(old_text)
+
+        # A boundary is kept while the character after it is unchanged.
+        first = bisect_left(ends, prefix)
+        resplit_from = ends[first - 1] if first else 0
+        stable_from = len(text) - suffix
+        new_segments: List[str] = []
+        last = len(segments)
+        start = resplit_from
+        for boundary in _BOUNDARY.finditer(text, resplit_from):
+            end = boundary.end()
+            new_segments.append(text[start:end])
+            start = end
+            # Past the edit, a boundary shared with the old text (including the
+            # character before it) means the rest of the split is unchanged.
+            if end - 1 >= stable_from:
+                old_index = bisect_left(ends, end - delta)
+                if old_index < len(ends) and ends[old_index] == end - delta:
+                    last = old_index + 1
+                    break
+        else:
+            if start < len(text):
+                new_segments.append(text[start:])
+
+        for hits in self._hits[first:last]:
+            self._count(hits, -1)
+        segments[first:last] = new_segments
+        self._hits[first:last] = [()] * len(new_segments)
+        self.text = text
+
+        # Hits in earlier segments may run on into the edited region.
+        low = first
+        high = first + len(new_segments)
+        if self._reach is not None:
+            carried = 0
+            while low > 0 and carried <= self._reach:
+                low -= 1
+                carried += _keyword_chars(segments[low])
+        for hits in self._hits[low:first]:
+            self._count(hits, -1)
+        starts = list(accumulate(map(len, segments), initial=0))
+        rescanned = self._scan(low, high, starts)
+        self._hits[low:high] = rescanned
+        for hits in rescanned:
+            self._count(hits, 1)
+        self.stats = UpdateStats(len(segments), high - low, starts[high] - starts[low])
+
+    def _scan(self, low: int, high: int, starts: List[int]) -> List[Tuple[KeywordMatch, ...]]:
+        """Scan segments ``low:high`` in one pass and split the hits among them."""
+
+        context_end = starts[high]
+        if self._reach is not None:
+            carried = 0
+            following = high
+            while following < len(self._segments) and carried <= self._reach:
+                context_end = starts[following + 1]
+                carried += _keyword_chars(self._segments[following])
+                following += 1
+        found: List[List[KeywordMatch]] = [[] for _ in range(low, high)]
+        index = low
+        for hit in self.matcher.finditer(self.text, starts[low], starts[high], context_end=context_end):
+            while hit.start >= starts[index + 1]:
+                index += 1
+            base = starts[index]
+            found[index - low].append(hit._replace(start=hit.start - base, end=hit.end - base))
+        return [tuple(hits) for hits in found]
+
+    def _count(self, hits: Tuple[KeywordMatch, ...], sign: int) -> None:
+        counts = self._counts
+        for hit in hits:
+            counts[hit.category][hit.keyword] += sign
+
+
+class SessionPool:
+    """Least-recently-used set of :class:`IncrementalAnalysis` sessions by id."""
+
+    def __init__(self, max_sessions: int = 256) -> None:
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, IncrementalAnalysis]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, matcher: KeywordMatcher) -> IncrementalAnalysis:
+        """Return the session ``session_id``, starting afresh if its matcher changed."""
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.matcher is not matcher:
+                session = self._sessions[session_id] = IncrementalAnalysis(matcher)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Sessions are per process; workers start with none.
+        return {"max_sessions": self.max_sessions}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
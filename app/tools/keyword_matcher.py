@@ -0,0 +1,410 @@
+"""Single-pass multi-keyword matcher used by the rule-based tools."""
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, TextIO, Tuple
+
+from app.text import normalise
+
+# Upper bound on memoised trie walks; distinct matched spans are few in practice.
+_RESOLVE_CACHE_SIZE = 4096
+# Upper bound on memoised token checks in ``detect_tokens``.
+_TOKEN_CACHE_SIZE = 1 << 16
+_LEADING_WORD = re.compile(r"\w+")
+
+
+class KeywordMatch(NamedTuple):
+    """A keyword hit located in the scanned text."""
+
+    category: str
+    keyword: str
+    start: int
+    end: int
+
+
+def _normalise_keyword(keyword: str) -> str:
+    return " ".join(keyword.lower().split())
+
+
+def _multiword_pattern(keyword: str) -> re.Pattern:
+    return re.compile(r"\s+".join(re.escape(word) for word in keyword.split(" ")))
+
+
+def _tail_start(text: str, keep: int) -> int:
+    """Start of the shortest suffix of ``text`` holding ``keep`` non-whitespace characters."""
+
+    index = len(text)
+    while index > 0 and keep > 0:
+        index -= 1
+        if not text[index].isspace():
+            keep -= 1
+    return index
+
+
+class KeywordMatcher:
+    """Match a categorised keyword table against text in one linear pass.
+
+    Keywords from every category are merged into a single trie, in the spirit of
+    an Aho-Corasick automaton. Because a hit must begin at a word boundary, the
+    automaton never needs failure links: the scan simply restarts at the next
+    word start. That lets the trie be compiled into one regular expression so
+    the pass runs inside the ``re`` engine rather than a Python loop.
+
+    By default a keyword matches at the start of a word and may be followed by
+    further word characters, so ``delay`` finds ``delays`` while ``bug`` no
+    longer fires inside ``debugging``. Pass ``whole_words=True`` to require a
+    word boundary on both sides.
+    """
+
+    def __init__(self, categories: Mapping[str, Iterable[str]], *, whole_words: bool = False) -> None:
+        self.whole_words = whole_words
+        self.categories: Tuple[str, ...] = tuple(categories)
+        self._keyword_categories: Dict[str, Tuple[str, ...]] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                normalised = _normalise_keyword(keyword)
+                if not normalised:
+                    continue
+                owners = self._keyword_categories.get(normalised, ())
+                if category not in owners:
+                    self._keyword_categories[normalised] = owners + (category,)
+
+        self._trie: Dict[str, dict] = {}
+        for keyword in self._keyword_categories:
+            node = self._trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = keyword
+
+        self._resolved: Dict[str, Tuple[Tuple[str, int], ...]] = {}
+        self.max_keyword_length = max((len(keyword) for keyword in self._keyword_categories), default=0)
+        body = self._compile_node(self._trie) if self._keyword_categories else "(?!)"
+        self._pattern = re.compile(r"(?<!\w)(?=(" + body + "))", re.IGNORECASE)
+        self._table = {category: tuple(keywords) for category, keywords in categories.items()}
+        self._category_keywords: Dict[str, Tuple[str, ...]] = {category: () for category in self.categories}
+        for keyword, owners in self._keyword_categories.items():
+            for category in owners:
+                self._category_keywords[category] += (keyword,)
+        self._fingerprint: Optional[str] = None
+        # Leading word of every keyword, used to skip tokens that cannot start
+        # a hit; ``None`` when some keyword does not begin with a word character.
+        leads = [_LEADING_WORD.match(keyword) for keyword in self._keyword_categories]
+        self._leads = frozenset(lead.group() for lead in leads) if all(leads) else None
+        self._max_lead = max((len(lead) for lead in self._leads or ()), default=0)
+        self._token_can_start: Dict[str, bool] = {}
+        # Per keyword: its first word, found with ``str.find``, and for
+        # multiword keywords the pattern that checks the rest (see ``detect``).
+        self._probes: Tuple[Tuple[str, str, Optional[re.Pattern]], ...] = tuple(
+            (keyword, keyword.split(" ", 1)[0], _multiword_pattern(keyword) if " " in keyword else None)
+            for keyword in self._keyword_categories
+        )
+
+    def _compile_node(self, node: Dict[str, dict]) -> str:
+        branches: List[str] = []
+        terminal = False
+        for char in sorted(node):
+            if char == "":
+                terminal = True
+                continue
+            token = r"\s+" if char == " " else re.escape(char)
+            branches.append(token + self._compile_node(node[char]))
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Greedy optional groups make the regex report the longest keyword at a
+        # position; shorter keywords on the same path are recovered by walking
+        # the trie in ``finditer``.
+        return f"(?:{body})?" if terminal else body
+
+    @property
+    def fingerprint(self) -> str:
+        """Stable hash of the keyword table, computed on first use."""
+
+        if self._fingerprint is None:
+            import hashlib
+
+            digest = hashlib.sha256()
+            digest.update(b"whole" if self.whole_words else b"prefix")
+            for category, keywords in self._table.items():
+                digest.update(b"\x00" + category.encode("utf-8"))
+                for keyword in keywords:
+                    digest.update(b"\x01" + _normalise_keyword(keyword).encode("utf-8"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    @property
+    def keywords(self) -> Tuple[str, ...]:
+        """Distinct normalised keywords, in table order."""
+
+        return tuple(self._keyword_categories)
+
+    def owners(self, keyword: str) -> Tuple[str, ...]:
+        """Return the categories listing the normalised ``keyword``."""
+
+        return self._keyword_categories[keyword]
+
+    def category_keywords(self, category: str) -> Tuple[str, ...]:
+        """Return the distinct normalised keywords listed under ``category``."""
+
+        return self._category_keywords[category]
+
+    def locate(self, text: str, positions: Optional[Iterable[int]] = None) -> Tuple[List[int], List[str]]:
+        """Return the start offset and matched span of every raw trie hit.
+
+        This is the cheapest form of a scan: spans are not yet resolved into
+        keywords (see :meth:`resolve`), which lets bulk callers resolve each
+        distinct span once instead of once per hit. ``positions``, if given,
+        restricts the scan to those candidate offsets (in ascending order).
+        """
+
+        starts: List[int] = []
+        spans: List[str] = []
+        if positions is None:
+            for found in self._pattern.finditer(text):
+                starts.append(found.start())
+                spans.append(found.group(1))
+            return starts, spans
+        match = self._pattern.match
+        for position in positions:
+            found = match(text, position)
+            if found is not None:
+                starts.append(position)
+                spans.append(found.group(1))
+        return starts, spans
+
+    def resolve(self, matched: str) -> Tuple[Tuple[str, int], ...]:
+        """Return ``(keyword, span length)`` for every keyword that prefixes ``matched``."""
+
+        return self._resolve(matched)
+
+    def _is_word_char(self, text: str, index: int) -> bool:
+        if index >= len(text):
+            return False
+        char = text[index]
+        return char.isalnum() or char == "_"
+
+    def _resolve(self, matched: str) -> Tuple[Tuple[str, int], ...]:
+        """Return ``(keyword, span length)`` for every keyword that prefixes ``matched``."""
+
+        cached = self._resolved.get(matched)
+        if cached is not None:
+            return cached
+        hits: List[Tuple[str, int]] = []
+        length = len(matched)
+        node: Optional[Dict[str, dict]] = self._trie
+        index = 0
+        while index < length and node is not None:
+            char = matched[index]
+            if char.isspace():
+                node = node.get(" ")
+                while index < length and matched[index].isspace():
+                    index += 1
+            else:
+                node = node.get(char.lower())
+                index += 1
+            if node is not None and "" in node:
+                hits.append((node[""], index))
+        resolved = tuple(hits)
+        if len(self._resolved) < _RESOLVE_CACHE_SIZE:
+            self._resolved[matched] = resolved
+        return resolved
+
+    def finditer(
+        self, text: str, pos: int = 0, endpos: Optional[int] = None, *, context_end: Optional[int] = None
+    ) -> Iterator[KeywordMatch]:
+        """Yield every keyword hit in ``text`` ordered by start offset.
+
+        ``pos`` and ``endpos`` restrict where a hit may start; characters outside
+        the window are still consulted for word boundaries and keyword tails.
+        ``context_end`` stops the scan from reading keyword tails past that
+        offset, so scanning a small window of a large text stays proportional
+        to the window; callers must ensure no hit can extend beyond it.
+        """
+
+        return self._iter_matches(text, pos, endpos, 0, context_end)
+
+    def _iter_matches(
+        self, text: str, pos: int, endpos: Optional[int], offset: int, context_end: Optional[int] = None
+    ) -> Iterator[KeywordMatch]:
+        limit = len(text) if endpos is None else endpos
+        resolve = self._resolve
+        keyword_categories = self._keyword_categories
+        context_end = len(text) if context_end is None else context_end
+        for found in self._pattern.finditer(text, pos, context_end):
+            start = found.start()
+            if start >= limit:
+                break
+            for keyword, length in resolve(found.group(1)):
+                end = start + length
+                if self.whole_words and self._is_word_char(text, end):
+                    continue
+                for category in keyword_categories[keyword]:
+                    yield KeywordMatch(category, keyword, start + offset, end + offset)
+
+    def scan_stream(
+        self,
+        stream: TextIO,
+        *,
+        chunk_size: int = 1 << 20,
+        overlap: Optional[int] = None,
+    ) -> Iterator[KeywordMatch]:
+        """Yield hits from a text stream while holding at most one chunk in memory.
+
+        Offsets are character positions in the whole stream. The tail of each
+        chunk holding its last ``overlap`` non-whitespace characters (by default
+        the longest keyword plus one) is carried into the next read, so hits
+        spanning a boundary are reported exactly once. Counting only
+        non-whitespace keeps multiword hits whose words are separated by long
+        runs of whitespace whole.
+        """
+
+        for buffer, scan_from, limit, base in self._windows(stream, chunk_size, overlap):
+            yield from self._iter_matches(buffer, scan_from, limit, base)
+
+    def scan_stream_first(
+        self,
+        stream: TextIO,
+        *,
+        chunk_size: int = 1 << 20,
+        overlap: Optional[int] = None,
+    ) -> Iterator[KeywordMatch]:
+        """:meth:`first_matches` for a text stream, read as in :meth:`scan_stream`.
+
+        Reading stops once every keyword has been seen.
+        """
+
+        probes = self._probes
+        for buffer, scan_from, limit, base in self._windows(stream, chunk_size, overlap):
+            hits = self._first_hits(normalise(buffer), probes, scan_from, limit)
+            yield from self._hit_matches(hits, base)
+            if hits:
+                seen = {keyword for _, _, keyword in hits}
+                probes = tuple(probe for probe in probes if probe[0] not in seen)
+                if not probes:
+                    return
+
+    def _windows(
+        self, stream: TextIO, chunk_size: int, overlap: Optional[int]
+    ) -> Iterator[Tuple[str, int, int, int]]:
+        """Yield ``(buffer, scan_from, limit, base)`` for each window of ``stream``."""
+
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        overlap = self.max_keyword_length + 1 if overlap is None else overlap
+        buffer = ""
+        base = 0
+        scan_from = 0
+        while True:
+            data = stream.read(chunk_size)
+            final = not data
+            buffer += data
+            limit = len(buffer) if final else max(scan_from, _tail_start(buffer, overlap))
+            yield buffer, scan_from, limit, base
+            if final:
+                return
+            # Keep one extra character so the word-boundary check at the start
+            # of the next window can still see what preceded it.
+            keep_from = max(limit - 1, 0)
+            buffer = buffer[keep_from:]
+            base += keep_from
+            scan_from = limit - keep_from
+
+    def detect(self, text: str, *, normalised: Optional[str] = None) -> Dict[str, List[str]]:
+        """Return matched keywords per category, in table order, without duplicates."""
+
+        return self.group(self.first_matches(text, normalised=normalised))
+
+    def first_matches(self, text: str, *, normalised: Optional[str] = None) -> List[KeywordMatch]:
+        """Return the first hit of every keyword found in ``text``, ordered by start offset.
+
+        Only presence matters here, so rather than visiting every hit each
+        keyword is looked up with ``str.find`` and its search stops at the
+        first occurrence that starts a word. Grouping the result equals
+        ``group(finditer(text))``, including the first-hit order of keywords.
+        Pass ``normalised`` (``app.text.normalise(text)``, as held by
+        :class:`app.text.AnalysedText`) to skip lowercasing the text again.
+        """
+
+        lowered = normalise(text) if normalised is None else normalised
+        return list(self._hit_matches(self._first_hits(lowered, self._probes, 0, len(lowered)), 0))
+
+    def _first_hits(
+        self, lowered: str, probes: Sequence[Tuple[str, str, Optional[re.Pattern]]], pos: int, limit: int
+    ) -> List[Tuple[int, int, str]]:
+        """Return sorted ``(start, end, keyword)`` first hits starting in ``[pos, limit)``."""
+
+        is_word_char = self._is_word_char
+        hits: List[Tuple[int, int, str]] = []
+        for keyword, head, rest in probes:
+            start = lowered.find(head, pos)
+            while 0 <= start < limit:
+                if start == 0 or not is_word_char(lowered, start - 1):
+                    if rest is None:
+                        end = start + len(head)
+                    else:
+                        found = rest.match(lowered, start)
+                        end = -1 if found is None else found.end()
+                    if end >= 0 and not (self.whole_words and is_word_char(lowered, end)):
+                        hits.append((start, end, keyword))
+                        break
+                start = lowered.find(head, start + 1)
+        hits.sort()
+        return hits
+
+    def _hit_matches(self, hits: Iterable[Tuple[int, int, str]], offset: int) -> Iterator[KeywordMatch]:
+        keyword_categories = self._keyword_categories
+        for start, end, keyword in hits:
+            for category in keyword_categories[keyword]:
+                yield KeywordMatch(category, keyword, start + offset, end + offset)
+
+    def detect_tokens(self, text: str, tokens: Sequence[str], starts: Sequence[int]) -> Dict[str, List[str]]:
+        """:meth:`detect` for text that is already tokenised.
+
+        ``tokens`` are the lowercased ``\\w+`` runs of ``text`` and ``starts``
+        their offsets, as in :class:`app.text.AnalysedText`. Only tokens that
+        begin with some keyword's leading word are tried, which skips most of
+        the text.
+        """
+
+        return self.group(self.finditer_tokens(text, tokens, starts))
+
+    def finditer_tokens(self, text: str, tokens: Sequence[str], starts: Sequence[int]) -> Iterator[KeywordMatch]:
+        """:meth:`finditer` for text that is already tokenised, as in :meth:`detect_tokens`."""
+
+        if self._leads is None:
+            return self.finditer(text)
+        can_start = self._can_start
+        return self._matches_at(text, (start for token, start in zip(tokens, starts) if can_start(token)))
+
+    def _can_start(self, token: str) -> bool:
+        cached = self._token_can_start.get(token)
+        if cached is None:
+            leads = self._leads
+            cached = any(token[:length] in leads for length in range(1, min(len(token), self._max_lead) + 1))
+            if len(self._token_can_start) < _TOKEN_CACHE_SIZE:
+                self._token_can_start[token] = cached
+        return cached
+
+    def _matches_at(self, text: str, positions: Iterable[int]) -> Iterator[KeywordMatch]:
+        match = self._pattern.match
+        resolve = self._resolve
+        keyword_categories = self._keyword_categories
+        for start in positions:
+            found = match(text, start)
+            if found is None:
+                continue
+            for keyword, length in resolve(found.group(1)):
+                end = start + length
+                if self.whole_words and self._is_word_char(text, end):
+                    continue
+                for category in keyword_categories[keyword]:
+                    yield KeywordMatch(category, keyword, start, end)
+
+    def group(self, matches: Iterable[KeywordMatch]) -> Dict[str, List[str]]:
+        """Collapse hits into matched keywords per category, in table order."""
+
+        found: Dict[str, Dict[str, None]] = {}
+        for match in matches:
+            found.setdefault(match.category, {})[match.keyword] = None
+        return {category: list(found[category]) for category in self.categories if category in found}
+
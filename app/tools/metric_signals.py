@@ -0,0 +1,335 @@
+"""Waste signals computed from numeric process metrics.
+
+Metrics arrive as scalars, sequences, NumPy arrays (including ``np.memmap``)
+or, from trusted in-process callers that pass ``allow_paths=True``, paths to
+``.npy`` files, which are memory-mapped rather than loaded. Every
+statistic is computed in fixed-size chunks, so memory stays bounded by
+``chunk_size`` regardless of series length:
+
+* percentiles are exact for series that fit in one chunk and otherwise read
+  from a fine histogram built in a second pass (error below
+  ``(max - min) / histogram_bins``);
+* rolling defect rates carry the last ``window - 1`` values across chunks.
+
+NumPy is an optional dependency and is imported on first use.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Accepted names for each kind of series, first match wins.
+QUEUE_METRICS = ("queue_time", "wait_time", "waiting_time")
+TOUCH_METRICS = ("touch_time", "process_time", "processing_time", "value_added_time")
+CYCLE_METRICS = ("cycle_time", "lead_time")
+WIP_METRICS = ("wip", "work_in_progress", "inventory", "queue_length")
+DEFECT_METRICS = ("defect_rate", "defects", "defect")
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0)
+
+
+class SeriesSummary(NamedTuple):
+    """Streaming statistics of one numeric series."""
+
+    count: int
+    total: float
+    minimum: float
+    maximum: float
+    percentiles: Dict[float, float]
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class Signal(NamedTuple):
+    """One statistic derived from the metrics and whether it indicates waste."""
+
+    category: str
+    metric: str
+    statistic: str
+    value: float
+    threshold: float
+    flagged: bool
+    evidence: str
+
+
+def is_path(value: Any) -> bool:
+    """Whether a metric value names a file rather than holding the data."""
+
+    return isinstance(value, (str, os.PathLike))
+
+
+def as_array(value: Any, *, allow_paths: bool = False) -> "np.ndarray":
+    """Return ``value`` as a one-dimensional array without copying large inputs.
+
+    With ``allow_paths``, ``.npy`` paths are memory-mapped read-only; without
+    it they are rejected, since a path lets the caller read server-side files.
+    Arrays and memmaps are used as they are (flattened views), and scalars
+    become one-element arrays.
+    """
+
+    import numpy as np
+
+    if is_path(value):
+        if not allow_paths:
+            raise ValueError("Metric file paths are not accepted here; pass numbers or arrays")
+        path = Path(value)
+        if path.suffix != ".npy":
+            raise ValueError(f"Metric files must be .npy arrays, got {path.name}")
+        value = np.load(path, mmap_mode="r")
+    array = np.asarray(value)
+    if array.dtype.kind not in "biuf":
+        raise ValueError(f"Metric values must be numeric, got dtype {array.dtype}")
+    return array.reshape(-1)
+
+
+def digest(value: Any, *, allow_paths: bool = False) -> str:
+    """Return a short token identifying a metric value, used for result caching.
+
+    Memory-mapped data is identified by file, offset, shape and modification
+    time instead of being hashed in full. Paths are only looked up on disk
+    with ``allow_paths``, as in :func:`as_array`.
+    """
+
+    import numpy as np
+
+    if is_path(value):
+        if not allow_paths:
+            return f"path:{os.fspath(value)}"
+        try:
+            stat = os.stat(value)
+        except OSError:
+            # Left to the analysis to report.
+            return f"file:{os.fspath(value)}:missing"
+        return f"file:{os.fspath(value)}:{stat.st_size}:{stat.st_mtime_ns}"
+    if isinstance(value, np.memmap) and value.filename is not None:
+        stat = os.stat(value.filename)
+        return f"mmap:{value.filename}:{value.offset}:{value.shape}:{value.dtype}:{stat.st_mtime_ns}"
+    array = np.ascontiguousarray(value)
+    hasher = hashlib.blake2b(f"{array.dtype}:{array.shape}".encode("utf-8"), digest_size=16)
+    hasher.update(memoryview(array.reshape(-1)).cast("B"))
+    return hasher.hexdigest()
+
+
+def _chunks(array: "np.ndarray", chunk_size: int) -> Iterator["np.ndarray"]:
+    import numpy as np
+
+    for start in range(0, len(array), chunk_size):
+        yield np.asarray(array[start : start + chunk_size], dtype=np.float64)
+
+
+class MetricAnalyser:
+    """Derive waiting, inventory and defect signals from metric series.
+
+    Thresholds are class attributes so deployments can tune them by
+    subclassing, as with ``WasteDetector.action_templates``. Metric values
+    that are ``.npy`` paths are only read with ``allow_paths=True``, which is
+    meant for trusted in-process callers, never for service input.
+    """
+
+    # Waiting: queue time per unit of touch time (3.0 means 25% flow efficiency).
+    queue_touch_ratio_threshold = 3.0
+    # Waiting: share of cycle time spent queueing.
+    queue_share_threshold = 0.5
+    # Waiting: p99 / p50 cycle time; a long tail points at queues.
+    cycle_tail_threshold = 3.0
+    # Inventory: mean WIP of the last tenth of the series over the first tenth.
+    wip_growth_threshold = 1.25
+    # Defects: overall rate, and the worst rolling-window rate relative to it.
+    defect_rate_threshold = 0.02
+    defect_window = 1000
+
+    def __init__(
+        self,
+        *,
+        chunk_size: int = 1 << 20,
+        histogram_bins: int = 1 << 14,
+        percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+        allow_paths: bool = False,
+    ) -> None:
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.chunk_size = chunk_size
+        self.histogram_bins = histogram_bins
+        self.percentiles = tuple(percentiles)
+        self.allow_paths = allow_paths
+
+    def summarise(self, array: "np.ndarray") -> SeriesSummary:
+        """Count, sum, range and percentiles of ``array`` in bounded memory."""
+
+        import numpy as np
+
+        if len(array) == 0:
+            return SeriesSummary(0, 0.0, 0.0, 0.0, {q: 0.0 for q in self.percentiles})
+        if len(array) <= self.chunk_size:
+            values = np.asarray(array, dtype=np.float64)
+            points = np.percentile(values, self.percentiles)
+            return SeriesSummary(
+                len(values),
+                float(values.sum()),
+                float(values.min()),
+                float(values.max()),
+                dict(zip(self.percentiles, map(float, points))),
+            )
+
+        total = 0.0
+        minimum = np.inf
+        maximum = -np.inf
+        for chunk in _chunks(array, self.chunk_size):
+            total += float(chunk.sum())
+            minimum = min(minimum, float(chunk.min()))
+            maximum = max(maximum, float(chunk.max()))
+        counts = np.zeros(self.histogram_bins, dtype=np.int64)
+        for chunk in _chunks(array, self.chunk_size):
+            counts += np.histogram(chunk, bins=self.histogram_bins, range=(minimum, maximum))[0]
+        edges = np.linspace(minimum, maximum, self.histogram_bins + 1)
+        cumulative = np.cumsum(counts)
+        points: Dict[float, float] = {}
+        for q in self.percentiles:
+            rank = q / 100.0 * (len(array) - 1)
+            index = int(np.searchsorted(cumulative, rank, side="right"))
+            index = min(index, self.histogram_bins - 1)
+            before = cumulative[index - 1] if index else 0
+            # Interpolate linearly within the bin holding the requested rank.
+            fraction = (rank - before + 1) / counts[index] if counts[index] else 0.0
+            points[q] = float(edges[index] + min(max(fraction, 0.0), 1.0) * (edges[index + 1] - edges[index]))
+        return SeriesSummary(len(array), total, float(minimum), float(maximum), points)
+
+    def rolling_max_rate(self, array: "np.ndarray", window: int) -> float:
+        """Highest mean over any ``window`` consecutive values, chunk by chunk."""
+
+        import numpy as np
+
+        window = max(1, min(window, len(array)))
+        if not len(array):
+            return 0.0
+        carry = np.empty(0, dtype=np.float64)
+        best = -np.inf
+        for chunk in _chunks(array, self.chunk_size):
+            values = np.concatenate((carry, chunk))
+            if len(values) >= window:
+                sums = np.cumsum(values)
+                windows = sums[window - 1 :] - np.concatenate(([0.0], sums[:-window]))
+                best = max(best, float(windows.max()))
+            carry = values[-(window - 1) :] if window > 1 else carry
+        return best / window
+
+    def _first(self, metrics: Mapping[str, Any], names: Sequence[str]) -> Optional[Tuple[str, "np.ndarray"]]:
+        for name in names:
+            if metrics.get(name) is not None:
+                return name, as_array(metrics[name], allow_paths=self.allow_paths)
+        return None
+
+    def analyse(self, metrics: Mapping[str, Any]) -> List[Signal]:
+        """Return every signal the supplied metrics allow, flagged or not."""
+
+        signals: List[Signal] = []
+        queue = self._first(metrics, QUEUE_METRICS)
+        touch = self._first(metrics, TOUCH_METRICS)
+        cycle = self._first(metrics, CYCLE_METRICS)
+        queue_summary = self.summarise(queue[1]) if queue else None
+        cycle_summary = self.summarise(cycle[1]) if cycle else None
+
+        if queue and touch:
+            touch_total = self.summarise(touch[1]).total
+            ratio = queue_summary.total / touch_total if touch_total else float("inf")
+            efficiency = touch_total / (touch_total + queue_summary.total) if touch_total else 0.0
+            signals.append(
+                Signal(
+                    "waiting",
+                    f"{queue[0]}/{touch[0]}",
+                    "queue_to_touch_ratio",
+                    ratio,
+                    self.queue_touch_ratio_threshold,
+                    ratio >= self.queue_touch_ratio_threshold,
+                    f"queue-to-touch ratio {ratio:.2f} (flow efficiency {efficiency:.0%}), "
+                    f"p90 {queue[0]} {queue_summary.percentiles.get(90.0, queue_summary.maximum):.4g}",
+                )
+            )
+        if queue and cycle:
+            cycle_total = cycle_summary.total
+            share = queue_summary.total / cycle_total if cycle_total else 0.0
+            signals.append(
+                Signal(
+                    "waiting",
+                    f"{queue[0]}/{cycle[0]}",
+                    "queue_share",
+                    share,
+                    self.queue_share_threshold,
+                    share >= self.queue_share_threshold,
+                    f"{share:.0%} of {cycle[0]} is spent queueing",
+                )
+            )
+        if cycle:
+            p50 = cycle_summary.percentiles.get(50.0, cycle_summary.mean)
+            p99 = cycle_summary.percentiles.get(99.0, cycle_summary.maximum)
+            tail = p99 / p50 if p50 else 0.0
+            signals.append(
+                Signal(
+                    "waiting",
+                    cycle[0],
+                    "p99_to_p50",
+                    tail,
+                    self.cycle_tail_threshold,
+                    tail >= self.cycle_tail_threshold,
+                    f"{cycle[0]} p50 {p50:.4g}, p99 {p99:.4g} ({tail:.1f}x) over {cycle_summary.count:,} items",
+                )
+            )
+
+        wip = self._first(metrics, WIP_METRICS)
+        if wip:
+            name, array = wip
+            tenth = max(1, len(array) // 10)
+            first = self.summarise(array[:tenth]).mean
+            last = self.summarise(array[len(array) - tenth :]).mean
+            growth = last / first if first else (float("inf") if last else 1.0)
+            signals.append(
+                Signal(
+                    "inventory",
+                    name,
+                    "growth",
+                    growth,
+                    self.wip_growth_threshold,
+                    len(array) > 1 and growth >= self.wip_growth_threshold,
+                    f"{name} grew {growth:.2f}x (mean {first:.4g} to {last:.4g})",
+                )
+            )
+
+        defects = self._first(metrics, DEFECT_METRICS)
+        if defects:
+            name, array = defects
+            rate = self.summarise(array).mean
+            described = f"averages {rate:.2%} over {len(array):,} items" if len(array) > 1 else f"is {rate:.2%}"
+            signals.append(
+                Signal(
+                    "defects",
+                    name,
+                    "rate",
+                    rate,
+                    self.defect_rate_threshold,
+                    rate >= self.defect_rate_threshold,
+                    f"{name} {described}",
+                )
+            )
+            if len(array) > 1:
+                window = min(self.defect_window, len(array))
+                worst = self.rolling_max_rate(array, window)
+                limit = 2 * max(rate, self.defect_rate_threshold)
+                signals.append(
+                    Signal(
+                        "defects",
+                        name,
+                        f"rolling_max_rate[{window}]",
+                        worst,
+                        limit,
+                        worst >= limit,
+                        f"worst {window}-item window of {name} reaches {worst:.2%}",
+                    )
+                )
+        return signals
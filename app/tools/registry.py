@@ -0,0 +1,379 @@
+"""Process-wide tool registry with bounded concurrent dispatch."""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from app import tracing
+
+from .base import BaseTool, ToolExecutionError
+
+if TYPE_CHECKING:
+    from app.text import AnalysedText
+
+# Receives a tool's name and each insight it streams, as soon as it is final.
+InsightCallback = Callable[[str, Any], None]
+
+
+@dataclass
+class RegisteredTool:
+    """A shared tool instance together with its dispatch limits."""
+
+    tool: BaseTool
+    max_concurrency: int = 4
+    timeout: Optional[float] = None
+    slots: threading.BoundedSemaphore = field(init=False, repr=False)
+    _async_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = field(
+        init=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        if self.max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._async_slots = weakref.WeakKeyDictionary()
+
+    def run(self, arguments: Dict[str, Any], analysed: Optional["AnalysedText"] = None) -> Dict[str, Any]:
+        with self.slots:
+            return self.tool.run(arguments, analysed)
+
+    async def arun(self, arguments: Dict[str, Any], analysed: Optional["AnalysedText"] = None) -> Dict[str, Any]:
+        async with self._loop_slots():
+            return await self.tool.arun(arguments, analysed)
+
+    def stream(
+        self, arguments: Dict[str, Any], analysed: Optional["AnalysedText"], on_insight: InsightCallback
+    ) -> Dict[str, Any]:
+        """:meth:`run`, passing insights to ``on_insight`` as the tool yields them.
+
+        Tools without an ``iter_run`` generator API simply run.
+        """
+
+        if getattr(self.tool, "iter_run", None) is None:
+            return self.run(arguments, analysed)
+        with self.slots:
+            return self._stream(arguments, analysed, on_insight)
+
+    async def astream(
+        self, arguments: Dict[str, Any], analysed: Optional["AnalysedText"], on_insight: InsightCallback
+    ) -> Dict[str, Any]:
+        if getattr(self.tool, "iter_run", None) is None:
+            return await self.arun(arguments, analysed)
+        loop = asyncio.get_running_loop()
+
+        def forward(name: str, insight: Any) -> None:
+            # Insights are handed back to the event loop that awaits the call.
+            loop.call_soon_threadsafe(on_insight, name, insight)
+
+        async with self._loop_slots():
+            return await asyncio.to_thread(self._stream, arguments, analysed, forward)
+
+    def _stream(
+        self, arguments: Dict[str, Any], analysed: Optional["AnalysedText"], on_insight: InsightCallback
+    ) -> Dict[str, Any]:
+        tool = self.tool
+        tracer = tracing.get_tracer()
+        if not tracer.enabled:
+            return self._drain(arguments, analysed, on_insight)
+        with tracer.span("tool", tool.name) as span:
+            span.input_bytes = tracing.payload_size(arguments)
+            result = self._drain(arguments, analysed, on_insight)
+            span.output_bytes = tracing.payload_size(result)
+            return result
+
+    def _drain(
+        self, arguments: Dict[str, Any], analysed: Optional["AnalysedText"], on_insight: InsightCallback
+    ) -> Dict[str, Any]:
+        insights = self.tool.iter_run(arguments, analysed)  # type: ignore[attr-defined]
+        for insight in insights:
+            on_insight(self.tool.name, insight)
+        return insights.result()
+
+    def run_batch(
+        self, items: Sequence[Dict[str, Any]], analysed: Sequence[Optional["AnalysedText"]]
+    ) -> List[Dict[str, Any] | Exception]:
+        with self.slots:
+            return self.tool.run_batch(items, analysed)
+
+    async def arun_batch(
+        self, items: Sequence[Dict[str, Any]], analysed: Sequence[Optional["AnalysedText"]]
+    ) -> List[Dict[str, Any] | Exception]:
+        async with self._loop_slots():
+            return await asyncio.to_thread(self.tool.run_batch, items, analysed)
+
+    def _loop_slots(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one loop, so each loop gets its own limit.
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.get(loop)
+        if slots is None:
+            slots = self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return slots
+
+
+# A tool's share of a batch: its name, entry, arguments and analysed texts.
+_Group = Tuple[str, RegisteredTool, List[Dict[str, Any]], List[Optional["AnalysedText"]]]
+
+
+class ToolRegistry:
+    """Hold one warmed-up instance per tool and run pending calls concurrently.
+
+    Calls are executed on a shared, bounded thread pool. Each tool additionally
+    limits how many of its calls may run at once and how long the caller waits
+    for a result. Results are always returned in the order the calls were made.
+    """
+
+    def __init__(self, max_workers: int = 8) -> None:
+        self.max_workers = max_workers
+        self._tools: Dict[str, RegisteredTool] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        tool: BaseTool,
+        *,
+        max_concurrency: int = 4,
+        timeout: Optional[float] = None,
+    ) -> BaseTool:
+        """Warm up ``tool`` and make it available under ``tool.name``."""
+
+        tool.warm_up()
+        self._tools[tool.name] = RegisteredTool(tool, max_concurrency=max_concurrency, timeout=timeout)
+        return tool
+
+    def get(self, name: str) -> Optional[BaseTool]:
+        entry = self._tools.get(name)
+        return entry.tool if entry is not None else None
+
+    def names(self) -> List[str]:
+        return list(self._tools)
+
+    def _schedule(self, calls: Iterable[Mapping[str, Any]]) -> List[Tuple[str, RegisteredTool, Dict[str, Any]]]:
+        scheduled: List[Tuple[str, RegisteredTool, Dict[str, Any]]] = []
+        for call in calls:
+            if not isinstance(call, Mapping):
+                # Pending calls come back as ToolCall models once the graph validates its state.
+                call = call.model_dump()
+            entry = self._tools.get(call["tool_name"])
+            if entry is not None:
+                scheduled.append((call["tool_name"], entry, call["arguments"]))
+        return scheduled
+
+    def dispatch(
+        self,
+        calls: Iterable[Mapping[str, Any]],
+        analysed: Optional["AnalysedText"] = None,
+        on_insight: Optional[InsightCallback] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Run ``calls`` concurrently and return ``(tool_name, result)`` in call order.
+
+        Calls naming an unknown tool are skipped. A call that exceeds its tool's
+        timeout raises :class:`ToolExecutionError`; other tool errors propagate.
+        ``analysed`` is shared with every tool whose text input it describes.
+        With ``on_insight``, tools that stream their results (``iter_run``) pass
+        each insight to it as soon as it is final, possibly from a worker thread.
+        """
+
+        scheduled = self._schedule(calls)
+        if len(scheduled) == 1 and scheduled[0][1].timeout is None:
+            name, entry, arguments = scheduled[0]
+            if on_insight is not None:
+                return [(name, entry.stream(arguments, analysed, on_insight))]
+            return [(name, entry.run(arguments, analysed))]
+
+        executor = self._get_executor()
+        started = time.monotonic()
+        futures: List[Future] = [
+            executor.submit(entry.run, arguments, analysed)
+            if on_insight is None
+            else executor.submit(entry.stream, arguments, analysed, on_insight)
+            for _, entry, arguments in scheduled
+        ]
+        try:
+            return [
+                (name, self._wait(name, entry, future, started))
+                for (name, entry, _), future in zip(scheduled, futures)
+            ]
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def adispatch(
+        self,
+        calls: Iterable[Mapping[str, Any]],
+        analysed: Optional["AnalysedText"] = None,
+        on_insight: Optional[InsightCallback] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Asynchronous :meth:`dispatch` that overlaps calls on the running event loop.
+
+        ``on_insight`` is called on the event loop.
+        """
+
+        scheduled = self._schedule(calls)
+        results = await asyncio.gather(
+            *(self._acall(name, entry, arguments, analysed, on_insight) for name, entry, arguments in scheduled)
+        )
+        return [(name, result) for (name, _, _), result in zip(scheduled, results)]
+
+    async def _acall(
+        self,
+        name: str,
+        entry: RegisteredTool,
+        arguments: Dict[str, Any],
+        analysed: Optional["AnalysedText"],
+        on_insight: Optional[InsightCallback] = None,
+    ) -> Dict[str, Any]:
+        call = entry.arun(arguments, analysed) if on_insight is None else entry.astream(arguments, analysed, on_insight)
+        if entry.timeout is None:
+            return await call
+        try:
+            return await asyncio.wait_for(call, entry.timeout)
+        except asyncio.TimeoutError:
+            raise ToolExecutionError(f"Tool '{name}' timed out after {entry.timeout}s") from None
+
+    def dispatch_batch(
+        self,
+        sessions: Sequence[Iterable[Mapping[str, Any]]],
+        analysed: Optional[Sequence[Optional["AnalysedText"]]] = None,
+    ) -> List[List[Tuple[str, Dict[str, Any]]] | Exception]:
+        """Run the calls of many sessions, grouped so each tool runs once per batch.
+
+        ``sessions`` holds each session's pending calls and ``analysed`` its
+        preprocessed text. Returns, per session, ``(tool_name, result)`` pairs in
+        call order like :meth:`dispatch`, or the first exception one of its calls
+        raised; other sessions are unaffected.
+        """
+
+        groups, scheduled = self._group(sessions, analysed)
+        if len(groups) == 1 and groups[0][1].timeout is None:
+            _, entry, items, texts = groups[0]
+            return self._collect(scheduled, [entry.run_batch(items, texts)])
+
+        executor = self._get_executor()
+        started = time.monotonic()
+        futures = [executor.submit(entry.run_batch, items, texts) for _, entry, items, texts in groups]
+        try:
+            outcomes = []
+            for (name, entry, items, _), future in zip(groups, futures):
+                try:
+                    outcomes.append(self._wait(name, entry, future, started))
+                except ToolExecutionError as exc:
+                    outcomes.append([exc] * len(items))
+            return self._collect(scheduled, outcomes)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def adispatch_batch(
+        self,
+        sessions: Sequence[Iterable[Mapping[str, Any]]],
+        analysed: Optional[Sequence[Optional["AnalysedText"]]] = None,
+    ) -> List[List[Tuple[str, Dict[str, Any]]] | Exception]:
+        """Asynchronous :meth:`dispatch_batch`; tool batches run in worker threads."""
+
+        groups, scheduled = self._group(sessions, analysed)
+        outcomes = await asyncio.gather(
+            *(self._acall_batch(name, entry, items, texts) for name, entry, items, texts in groups)
+        )
+        return self._collect(scheduled, outcomes)
+
+    async def _acall_batch(
+        self,
+        name: str,
+        entry: RegisteredTool,
+        items: List[Dict[str, Any]],
+        texts: List[Optional["AnalysedText"]],
+    ) -> List[Dict[str, Any] | Exception]:
+        if entry.timeout is None:
+            return await entry.arun_batch(items, texts)
+        try:
+            return await asyncio.wait_for(entry.arun_batch(items, texts), entry.timeout)
+        except asyncio.TimeoutError:
+            return [ToolExecutionError(f"Tool '{name}' timed out after {entry.timeout}s")] * len(items)
+
+    def _group(
+        self,
+        sessions: Sequence[Iterable[Mapping[str, Any]]],
+        analysed: Optional[Sequence[Optional["AnalysedText"]]],
+    ) -> Tuple[List[_Group], List[List[Tuple[str, int, int]]]]:
+        # Each scheduled call remembers its tool, group and position in the group.
+        groups: List[_Group] = []
+        group_of: Dict[str, int] = {}
+        scheduled: List[List[Tuple[str, int, int]]] = []
+        for index, calls in enumerate(sessions):
+            text = analysed[index] if analysed is not None else None
+            placed = []
+            for name, entry, arguments in self._schedule(calls):
+                if name not in group_of:
+                    group_of[name] = len(groups)
+                    groups.append((name, entry, [], []))
+                _, _, items, texts = groups[group_of[name]]
+                placed.append((name, group_of[name], len(items)))
+                items.append(arguments)
+                texts.append(text)
+            scheduled.append(placed)
+        return groups, scheduled
+
+    @staticmethod
+    def _collect(
+        scheduled: List[List[Tuple[str, int, int]]], outcomes: Sequence[Sequence[Dict[str, Any] | Exception]]
+    ) -> List[List[Tuple[str, Dict[str, Any]]] | Exception]:
+        results: List[List[Tuple[str, Dict[str, Any]]] | Exception] = []
+        for placed in scheduled:
+            session: List[Tuple[str, Dict[str, Any]]] = []
+            for name, group, position in placed:
+                result = outcomes[group][position]
+                if isinstance(result, Exception):
+                    results.append(result)
+                    break
+                session.append((name, result))
+            else:
+                results.append(session)
+        return results
+
+    def _wait(self, name: str, entry: RegisteredTool, future: Future, started: float) -> Dict[str, Any]:
+        if entry.timeout is None:
+            return future.result()
+        remaining = max(0.0, started + entry.timeout - time.monotonic())
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeoutError:
+            raise ToolExecutionError(f"Tool '{name}' timed out after {entry.timeout}s") from None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def default_tools() -> Sequence[BaseTool]:
+    """Instantiate the tools shipped with the Lean Concepts Agent."""
+
+    from .cache import get_tool_cache
+    from .waste_detector import WasteDetector
+
+    return [WasteDetector(cache=get_tool_cache())]
+
+
+@lru_cache(maxsize=1)
+def get_tool_registry() -> ToolRegistry:
+    """Return the process-wide :class:`ToolRegistry` with the default tools."""
+
+    registry = ToolRegistry()
+    for tool in default_tools():
+        registry.register(tool)
+    return registry
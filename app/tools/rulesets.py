@@ -0,0 +1,239 @@
+"""Waste taxonomies loaded from data files and compiled once per version.
+
+A ruleset is a JSON (or, with PyYAML installed, YAML) file named after its id
+in the ruleset directory, e.g. ``rulesets/software.json``::
+
+    {
+      "version": "2024.06",
+      "whole_words": false,
+      "categories": {
+        "waiting": {"keywords": ["queue", "blocked"], "action": "Limit work in progress."}
+      }
+    }
+
+:class:`RulesetRegistry` compiles each ruleset into a :class:`KeywordMatcher`
+the first time it is requested and serves the compiled object from memory
+afterwards. Files are re-checked at most every ``check_interval`` seconds;
+when one changes, the new version is compiled off to the side and swapped in
+with a single reference assignment, so requests already holding the previous
+:class:`Ruleset` finish with it undisturbed. A file that fails to load after
+an edit leaves the last good version in service.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple
+
+from .base import ToolExecutionError
+from .keyword_matcher import KeywordMatcher
+
+RULESET_SUFFIXES = (".json", ".yaml", ".yml")
+_RULESET_ID = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]*$")
+
+
+class RulesetError(ToolExecutionError):
+    """Raised when a ruleset is unknown or its file cannot be compiled."""
+
+
+class Ruleset(NamedTuple):
+    """A compiled, immutable waste taxonomy."""
+
+    id: str
+    version: str
+    matcher: KeywordMatcher
+    actions: Mapping[str, str]
+    source: Optional[Path] = None
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the keyword table and actions, used to key cached results."""
+
+        digest = hashlib.sha256(self.matcher.fingerprint.encode("utf-8"))
+        for category, action in sorted(self.actions.items()):
+            digest.update(f"\x00{category}\x01{action}".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    @classmethod
+    def from_tables(
+        cls,
+        ruleset_id: str,
+        categories: Mapping[str, Any],
+        actions: Mapping[str, str],
+        *,
+        version: str = "builtin",
+        whole_words: bool = False,
+        source: Optional[Path] = None,
+    ) -> "Ruleset":
+        return cls(ruleset_id, version, KeywordMatcher(categories, whole_words=whole_words), dict(actions), source)
+
+
+def parse_ruleset(ruleset_id: str, data: Mapping[str, Any], source: Optional[Path] = None) -> Ruleset:
+    """Validate the decoded contents of a ruleset file and compile it."""
+
+    if not isinstance(data, Mapping) or not isinstance(data.get("categories"), Mapping):
+        raise RulesetError(f"Ruleset '{ruleset_id}' must define a 'categories' mapping")
+    declared = data.get("id", ruleset_id)
+    if declared != ruleset_id:
+        raise RulesetError(f"Ruleset file for '{ruleset_id}' declares id '{declared}'")
+    categories: Dict[str, Tuple[str, ...]] = {}
+    actions: Dict[str, str] = {}
+    for category, spec in data["categories"].items():
+        if isinstance(spec, Mapping):
+            keywords, action = spec.get("keywords", ()), spec.get("action")
+        else:
+            keywords, action = spec, None
+        if isinstance(keywords, str) or not all(isinstance(keyword, str) for keyword in keywords):
+            raise RulesetError(f"Ruleset '{ruleset_id}': keywords for '{category}' must be a list of strings")
+        categories[str(category)] = tuple(keywords)
+        if action is not None:
+            actions[str(category)] = str(action)
+    return Ruleset.from_tables(
+        ruleset_id,
+        categories,
+        actions,
+        version=str(data.get("version", "0")),
+        whole_words=bool(data.get("whole_words", False)),
+        source=source,
+    )
+
+
+def load_ruleset(path: Path) -> Ruleset:
+    """Read and compile the ruleset stored at ``path``; its id is the file stem."""
+
+    path = Path(path)
+    try:
+        text = path.read_text(encoding="utf-8")
+        if path.suffix == ".json":
+            data = json.loads(text)
+        else:
+            import yaml
+
+            data = yaml.safe_load(text)
+    except ImportError:
+        raise RulesetError(f"PyYAML is required to load {path.name}") from None
+    except (OSError, ValueError) as exc:
+        raise RulesetError(f"Cannot read ruleset {path}: {exc}") from exc
+    return parse_ruleset(path.stem, data, source=path)
+
+
+class _Entry(NamedTuple):
+    ruleset: Ruleset
+    stamp: Optional[Tuple[int, int]]
+    checked_at: float
+
+
+class RulesetRegistry:
+    """Compile rulesets from a directory on demand and hot-swap them on change.
+
+    ``builtins`` are served when no file of the same id exists, so the
+    in-code TIMWOODS taxonomy keeps working without a ruleset directory.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        check_interval: float = 1.0,
+        builtins: Optional[Mapping[str, Ruleset]] = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.check_interval = check_interval
+        self.builtins: Dict[str, Ruleset] = dict(builtins or {})
+        self.errors: Dict[str, str] = {}
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "RulesetRegistry":
+        from app.config import get_settings
+
+        from .waste_detector import builtin_ruleset
+
+        settings = get_settings()
+        builtin = builtin_ruleset()
+        return cls(
+            settings.ruleset_dir,
+            check_interval=settings.ruleset_check_interval,
+            builtins={builtin.id: builtin},
+        )
+
+    def _locate(self, ruleset_id: str) -> Tuple[Optional[Path], Optional[Tuple[int, int]]]:
+        for suffix in RULESET_SUFFIXES:
+            path = self.directory / f"{ruleset_id}{suffix}"
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            return path, (stat.st_mtime_ns, stat.st_size)
+        return None, None
+
+    def get(self, ruleset_id: str) -> Ruleset:
+        """Return the compiled ruleset, reloading it if its file has changed."""
+
+        entry = self._entries.get(ruleset_id)
+        now = time.monotonic()
+        if entry is not None and now - entry.checked_at < self.check_interval:
+            return entry.ruleset
+        if not _RULESET_ID.match(ruleset_id):
+            raise RulesetError(f"Invalid ruleset id '{ruleset_id}'")
+
+        with self._lock:
+            entry = self._entries.get(ruleset_id)
+            if entry is not None and now - entry.checked_at < self.check_interval:
+                return entry.ruleset
+            path, stamp = self._locate(ruleset_id)
+            if entry is not None and stamp == entry.stamp:
+                self._entries[ruleset_id] = entry._replace(checked_at=now)
+                return entry.ruleset
+            try:
+                if path is not None:
+                    ruleset = load_ruleset(path)
+                elif ruleset_id in self.builtins:
+                    ruleset = self.builtins[ruleset_id]
+                else:
+                    raise RulesetError(f"Unknown ruleset '{ruleset_id}' in {self.directory}")
+            except RulesetError as exc:
+                if entry is None:
+                    raise
+                # Keep serving the last good version; retry after the interval.
+                self.errors[ruleset_id] = str(exc)
+                self._entries[ruleset_id] = entry._replace(checked_at=now)
+                return entry.ruleset
+            self.errors.pop(ruleset_id, None)
+            self._entries[ruleset_id] = _Entry(ruleset, stamp, now)
+            return ruleset
+
+    def available(self) -> Tuple[str, ...]:
+        """Ids of the rulesets that can be requested, sorted."""
+
+        ids = set(self.builtins)
+        if self.directory.is_dir():
+            ids.update(path.stem for path in self.directory.iterdir() if path.suffix in RULESET_SUFFIXES)
+        return tuple(sorted(ids))
+
+    def warm_up(self) -> None:
+        """Compile every available ruleset ahead of the first request."""
+
+        for ruleset_id in self.available():
+            self.get(ruleset_id)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Worker processes compile their own copies on first use.
+        return {"directory": self.directory, "check_interval": self.check_interval, "builtins": self.builtins}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
+
+
+@lru_cache(maxsize=1)
+def get_ruleset_registry() -> RulesetRegistry:
+    """Return the process-wide :class:`RulesetRegistry` configured from settings."""
+
+    return RulesetRegistry.from_settings()
@@ -1,12 +1,36 @@
 """Implementation of the WasteDetector tool for Lean waste identification."""
 from __future__ import annotations
 
-from collections import defaultdict
-from typing import Dict, List
+from contextvars import ContextVar
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
 
 from pydantic import BaseModel, Field
 
-from .base import BaseTool
+from .base import BaseTool, ToolExecutionError
+from .incremental import IncrementalAnalysis, SessionPool
+from .keyword_matcher import KeywordMatch, KeywordMatcher
+
+if TYPE_CHECKING:
+    from app.text import AnalysedText
+
+    from .cache import ToolCache
+    from .metric_signals import MetricAnalyser, Signal
+    from .rulesets import Ruleset, RulesetRegistry
 
 TIMWOODS_CATEGORIES: Dict[str, List[str]] = {
     "transportation": ["transport", "move", "shipment", "handoff"],
@@ -19,14 +43,34 @@ TIMWOODS_CATEGORIES: Dict[str, List[str]] = {
     "skills": ["skill", "underutilized", "talent", "expertise"],
 }
 
+TIMWOODS_MATCHER = KeywordMatcher(TIMWOODS_CATEGORIES)
+
+# Rulesets resolved during the current call, so its cache key and its matching
+# use the same version even if the file is reloaded in between.
+_RESOLVED: ContextVar[Optional[Dict[str, "Ruleset"]]] = ContextVar("resolved_rulesets", default=None)
+
 
 class WasteDetectorInput(BaseModel):
     """Input schema for the WasteDetector tool."""
 
     process_description: str = Field(..., description="Narrative of the process to analyse.")
-    metrics: Dict[str, float] | None = Field(
+    metrics: Dict[str, Any] | None = Field(
+        default=None,
+        description=(
+            "Optional key metrics such as cycle time or defect rate: numbers, sequences, "
+            "NumPy arrays (including memory maps) or, where the tool allows it, paths to .npy files."
+        ),
+    )
+    ruleset: Optional[str] = Field(
         default=None,
-        description="Optional key metrics such as cycle time or defect rate.",
+        description="Id of the waste taxonomy to apply. Defaults to the built-in TIMWOODS table.",
+    )
+    session: Optional[str] = Field(
+        default=None,
+        description=(
+            "Id of an incremental analysis session. Successive versions of a description sent "
+            "with the same id only rescan the edited regions."
+        ),
     )
 
 
@@ -38,6 +82,17 @@ class WasteInsight(BaseModel):
     recommended_action: str = Field(..., description="Suggested quick win countermeasure.")
 
 
+class MetricSignal(BaseModel):
+    """A statistic computed from the input metrics."""
+
+    category: str = Field(..., description="Waste category the statistic indicates.")
+    metric: str = Field(..., description="Metric or metric ratio the statistic was computed from.")
+    statistic: str = Field(..., description="Name of the statistic, such as queue_to_touch_ratio.")
+    value: float = Field(..., description="Computed value.")
+    threshold: float = Field(..., description="Value at or above which the signal is flagged.")
+    flagged: bool = Field(..., description="Whether the value indicates waste.")
+
+
 class WasteDetectorOutput(BaseModel):
     """Output schema for the WasteDetector tool."""
 
@@ -46,6 +101,73 @@ class WasteDetectorOutput(BaseModel):
         description="Detected wastes grouped by TIMWOODS categories.",
     )
     summary: str = Field(..., description="Narrative summary of quick win opportunities.")
+    signals: List[MetricSignal] = Field(
+        default_factory=list,
+        description="Statistics computed from the input metrics, flagged or not.",
+    )
+
+
+DEFAULT_ACTION = "Run a rapid Kaizen event to identify the best countermeasure."
+
+
+def supporting_evidence(keywords: Iterable[str], metrics: Sequence[str] = ()) -> str:
+    """Evidence text for a category: its matched keywords, then flagged metric statements."""
+
+    parts = [f"Keywords identified: {', '.join(sorted(set(keywords)))}."] if keywords else []
+    parts.extend(metrics)
+    return " ".join(parts)
+
+
+class StreamedInsight(NamedTuple):
+    """A waste insight yielded by :meth:`WasteDetector.iter_run` once it is final.
+
+    ``spans`` holds the first hit of each matched keyword, in text order, as
+    offsets into the analysed text rather than copies of it; slice the text
+    to show an excerpt. Insights replayed from the result cache have no spans.
+    """
+
+    category: str
+    supporting_evidence: str
+    recommended_action: str
+    spans: Tuple[KeywordMatch, ...] = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The insight as in ``WasteDetector.run`` output, plus ``[keyword, start, end]`` spans."""
+
+        return {
+            "category": self.category,
+            "supporting_evidence": self.supporting_evidence,
+            "recommended_action": self.recommended_action,
+            "spans": [[span.keyword, span.start, span.end] for span in self.spans],
+        }
+
+
+class InsightStream:
+    """Iterator over the insights of one analysis, each yielded as soon as it is final.
+
+    A category is final once every one of its keywords has been seen, or when
+    the scan ends. The scan stops early once every category is final. Call
+    :meth:`result` for the complete output, as :meth:`WasteDetector.run`
+    returns it; it drains any insights not yet consumed.
+    """
+
+    def __init__(self, insights: Iterator[StreamedInsight], finish: Callable[[], Dict[str, Any]]) -> None:
+        self._insights = insights
+        self._finish = finish
+        self._result: Optional[Dict[str, Any]] = None
+
+    def __iter__(self) -> "InsightStream":
+        return self
+
+    def __next__(self) -> StreamedInsight:
+        return next(self._insights)
+
+    def result(self) -> Dict[str, Any]:
+        if self._result is None:
+            for _ in self._insights:
+                pass
+            self._result = self._finish()
+        return self._result
 
 
 class WasteDetector(BaseTool[WasteDetectorInput, WasteDetectorOutput]):
@@ -55,6 +177,15 @@ class WasteDetector(BaseTool[WasteDetectorInput, WasteDetectorOutput]):
     description = "Identify Lean wastes from process narratives using TIMWOODS keywords."
     input_schema = WasteDetectorInput
     output_schema = WasteDetectorOutput
+    text_field = "process_description"
+    matcher: KeywordMatcher = TIMWOODS_MATCHER
+    # Registry consulted for inputs naming a ruleset; the process-wide one when unset.
+    rulesets: Optional["RulesetRegistry"] = None
+    # Computes metric signals; a default MetricAnalyser, which rejects file
+    # paths, when unset.
+    metric_analyser: Optional["MetricAnalyser"] = None
+    # Incremental sessions kept per tool instance, least recently used first out.
+    max_sessions = 256
 
     action_templates: Dict[str, str] = {
         "transportation": "Streamline handoffs or co-locate teams to reduce movement.",
@@ -67,27 +198,289 @@ class WasteDetector(BaseTool[WasteDetectorInput, WasteDetectorOutput]):
         "skills": "Provide upskilling or redesign roles to leverage talent.",
     }
 
+    def __init__(self, cache: Optional["ToolCache"] = None) -> None:
+        super().__init__(cache)
+        self.sessions = SessionPool(self.max_sessions)
+
+    def cache_token(self) -> str:
+        import hashlib
+
+        digest = hashlib.sha256(self.matcher.fingerprint.encode("utf-8"))
+        for category, action in sorted(self.action_templates.items()):
+            digest.update(f"\x00{category}\x01{action}".encode("utf-8"))
+        return f"{self.version}:{digest.hexdigest()[:16]}"
+
+    def parse_input(self, data: Dict[str, Any]) -> WasteDetectorInput:
+        parsed_input = super().parse_input(data)
+        if parsed_input.metrics and not self._metric_analyser().allow_paths:
+            from .metric_signals import is_path
+
+            paths = sorted(name for name, value in parsed_input.metrics.items() if is_path(value))
+            if paths:
+                raise ValueError(f"Metrics must be numbers or arrays, not file paths: {', '.join(paths)}")
+        return parsed_input
+
+    def input_token(self, parsed_input: WasteDetectorInput) -> Optional[str]:
+        parts = []
+        if parsed_input.ruleset is not None:
+            parts.append(self.get_ruleset(parsed_input.ruleset).fingerprint)
+        if parsed_input.metrics:
+            from .metric_signals import digest
+
+            # Array reprs are abbreviated, so the cache key needs the content's digest.
+            allow_paths = self._metric_analyser().allow_paths
+            for name, value in sorted(parsed_input.metrics.items()):
+                parts.append(f"{name}={digest(value, allow_paths=allow_paths)}")
+        return "|".join(parts) or None
+
+    def warm_up(self) -> None:
+        self.matcher.detect("warm up")
+
+    def get_ruleset(self, ruleset_id: str) -> "Ruleset":
+        """Return the compiled ruleset ``ruleset_id``, reloaded if its file changed."""
+
+        resolved = _RESOLVED.get()
+        if resolved is not None and ruleset_id in resolved:
+            return resolved[ruleset_id]
+        registry = self.rulesets
+        if registry is None:
+            from .rulesets import get_ruleset_registry
+
+            registry = get_ruleset_registry()
+        ruleset = registry.get(ruleset_id)
+        if resolved is not None:
+            resolved[ruleset_id] = ruleset
+        return ruleset
+
+    def _execute(self, parsed_input: WasteDetectorInput, analysed: Optional["AnalysedText"] = None) -> Dict[str, Any]:
+        token = _RESOLVED.set({})
+        try:
+            return super()._execute(parsed_input, analysed)
+        finally:
+            _RESOLVED.reset(token)
+
+    async def _aexecute(self, data: Dict[str, Any], analysed: Optional["AnalysedText"] = None) -> Dict[str, Any]:
+        # Worker threads started by the call inherit the context, and with it the dict.
+        token = _RESOLVED.set({})
+        try:
+            return await super()._aexecute(data, analysed)
+        finally:
+            _RESOLVED.reset(token)
+
+    def _rules(self, ruleset_id: Optional[str]) -> Tuple[KeywordMatcher, Mapping[str, str]]:
+        if ruleset_id is None:
+            return self.matcher, self.action_templates
+        # Resolve once per call so a concurrent hot swap cannot mix versions.
+        ruleset = self.get_ruleset(ruleset_id)
+        return ruleset.matcher, ruleset.actions
+
+    def analyse_metrics(self, metrics: Optional[Mapping[str, Any]]) -> List["Signal"]:
+        """Compute waiting, inventory and defect signals from ``metrics``."""
+
+        if not metrics:
+            return []
+        try:
+            return self._metric_analyser().analyse(metrics)
+        except (OSError, ValueError) as exc:
+            raise ToolExecutionError(f"Invalid metrics: {exc}") from exc
+
+    def _metric_analyser(self) -> "MetricAnalyser":
+        if self.metric_analyser is None:
+            from .metric_signals import MetricAnalyser
+
+            return MetricAnalyser()
+        return self.metric_analyser
+
+    def session(self, session_id: str, ruleset: Optional[str] = None) -> IncrementalAnalysis:
+        """Return the incremental analysis session ``session_id`` for ``ruleset``.
+
+        A session restarts from scratch when its ruleset is reloaded.
+        """
+
+        matcher, _ = self._rules(ruleset)
+        return self.sessions.get(session_id, matcher)
+
     def _run(self, parsed_input: WasteDetectorInput) -> WasteDetectorOutput:
-        description = parsed_input.process_description.lower()
-        detected: Dict[str, List[str]] = defaultdict(list)
+        matcher, actions = self._rules(parsed_input.ruleset)
+        if parsed_input.session is not None:
+            detected = self.sessions.get(parsed_input.session, matcher).update(parsed_input.process_description)
+        else:
+            detected = matcher.detect(parsed_input.process_description)
+        return self._build_output(detected, actions, self.analyse_metrics(parsed_input.metrics))
 
-        for category, keywords in TIMWOODS_CATEGORIES.items():
-            for keyword in keywords:
-                if keyword in description:
-                    detected[category].append(keyword)
+    def _run_analysed(self, parsed_input: WasteDetectorInput, analysed: "AnalysedText") -> WasteDetectorOutput:
+        if parsed_input.session is not None:
+            # Rescanning only the edit is cheaper than reusing a full analysis.
+            return self._run(parsed_input)
+        matcher, actions = self._rules(parsed_input.ruleset)
+        detected = matcher.detect(analysed.text, normalised=analysed.normalised)
+        return self._build_output(detected, actions, self.analyse_metrics(parsed_input.metrics))
 
-        wastes: List[WasteInsight] = []
-        for category, evidence in detected.items():
-            snippet = ", ".join(sorted(set(evidence)))
-            action = self.action_templates.get(
+    def analyze_stream(
+        self, stream: TextIO, *, chunk_size: int = 1 << 20, ruleset: Optional[str] = None
+    ) -> WasteDetectorOutput:
+        """Analyse a text stream chunk by chunk with bounded memory."""
+
+        matcher, actions = self._rules(ruleset)
+        detected = matcher.group(matcher.scan_stream_first(stream, chunk_size=chunk_size))
+        return self._build_output(detected, actions)
+
+    def iter_run(self, data: Dict[str, Any], analysed: Optional["AnalysedText"] = None) -> InsightStream:
+        """Analyse ``data`` like :meth:`run`, yielding each insight as soon as it is final.
+
+        Only the insights are built while scanning. The full output, summary
+        and signals included, is assembled by :meth:`InsightStream.result`
+        when a caller needs it, and is cached like :meth:`run` output.
+        """
+
+        parsed_input = self.parse_input(data)
+        token = _RESOLVED.set({})
+        try:
+            # The cache key and the matcher come from the same ruleset version.
+            matcher, actions = self._rules(parsed_input.ruleset)
+            key = self.cache.key_for(self, parsed_input) if self.cache is not None else None
+        finally:
+            _RESOLVED.reset(token)
+        cache = self.cache
+        store = None
+        if cache is not None:
+            cached = cache.get(self, key)
+            if cached is not None:
+                return InsightStream((StreamedInsight(**waste) for waste in cached["wastes"]), lambda: cached)
+
+            def store(output: WasteDetectorOutput) -> None:
+                cache.put(self, key, output)
+
+        text = parsed_input.process_description
+        usable = self._analysed_for(parsed_input, analysed)
+        order: Sequence[str] = matcher.categories
+        if parsed_input.session is not None:
+            session = self.sessions.get(parsed_input.session, matcher)
+            # Sessions rescan only the edit, so their hits are all known up front.
+            order = list(session.update(text))
+            matches: Iterable[KeywordMatch] = session.matches()
+        else:
+            # Only each keyword's first hit reaches the output.
+            matches = matcher.first_matches(text, normalised=None if usable is None else usable.normalised)
+        signals = self.analyse_metrics(parsed_input.metrics)
+        return self._stream(matches, matcher, actions, signals, order, store)
+
+    def iter_file(
+        self,
+        path: Path,
+        *,
+        chunk_size: int = 1 << 20,
+        encoding: str = "utf-8",
+        ruleset: Optional[str] = None,
+    ) -> InsightStream:
+        """Stream insights from ``path`` like :meth:`iter_run`, reading it chunk by chunk.
+
+        Reading stops as soon as every category is final; the file stays open
+        until the stream is exhausted.
+        """
+
+        matcher, actions = self._rules(ruleset)
+
+        def matches() -> Iterator[KeywordMatch]:
+            with open(path, "r", encoding=encoding, errors="replace") as stream:
+                yield from matcher.scan_stream_first(stream, chunk_size=chunk_size)
+
+        return self._stream(matches(), matcher, actions, [], matcher.categories)
+
+    def _stream(
+        self,
+        matches: Iterable[KeywordMatch],
+        matcher: KeywordMatcher,
+        actions: Mapping[str, str],
+        signals: Sequence["Signal"],
+        order: Sequence[str],
+        store: Optional[Callable[[WasteDetectorOutput], None]] = None,
+    ) -> InsightStream:
+        metrics: Dict[str, List[str]] = {}
+        for signal in signals:
+            if signal.flagged:
+                metrics.setdefault(signal.category, []).append(f"Metrics: {signal.evidence}.")
+        # First hit of each keyword per category, and the keywords still unseen.
+        spans: Dict[str, Dict[str, KeywordMatch]] = {}
+        missing = {category: set(matcher.category_keywords(category)) for category in matcher.categories}
+
+        def insight(category: str) -> StreamedInsight:
+            found = spans.get(category, {})
+            return StreamedInsight(
                 category,
-                "Run a rapid Kaizen event to identify the best countermeasure.",
+                supporting_evidence(found, metrics.get(category, ())),
+                actions.get(category, DEFAULT_ACTION),
+                tuple(found.values()),
             )
+
+        def insights() -> Iterator[StreamedInsight]:
+            open_categories = sum(1 for keywords in missing.values() if keywords)
+            iterator = iter(matches)
+            for match in iterator:
+                found = spans.setdefault(match.category, {})
+                if match.keyword in found:
+                    continue
+                found[match.keyword] = match
+                left = missing[match.category]
+                left.discard(match.keyword)
+                if not left:
+                    yield insight(match.category)
+                    open_categories -= 1
+                    if not open_categories:
+                        break
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                # Stop a streamed file scan that ended early.
+                close()
+            for category in order:
+                if category in spans and missing[category]:
+                    yield insight(category)
+            for category in metrics:
+                if category not in spans:
+                    yield insight(category)
+
+        def finish() -> Dict[str, Any]:
+            detected = {category: list(spans[category]) for category in order if category in spans}
+            output = self._build_output(detected, actions, signals)
+            if store is not None:
+                store(output)
+            return output.model_dump()
+
+        return InsightStream(insights(), finish)
+
+    def run_file(
+        self,
+        path: Path,
+        *,
+        chunk_size: int = 1 << 20,
+        encoding: str = "utf-8",
+        ruleset: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Stream a process description from ``path`` without loading it whole."""
+
+        with open(path, "r", encoding=encoding, errors="replace") as stream:
+            return self.analyze_stream(stream, chunk_size=chunk_size, ruleset=ruleset).model_dump()
+
+    def _build_output(
+        self,
+        detected: Dict[str, List[str]],
+        actions: Optional[Mapping[str, str]] = None,
+        signals: Sequence["Signal"] = (),
+    ) -> WasteDetectorOutput:
+        actions = self.action_templates if actions is None else actions
+        # Flagged metric signals join the text evidence for the same category.
+        metrics: Dict[str, List[str]] = {}
+        for signal in signals:
+            if signal.flagged:
+                metrics.setdefault(signal.category, []).append(f"Metrics: {signal.evidence}.")
+
+        wastes: List[WasteInsight] = []
+        for category in {**dict.fromkeys(detected), **dict.fromkeys(metrics)}:
             wastes.append(
                 WasteInsight(
                     category=category,
-                    supporting_evidence=f"Keywords identified: {snippet}.",
-                    recommended_action=action,
+                    supporting_evidence=supporting_evidence(detected.get(category, ()), metrics.get(category, ())),
+                    recommended_action=actions.get(category, DEFAULT_ACTION),
                 )
             )
 
@@ -96,10 +489,34 @@ class WasteDetector(BaseTool[WasteDetectorInput, WasteDetectorOutput]):
                 "Detected potential wastes across the process. Prioritise the listed "
                 "improvement opportunities to achieve immediate impact."
             )
+            if any(signal.flagged for signal in signals):
+                summary += " Process metrics corroborate part of the findings."
         else:
             summary = (
                 "No obvious wastes detected using the lightweight heuristic. Consider "
                 "collecting more data for deeper analysis."
             )
 
-        return WasteDetectorOutput(wastes=wastes, summary=summary)
+        return WasteDetectorOutput(
+            wastes=wastes,
+            summary=summary,
+            signals=[
+                MetricSignal(
+                    category=signal.category,
+                    metric=signal.metric,
+                    statistic=signal.statistic,
+                    value=signal.value,
+                    threshold=signal.threshold,
+                    flagged=signal.flagged,
+                )
+                for signal in signals
+            ],
+        )
+
+
+def builtin_ruleset() -> "Ruleset":
+    """The in-code TIMWOODS taxonomy as a ruleset, served when no file overrides it."""
+
+    from .rulesets import Ruleset
+
+    return Ruleset("timwoods", "builtin", WasteDetector.matcher, dict(WasteDetector.action_templates))
@@ -0,0 +1,333 @@
+"""Latency instrumentation for graph nodes and tool invocations.
+
+Spans record wall time, CPU time and approximate payload sizes. Every span is
+folded into an in-process latency histogram and forwarded to the configured
+sinks. When tracing is disabled callers check :attr:`Tracer.enabled` and skip
+all bookkeeping, so the overhead is a single attribute read.
+"""
+from __future__ import annotations
+
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Protocol, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SpanRecord(NamedTuple):
+    """Measurements captured for one node or tool execution."""
+
+    kind: str
+    name: str
+    started_at: float
+    wall_s: float
+    cpu_s: float
+    input_bytes: int
+    output_bytes: int
+    error: Optional[str] = None
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with bounded memory and ~2% precision.
+
+    Bucket ``i`` covers ``[base * growth**i, base * growth**(i + 1))`` seconds,
+    so percentile queries return the upper bound of the bucket holding the
+    requested rank.
+    """
+
+    base = 1e-6
+    growth = 1.04
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._buckets: Dict[int, int] = {}
+        self._log_growth = math.log(self.growth)
+
+    def record(self, seconds: float) -> None:
+        index = 0 if seconds <= self.base else int(math.log(seconds / self.base) / self._log_growth) + 1
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """Return the latency at percentile ``q`` (0-100) in seconds."""
+
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100.0))
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                return min(self.base * self.growth**index, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_s": self.total / self.count if self.count else 0.0,
+            "p50_s": self.percentile(50),
+            "p90_s": self.percentile(90),
+            "p99_s": self.percentile(99),
+            "max_s": self.max,
+        }
+
+
+class TraceSink(Protocol):
+    """Destination for finished spans."""
+
+    def emit(self, record: SpanRecord) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class JsonLinesSink:
+    """Append one JSON object per span to a local file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = self.path.open("a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def _line(self, record: SpanRecord) -> str:
+        return json.dumps(record._asdict(), separators=(",", ":"))
+
+    def emit(self, record: SpanRecord) -> None:
+        line = self._line(record)
+        with self._lock:
+            self._handle.write(line + "\n")
+            self._handle.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._handle.close()
+
+
+class OTLPFileSink(JsonLinesSink):
+    """Write spans in the OpenTelemetry file exporter format (OTLP/JSON lines)."""
+
+    service_name = "lean-concepts-agent"
+
+    def _line(self, record: SpanRecord) -> str:
+        import os
+
+        start_ns = int(record.started_at * 1e9)
+        span = {
+            "traceId": os.urandom(16).hex(),
+            "spanId": os.urandom(8).hex(),
+            "name": f"{record.kind}.{record.name}",
+            "kind": 1,
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(start_ns + int(record.wall_s * 1e9)),
+            "attributes": [
+                {"key": "lean.kind", "value": {"stringValue": record.kind}},
+                {"key": "lean.cpu_s", "value": {"doubleValue": record.cpu_s}},
+                {"key": "lean.input_bytes", "value": {"intValue": str(record.input_bytes)}},
+                {"key": "lean.output_bytes", "value": {"intValue": str(record.output_bytes)}},
+            ],
+            "status": {"code": 2, "message": record.error} if record.error else {"code": 1},
+        }
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]
+                    },
+                    "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": [span]}],
+                }
+            ]
+        }
+        return json.dumps(request, separators=(",", ":"))
+
+
+SINK_FACTORIES: Dict[str, Callable[[Path], TraceSink]] = {
+    "jsonl": JsonLinesSink,
+    "file": JsonLinesSink,
+    "otlp-file": OTLPFileSink,
+}
+
+
+def sink_for_endpoint(endpoint: str) -> TraceSink:
+    """Build a sink from a ``scheme://path`` endpoint such as ``jsonl:///tmp/spans.jsonl``.
+
+    Plain paths are written as JSON lines. Additional schemes can be plugged in
+    through :data:`SINK_FACTORIES`.
+    """
+
+    from urllib.parse import urlparse
+
+    parsed = urlparse(endpoint)
+    if not parsed.scheme or len(parsed.scheme) == 1:  # bare path (or a Windows drive letter)
+        return JsonLinesSink(Path(endpoint))
+    factory = SINK_FACTORIES.get(parsed.scheme)
+    if factory is None:
+        raise ValueError(f"Unsupported tracing endpoint scheme '{parsed.scheme}'")
+    return factory(Path(parsed.netloc + parsed.path))
+
+
+class Span:
+    """Mutable handle used to attach payload sizes while a span is open."""
+
+    __slots__ = ("input_bytes", "output_bytes")
+
+    def __init__(self) -> None:
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+
+class Tracer:
+    """Collect span measurements into histograms and forward them to sinks."""
+
+    def __init__(self, sinks: Optional[List[TraceSink]] = None, enabled: Optional[bool] = None) -> None:
+        self.sinks: List[TraceSink] = list(sinks or [])
+        self.enabled = bool(self.sinks) if enabled is None else enabled
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, kind: str, name: str) -> Iterator[Span]:
+        handle = Span()
+        started_at = time.time()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        error: Optional[str] = None
+        try:
+            yield handle
+        except BaseException as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            self.record(
+                SpanRecord(
+                    kind=kind,
+                    name=name,
+                    started_at=started_at,
+                    wall_s=time.perf_counter() - wall_start,
+                    cpu_s=time.thread_time() - cpu_start,
+                    input_bytes=handle.input_bytes,
+                    output_bytes=handle.output_bytes,
+                    error=error,
+                )
+            )
+
+    def record(self, record: SpanRecord) -> None:
+        with self._lock:
+            histogram = self._histograms.get((record.kind, record.name))
+            if histogram is None:
+                histogram = self._histograms[(record.kind, record.name)] = LatencyHistogram()
+            histogram.record(record.wall_s)
+        for sink in self.sinks:
+            sink.emit(record)
+
+    def histogram(self, kind: str, name: str) -> LatencyHistogram:
+        return self._histograms.get((kind, name)) or LatencyHistogram()
+
+    def percentile(self, kind: str, name: str, q: float) -> float:
+        return self.histogram(kind, name).percentile(q)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Return a latency summary per ``kind.name``."""
+
+        with self._lock:
+            return {f"{kind}.{name}": histogram.summary() for (kind, name), histogram in self._histograms.items()}
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+
+_tracer = Tracer(enabled=False)
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer (disabled until configured)."""
+
+    return _tracer
+
+
+def configure_tracing(endpoint: Optional[str] = None, *, enabled: Optional[bool] = None) -> Tracer:
+    """Install a new process-wide tracer writing to ``endpoint``.
+
+    With no endpoint and ``enabled=True`` spans are only aggregated in memory.
+    """
+
+    global _tracer
+    sinks = [sink_for_endpoint(endpoint)] if endpoint else []
+    previous, _tracer = _tracer, Tracer(sinks, enabled=enabled if enabled is not None else bool(sinks))
+    previous.close()
+    return _tracer
+
+
+@lru_cache(maxsize=1)
+def configure_from_settings() -> Tracer:
+    """Configure tracing once from :attr:`app.config.Settings.tracing_endpoint`."""
+
+    from app.config import get_settings
+
+    return configure_tracing(get_settings().tracing_endpoint)
+
+
+def payload_size(value: Any) -> int:
+    """Approximate the serialised size of ``value`` in bytes without serialising it."""
+
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if value is None or isinstance(value, (bool, int, float)):
+        return 8
+    if isinstance(value, dict):
+        return sum(len(str(key)) + payload_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(item) for item in value)
+    fields = getattr(value, "__fields__", None)
+    if fields is not None:
+        return sum(len(name) + payload_size(getattr(value, name, None)) for name in fields)
+    return len(str(value))
+
+
+def traced(kind: str, name: str, func: Callable[[Any], T]) -> Callable[[Any], T]:
+    """Wrap a single-argument callable, such as a graph node, in a span."""
+
+    @wraps(func)
+    def wrapper(value: Any) -> T:
+        tracer = _tracer
+        if not tracer.enabled:
+            return func(value)
+        with tracer.span(kind, name) as span:
+            span.input_bytes = payload_size(value)
+            result = func(value)
+            span.output_bytes = payload_size(result)
+            return result
+
+    return wrapper
+
+
+def atraced(kind: str, name: str, func: Callable[[Any], Awaitable[T]]) -> Callable[[Any], Awaitable[T]]:
+    """Asynchronous counterpart of :func:`traced`.
+
+    CPU time is measured on the event loop thread, so it also includes work
+    from other coroutines that ran while the span was suspended.
+    """
+
+    @wraps(func)
+    async def wrapper(value: Any) -> T:
+        tracer = _tracer
+        if not tracer.enabled:
+            return await func(value)
+        with tracer.span(kind, name) as span:
+            span.input_bytes = payload_size(value)
+            result = await func(value)
+            span.output_bytes = payload_size(result)
+            return result
+
+    return wrapper
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Load test: many concurrent AgentState sessions through ``ainvoke``.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_async_sessions --sessions 500 --concurrency 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from app.agent.graph import build_graph
+from app.agent.state import AgentState
+
+GOALS = [
+    "Orders wait in a queue for approval, causing delay before shipment.",
+    "Technicians walk to the warehouse to fetch stock, then rework defects by hand.",
+    "Reports are duplicated manually and the backlog keeps growing.",
+]
+
+
+def _state(index: int) -> AgentState:
+    return AgentState(user_goal=f"{GOALS[index % len(GOALS)]} (session {index})")
+
+
+async def run_concurrent(compiled, sessions: int, concurrency: int) -> List[float]:
+    limiter = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(index: int) -> None:
+        async with limiter:
+            started = time.perf_counter()
+            await compiled.ainvoke(_state(index))
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(index) for index in range(sessions)))
+    return latencies
+
+
+def run_sequential(compiled, sessions: int) -> None:
+    for index in range(sessions):
+        compiled.invoke(_state(index))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    compiled = build_graph().compile()
+
+    started = time.perf_counter()
+    run_sequential(compiled, args.sessions)
+    sequential = time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = asyncio.run(run_concurrent(compiled, args.sessions, args.concurrency))
+    concurrent = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"sessions={args.sessions} concurrency={args.concurrency}")
+    print(f"sequential invoke : {args.sessions / sequential:8.1f} sessions/s")
+    print(f"concurrent ainvoke: {args.sessions / concurrent:8.1f} sessions/s")
+    print(f"ainvoke latency   : p50={statistics.median(latencies) * 1000:.1f}ms p99={p99 * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Batch throughput with and without near-duplicate suppression.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_dedup --records 20000 --duplicates 0.5
+
+A ``--duplicates`` share of the records are copies of earlier records with a
+few words replaced, as in bulk submissions of templated narratives. Both runs
+analyse the same records in the same order with one worker.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import random
+from typing import List
+
+from app.batch import BatchPipeline, Record
+from app.dedup import NearDuplicateIndex
+from app.tools.waste_detector import WasteDetector
+
+from .bench_similarity_index import perturb
+from .generator import NarrativeGenerator
+
+
+def make_records(count: int, duplicates: float, size: int, seed: int = 24) -> List[Record]:
+    rng = random.Random(seed)
+    generator = NarrativeGenerator(seed=seed)
+    texts: List[str] = []
+    for _ in range(count):
+        if texts and rng.random() < duplicates:
+            texts.append(perturb(rng.choice(texts), rng, replacements=1))
+        else:
+            texts.append(generator.narrative(size))
+    return [(str(i), {"process_description": text}) for i, text in enumerate(texts)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--duplicates", type=float, default=0.5, help="Share of records that are edited copies")
+    parser.add_argument("--characters", type=int, default=2_000, help="Narrative length")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args()
+
+    records = make_records(args.records, args.duplicates, args.characters)
+    print(f"records={args.records} duplicates={args.duplicates} characters={args.characters}")
+    for label, dedup in (("no dedup", None), (f"dedup {args.threshold}", NearDuplicateIndex(args.threshold))):
+        summary = BatchPipeline(WasteDetector(), workers=1, dedup=dedup).run(records, io.StringIO())
+        print(f"{label:12s}: {summary.describe()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Sessions per second: per-session ``invoke`` against grouped ``batch``/``abatch``.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_graph_batch --sessions 2000 --batch-size 64
+
+Every path gets its own distinct goals, so no path is served from another's
+result cache.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Callable, List
+
+from app.agent.graph import build_graph, get_compiled_graph
+from app.agent.state import AgentState
+from benchmarks.generator import NarrativeGenerator
+
+
+def _batches(goals: List[str], size: int) -> List[List[AgentState]]:
+    return [
+        [AgentState(user_goal=goal) for goal in goals[start : start + size]] for start in range(0, len(goals), size)
+    ]
+
+
+def rebuild_per_run(goals: List[str]) -> None:
+    # What example_usage.py used to do: build and compile the graph for each run.
+    for goal in goals:
+        build_graph().compile().invoke(AgentState(user_goal=goal))
+
+
+def invoke_each(goals: List[str]) -> None:
+    graph = get_compiled_graph()
+    for goal in goals:
+        graph.invoke(AgentState(user_goal=goal))
+
+
+def langgraph_batch(goals: List[str], size: int) -> None:
+    compiled = get_compiled_graph().compiled
+    for batch in _batches(goals, size):
+        compiled.batch(batch)
+
+
+def grouped_batch(goals: List[str], size: int) -> None:
+    graph = get_compiled_graph()
+    for batch in _batches(goals, size):
+        graph.batch(batch)
+
+
+def grouped_abatch(goals: List[str], size: int) -> None:
+    graph = get_compiled_graph()
+
+    async def run() -> None:
+        for batch in _batches(goals, size):
+            await graph.abatch(batch)
+
+    asyncio.run(run())
+
+
+def _rate(run: Callable[[List[str]], None], goals: List[str]) -> float:
+    started = time.perf_counter()
+    run(goals)
+    return len(goals) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2_000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--characters", type=int, default=2_000, help="Goal length per session")
+    args = parser.parse_args()
+
+    generator = NarrativeGenerator(seed=23)
+    goals = list(generator.documents(args.sessions * 5, args.characters))
+    get_compiled_graph()  # Compile once up front, outside the timed runs.
+    size = args.batch_size
+    paths = [
+        ("rebuild + invoke per session", rebuild_per_run, max(args.sessions // 10, 1)),
+        ("cached graph, invoke per session", invoke_each, args.sessions),
+        ("LangGraph batch", lambda chunk: langgraph_batch(chunk, size), args.sessions),
+        ("grouped batch", lambda chunk: grouped_batch(chunk, size), args.sessions),
+        ("grouped abatch", lambda chunk: grouped_abatch(chunk, size), args.sessions),
+    ]
+    print(f"sessions={args.sessions} batch_size={size} characters={args.characters}")
+    rates = []
+    for offset, (label, run, count) in enumerate(paths):
+        rates.append(_rate(run, goals[offset * args.sessions : offset * args.sessions + count]))
+    # Speed-ups are relative to invoking the cached graph once per session.
+    for (label, _, _), rate in zip(paths, rates):
+        print(f"{label:34s}: {rate:8.1f} sessions/s ({rate / rates[1]:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Compare the compiled keyword matcher against per-keyword substring scans.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_keyword_matcher --text-kb 1024
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import time
+from typing import Dict, List
+
+from app.tools.keyword_matcher import KeywordMatcher
+from app.tools.waste_detector import TIMWOODS_CATEGORIES
+
+
+def naive_detect(categories: Dict[str, List[str]], text: str) -> Dict[str, List[str]]:
+    """The original ``WasteDetector`` strategy: one substring scan per keyword."""
+
+    lowered = text.lower()
+    detected: Dict[str, List[str]] = {}
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            if keyword in lowered:
+                detected.setdefault(category, []).append(keyword)
+    return detected
+
+
+def synthetic_table(size: int, rng: random.Random) -> Dict[str, List[str]]:
+    """Grow the TIMWOODS table with random terms until it holds ``size`` keywords."""
+
+    table = {category: list(keywords) for category, keywords in TIMWOODS_CATEGORIES.items()}
+    categories = list(table)
+    total = sum(len(keywords) for keywords in table.values())
+    while total < size:
+        term = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+        table[rng.choice(categories)].append(term)
+        total += 1
+    return table
+
+
+def synthetic_text(size_bytes: int, table: Dict[str, List[str]], rng: random.Random) -> str:
+    keywords = [keyword for keywords in table.values() for keyword in keywords]
+    filler = ["the", "team", "reviews", "each", "request", "before", "approval", "and", "then"]
+    words: List[str] = []
+    length = 0
+    while length < size_bytes:
+        word = rng.choice(keywords) if rng.random() < 0.02 else rng.choice(filler)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def _best_of(repeats: int, func, *args) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--text-kb", type=int, default=1024, help="Size of the scanned text in KiB.")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[34, 250, 1000, 5000, 10000],
+        help="Keyword table sizes to benchmark.",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'keywords':>9} {'compile ms':>11} {'naive ms':>10} {'matcher ms':>11} {'speedup':>8}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        table = synthetic_table(size, rng)
+        text = synthetic_text(args.text_kb * 1024, table, rng)
+
+        started = time.perf_counter()
+        matcher = KeywordMatcher(table)
+        compile_time = time.perf_counter() - started
+
+        naive = _best_of(args.repeats, naive_detect, table, text)
+        compiled = _best_of(args.repeats, matcher.detect, text)
+        print(
+            f"{size:>9} {compile_time * 1000:>11.1f} {naive * 1000:>10.1f} "
+            f"{compiled * 1000:>11.1f} {naive / compiled:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
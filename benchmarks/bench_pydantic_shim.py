@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the bundled pydantic shim.
+
+Compares the generated per-class methods against the previous generic
+implementation, reproduced below as ``LegacyBaseModel``. Run from the
+repository root::
+
+    python -m benchmarks.bench_pydantic_shim
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import timeit
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, Field
+from pydantic import FieldInfo as _FieldInfo
+
+
+class LegacyMeta(type):
+    def __new__(mcls, name, bases, namespace, **kwargs):
+        annotations = namespace.get("__annotations__", {})
+        fields: Dict[str, _FieldInfo] = {}
+        for base in bases:
+            if hasattr(base, "__fields__"):
+                fields.update(base.__fields__)
+        for field_name in annotations:
+            value = namespace.get(field_name, ...)
+            fields[field_name] = value if isinstance(value, _FieldInfo) else Field(default=value)
+        namespace["__fields__"] = fields
+        return super().__new__(mcls, name, bases, namespace)
+
+
+class LegacyBaseModel(metaclass=LegacyMeta):
+    def __init__(self, **data: Any) -> None:
+        for key, value in self.__class__._validate_dict(data).items():
+            setattr(self, key, value)
+
+    @classmethod
+    def _validate_dict(cls, data: Dict[str, Any]) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        for field_name, info in cls.__fields__.items():
+            if field_name in data:
+                values[field_name] = data[field_name]
+            elif info.default is not ...:
+                values[field_name] = info.default
+            elif info.default_factory is not None:
+                values[field_name] = info.default_factory()
+            else:
+                raise ValueError(f"Missing required field '{field_name}'")
+        return values
+
+    @classmethod
+    def model_validate(cls, data: Dict[str, Any]) -> "LegacyBaseModel":
+        instance = cls.__new__(cls)
+        for key, value in cls._validate_dict(data).items():
+            setattr(instance, key, value)
+        return instance
+
+    def model_dump(self) -> Dict[str, Any]:
+        def _dump(value: Any) -> Any:
+            if isinstance(value, LegacyBaseModel):
+                return value.model_dump()
+            if isinstance(value, list):
+                return [_dump(item) for item in value]
+            if isinstance(value, dict):
+                return {key: _dump(item) for key, item in value.items()}
+            return value
+
+        return {field_name: _dump(getattr(self, field_name)) for field_name in self.__fields__}
+
+
+def _models(base: type):
+    class Insight(base):
+        category: str = Field(..., description="TIMWOODS waste category.")
+        supporting_evidence: str = Field(..., description="Excerpt from the process description.")
+        recommended_action: str = Field(..., description="Suggested quick win countermeasure.")
+
+    class Output(base):
+        wastes: List[Insight] = Field(default_factory=list, description="Detected wastes.")
+        summary: str = Field(..., description="Narrative summary.")
+
+    return Insight, Output
+
+
+def _instance_size(instance: Any) -> int:
+    size = sys.getsizeof(instance)
+    if hasattr(instance, "__dict__"):
+        size += sys.getsizeof(instance.__dict__)
+    return size
+
+
+def _bench(label: str, func, number: int) -> float:
+    seconds = min(timeit.repeat(func, number=number, repeat=3))
+    rate = number / seconds
+    print(f"  {label:<28} {rate:>12,.0f} ops/s")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    insight_data = {
+        "category": "waiting",
+        "supporting_evidence": "Keywords identified: delay, queue.",
+        "recommended_action": "Balance workloads or add cross-training to shrink wait times.",
+    }
+    rates: Dict[str, Dict[str, float]] = {}
+    for label, base in (("legacy", LegacyBaseModel), ("generated", BaseModel)):
+        Insight, Output = _models(base)
+        output = Output(wastes=[Insight(**insight_data) for _ in range(8)], summary="Detected potential wastes.")
+        print(f"{label} (instance size {_instance_size(Insight(**insight_data))} bytes):")
+        rates[label] = {
+            "construct": _bench("construct insight", lambda: Insight(**insight_data), args.number),
+            "validate": _bench("model_validate insight", lambda: Insight.model_validate(insight_data), args.number),
+            "dump": _bench("model_dump output (8 wastes)", output.model_dump, args.number // 4),
+            "json": _bench(
+                "json bytes output (8 wastes)",
+                output._dump_json
+                if label == "generated"
+                else lambda: json.dumps(output.model_dump()).encode("utf-8"),
+                args.number // 4,
+            ),
+        }
+
+    print("speedup:")
+    for key in rates["legacy"]:
+        print(f"  {key:<28} {rates['generated'][key] / rates['legacy'][key]:>11.2f}x")
+
+
+if __name__ == "__main__":
+    main()
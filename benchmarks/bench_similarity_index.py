@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Measure ingest throughput, recall and latency of the local similarity index.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_similarity_index --documents 1000000 --queries 200
+
+Each query is a stored narrative with one sentence dropped and a few words
+replaced, so the stored original is the correct nearest neighbour. Recall@1
+and per-query latency are reported for the default (SimHash shortlist) path
+and for the exhaustive scan.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from app.similarity import SimilarityIndex
+
+from .generator import NarrativeGenerator
+
+OUTPUT = {"wastes": [{"category": "waiting"}], "summary": "Detected potential wastes: waiting."}
+
+
+def perturb(narrative: str, rng: random.Random, replacements: int = 3) -> str:
+    """Drop one sentence and swap ``replacements`` words for unrelated ones."""
+
+    sentences = narrative.split(". ")
+    if len(sentences) > 2:
+        del sentences[rng.randrange(len(sentences))]
+    words = ". ".join(sentences).split()
+    for _ in range(replacements):
+        words[rng.randrange(len(words))] = rng.choice(["quickly", "rarely", "twice", "manually", "remotely"])
+    return " ".join(words)
+
+
+def measure(search: Callable[[str], int], queries: List[Tuple[int, str]]) -> Dict[str, float]:
+    latencies: List[float] = []
+    hits = 0
+    for row, query in queries:
+        started = time.perf_counter()
+        found = search(query)
+        latencies.append(time.perf_counter() - started)
+        hits += found == row
+    latencies.sort()
+    return {
+        "recall": hits / len(queries),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--size-bytes", type=int, default=400, help="Approximate length of each narrative.")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--directory", type=Path, help="Keep the index here instead of a temporary directory.")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    query_rows = set(rng.sample(range(args.documents), min(args.queries, args.documents)))
+    originals: Dict[int, str] = {}
+
+    def corpus():
+        for row, narrative in enumerate(NarrativeGenerator(seed=args.seed).documents(args.documents, args.size_bytes)):
+            if row in query_rows:
+                originals[row] = narrative
+            yield narrative, OUTPUT
+
+    with tempfile.TemporaryDirectory() as scratch:
+        index = SimilarityIndex(args.directory or Path(scratch))
+        started = time.perf_counter()
+        index.add_many(corpus())
+        elapsed = time.perf_counter() - started
+        print(f"ingested {len(index):,} documents in {elapsed:.1f}s ({len(index) / elapsed:,.0f} docs/s)")
+
+        queries = [(row, perturb(originals[row], rng)) for row in sorted(originals)]
+        print(f"{'path':>8} {'recall@1':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, exact in (("lsh", False), ("exact", True)):
+            stats = measure(lambda query: index.search(query, k=1, exact=exact)[0].row, queries)
+            print(f"{name:>8} {stats['recall']:>9.3f} {stats['p50_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Closed-loop load generator for the HTTP analysis service.
+
+Each of ``--connections`` keep-alive connections sends requests back to back
+for ``--duration`` seconds, then the service's own ``/metrics`` are printed
+next to the client-side throughput and latency. Run from the repository root
+against a running service::
+
+    python main.py --serve --port 8080 &
+    python -m benchmarks.load_generator --url http://127.0.0.1:8080 --connections 64
+
+or let the script start one (``--spawn``) on a free port.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from app.tracing import LatencyHistogram
+from benchmarks.generator import NarrativeGenerator
+
+
+def _request(method: str, path: str, host: str, body: bytes = b"") -> bytes:
+    head = (
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def fetch(host: str, port: int, method: str, path: str, body: bytes = b"") -> Tuple[int, bytes]:
+    """Send one request on a fresh connection."""
+
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(_request(method, path, host, body))
+        await writer.drain()
+        return await _read_response(reader)
+    finally:
+        writer.close()
+
+
+async def run_load(
+    host: str, port: int, path: str, bodies: List[bytes], connections: int, duration: float
+) -> Tuple[Counter, LatencyHistogram, float]:
+    statuses: Counter = Counter()
+    histogram = LatencyHistogram()
+    deadline = time.perf_counter() + duration
+
+    async def client(offset: int) -> None:
+        reader, writer = await asyncio.open_connection(host, port)
+        index = offset
+        try:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                writer.write(_request("POST", path, host, bodies[index % len(bodies)]))
+                await writer.drain()
+                status, _ = await _read_response(reader)
+                histogram.record(time.perf_counter() - started)
+                statuses[status] += 1
+                index += connections
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(offset) for offset in range(connections)))
+    return statuses, histogram, time.perf_counter() - started
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _spawn(port: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "main.py", "--serve", "--host", "127.0.0.1", "--port", str(port)],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    # The service announces itself once it is listening.
+    assert process.stderr is not None
+    line = process.stderr.readline()
+    if "Serving" not in line:
+        process.kill()
+        raise RuntimeError(f"Service failed to start: {line}{process.stderr.read()}")
+    return process
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--spawn", action="store_true", help="Start a local service on a free port")
+    parser.add_argument("--endpoint", default="/v1/tools/waste_detector")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--characters", type=int, default=2_000, help="Narrative length per request")
+    parser.add_argument("--distinct", type=int, default=4096, help="Distinct request bodies to cycle through")
+    args = parser.parse_args()
+
+    process: Optional[subprocess.Popen] = None
+    if args.spawn:
+        host, port = "127.0.0.1", _free_port()
+        process = _spawn(port)
+    else:
+        url = urlsplit(args.url)
+        host, port = url.hostname or "127.0.0.1", url.port or 80
+
+    field = "user_goal" if args.endpoint == "/v1/agent" else "process_description"
+    documents = NarrativeGenerator(seed=11).documents(args.distinct, args.characters)
+    bodies = [json.dumps({field: text}).encode("utf-8") for text in documents]
+    try:
+        statuses, histogram, elapsed = asyncio.run(
+            run_load(host, port, args.endpoint, bodies, args.connections, args.duration)
+        )
+        _, metrics = asyncio.run(fetch(host, port, "GET", "/metrics?format=json"))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    completed = sum(statuses.values())
+    print(
+        f"{completed} requests over {args.connections} connections in {elapsed:.1f}s: "
+        f"{completed / elapsed:,.0f} req/s"
+    )
+    print(
+        f"client latency p50 {histogram.percentile(50) * 1000:.1f}ms "
+        f"p90 {histogram.percentile(90) * 1000:.1f}ms p99 {histogram.percentile(99) * 1000:.1f}ms"
+    )
+    print("status codes:", dict(sorted(statuses.items())))
+    pipelines: Dict[str, Dict] = json.loads(metrics)["pipelines"]
+    for name, stats in pipelines.items():
+        if not stats["requests"]:
+            continue
+        print(
+            f"{name}: {stats['batches']} batches, mean size {stats['mean_batch_size']:.1f} "
+            f"(max {stats['max_batch_size']}), {stats['shed']} shed, "
+            f"queue wait p99 {stats['queue_wait']['p99_s'] * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
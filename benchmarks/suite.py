@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""Reproducible benchmark suite with JSON results and baseline comparison.
+
+Run from the repository root::
+
+    python -m benchmarks.suite run --output results.json
+    python -m benchmarks.suite run --quick --baseline benchmarks/baseline.json
+    python -m benchmarks.suite compare baseline.json results.json --threshold 0.15
+
+Benchmarks whose optional dependencies (langgraph, jinja2) are missing are
+reported as skipped rather than failing the run.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .generator import NarrativeGenerator
+
+DEFAULT_SIZES = [100, 10_000, 1_000_000, 10_000_000, 100_000_000]
+QUICK_SIZES = [100, 10_000, 1_000_000]
+
+
+@dataclass
+class Measurement:
+    """Timing summary for one benchmark case."""
+
+    name: str
+    median_s: float
+    min_s: float
+    repeats: int
+    bytes: Optional[int] = None
+
+    @property
+    def throughput_mb_s(self) -> Optional[float]:
+        if not self.bytes or not self.min_s:
+            return None
+        return self.bytes / self.min_s / 1_000_000
+
+
+@dataclass
+class Case:
+    name: str
+    setup: Callable[[], Callable[[], object]]
+    repeats: int = 5
+    bytes: Optional[int] = None
+
+
+class SkipBenchmark(Exception):
+    """Raised by a case setup when an optional dependency is unavailable."""
+
+
+def _repeats_for(size: int) -> int:
+    if size >= 10_000_000:
+        return 1
+    if size >= 1_000_000:
+        return 3
+    return 20
+
+
+def waste_detector_cases(sizes: List[int], seed: int, density: float) -> Iterator[Case]:
+    def setup_for(size: int) -> Callable[[], Callable[[], object]]:
+        def setup() -> Callable[[], object]:
+            from app.tools.waste_detector import WasteDetector
+
+            detector = WasteDetector()
+            payload = {"process_description": NarrativeGenerator(seed, density).narrative(size)}
+            return lambda: detector.run(payload)
+
+        return setup
+
+    for size in sizes:
+        yield Case(f"waste_detector.run[{size}B]", setup_for(size), repeats=_repeats_for(size), bytes=size)
+
+
+def corpus_cases(seed: int, density: float, documents: int = 20_000, size: int = 300) -> Iterator[Case]:
+    def loop_setup() -> Callable[[], object]:
+        from app.tools.waste_detector import WasteDetector
+
+        detector = WasteDetector()
+        corpus = list(NarrativeGenerator(seed, density).documents(documents, size))
+        return lambda: [detector.run({"process_description": text}) for text in corpus]
+
+    def scorer_setup() -> Callable[[], object]:
+        try:
+            from app.tools.corpus_scorer import CorpusScorer
+
+            scorer = CorpusScorer()
+        except ImportError as exc:  # pragma: no cover - numpy is optional
+            raise SkipBenchmark(str(exc)) from exc
+        corpus = list(NarrativeGenerator(seed, density).documents(documents, size))
+        return lambda: scorer.score(corpus)
+
+    total = documents * size
+    yield Case(f"corpus.detector_loop[{documents}x{size}B]", loop_setup, repeats=3, bytes=total)
+    yield Case(f"corpus.scorer[{documents}x{size}B]", scorer_setup, repeats=3, bytes=total)
+
+
+def graph_case(seed: int, density: float) -> Case:
+    def setup() -> Callable[[], object]:
+        from app.agent.graph import build_graph
+        from app.agent.state import AgentState
+
+        try:
+            compiled = build_graph().compile()
+        except ImportError as exc:  # pragma: no cover - depends on optional stack
+            raise SkipBenchmark(str(exc)) from exc
+        goal = NarrativeGenerator(seed, density).narrative(2_000)
+        return lambda: compiled.invoke(AgentState(user_goal=goal))
+
+    return Case("graph.invoke[2000B]", setup, repeats=20)
+
+
+def shim_cases() -> Iterator[Case]:
+    def validate_setup() -> Callable[[], object]:
+        from app.tools.waste_detector import WasteDetectorOutput
+
+        data = {
+            "wastes": [
+                {"category": "waiting", "supporting_evidence": "delay", "recommended_action": "Pull."}
+            ]
+            * 8,
+            "summary": "Detected potential wastes.",
+        }
+        return lambda: [WasteDetectorOutput.model_validate(data) for _ in range(1_000)]
+
+    def dump_setup() -> Callable[[], object]:
+        from app.tools.waste_detector import WasteDetector
+
+        detector = WasteDetector()
+        output = detector._run(detector.parse_input({"process_description": " ".join(_all_keywords())}))
+        return lambda: [output.model_dump() for _ in range(1_000)]
+
+    yield Case("pydantic.validate[x1000]", validate_setup, repeats=10)
+    yield Case("pydantic.dump[x1000]", dump_setup, repeats=10)
+
+
+def prompt_case() -> Case:
+    def setup() -> Callable[[], object]:
+        from app.agent.graph import load_prompt
+        from app.agent.prompts import PROMPT_FILES
+
+        try:
+            load_prompt("system")
+        except ImportError as exc:  # pragma: no cover - depends on optional stack
+            raise SkipBenchmark(str(exc)) from exc
+        return lambda: [load_prompt(name) for name in PROMPT_FILES for _ in range(250)]
+
+    return Case("prompts.load[x1000]", setup, repeats=10)
+
+
+def _all_keywords() -> List[str]:
+    from app.tools.waste_detector import TIMWOODS_CATEGORIES
+
+    return [keyword for keywords in TIMWOODS_CATEGORIES.values() for keyword in keywords]
+
+
+def measure(case: Case) -> Measurement:
+    func = case.setup()
+    func()  # warm-up
+    timings = []
+    for _ in range(case.repeats):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return Measurement(
+        name=case.name,
+        median_s=statistics.median(timings),
+        min_s=min(timings),
+        repeats=case.repeats,
+        bytes=case.bytes,
+    )
+
+
+def build_cases(sizes: List[int], seed: int, density: float) -> List[Case]:
+    return [
+        *waste_detector_cases(sizes, seed, density),
+        *corpus_cases(seed, density),
+        graph_case(seed, density),
+        *shim_cases(),
+        prompt_case(),
+    ]
+
+
+def run_suite(sizes: List[int], seed: int, density: float, only: Optional[str] = None) -> Dict[str, object]:
+    results: Dict[str, Dict[str, object]] = {}
+    skipped: Dict[str, str] = {}
+    for case in build_cases(sizes, seed, density):
+        if only and only not in case.name:
+            continue
+        try:
+            measurement = measure(case)
+        except SkipBenchmark as exc:
+            skipped[case.name] = str(exc)
+            print(f"{case.name:<34} skipped ({exc})")
+            continue
+        results[case.name] = {**asdict(measurement), "throughput_mb_s": measurement.throughput_mb_s}
+        throughput = measurement.throughput_mb_s
+        suffix = f"  {throughput:8.2f} MB/s" if throughput is not None else ""
+        print(f"{case.name:<34} median {measurement.median_s * 1000:10.3f} ms{suffix}")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "keyword_density": density,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def compare(
+    baseline: Dict[str, object], current: Dict[str, object], threshold: float
+) -> List[Tuple[str, float, float, float]]:
+    """Return ``(name, baseline_s, current_s, change)`` for every regressed case.
+
+    A case regresses when its median time grew by more than ``threshold``
+    (a fraction, e.g. ``0.1`` for 10%) relative to the baseline.
+    """
+
+    regressions = []
+    base_results = baseline.get("results", {})
+    for name, result in current.get("results", {}).items():
+        previous = base_results.get(name)
+        if not previous:
+            continue
+        before, after = previous["median_s"], result["median_s"]
+        change = (after - before) / before if before else 0.0
+        if change > threshold:
+            regressions.append((name, before, after, change))
+    return regressions
+
+
+def _report(regressions: List[Tuple[str, float, float, float]], threshold: float) -> int:
+    if not regressions:
+        print(f"No regressions above {threshold:.0%}.")
+        return 0
+    print(f"Regressions above {threshold:.0%}:")
+    for name, before, after, change in regressions:
+        print(f"  {name:<34} {before * 1000:10.3f} ms -> {after * 1000:10.3f} ms  (+{change:.0%})")
+    return 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subcommands.add_parser("run", help="Run the suite and write JSON results")
+    run_parser.add_argument("--output", type=Path, help="Where to write the JSON results")
+    run_parser.add_argument("--sizes", type=int, nargs="+", help="Input sizes in bytes for WasteDetector.run")
+    run_parser.add_argument("--quick", action="store_true", help="Stop at 1 MB inputs")
+    run_parser.add_argument("--seed", type=int, default=1234)
+    run_parser.add_argument("--keyword-density", type=float, default=0.2)
+    run_parser.add_argument("--only", help="Run only cases whose name contains this text")
+    run_parser.add_argument("--baseline", type=Path, help="Compare against this results file")
+    run_parser.add_argument("--threshold", type=float, default=0.10)
+
+    compare_parser = subcommands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("current", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        baseline = json.loads(args.baseline.read_text())
+        current = json.loads(args.current.read_text())
+        return _report(compare(baseline, current, args.threshold), args.threshold)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    results = run_suite(sizes, args.seed, args.keyword_density, args.only)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        return _report(compare(baseline, results, args.threshold), args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,14 @@
 #!/usr/bin/env python3
 """Example usage of the Lean Concepts Agent."""
 
-from app.agent.graph import build_graph
+from app.agent.graph import get_compiled_graph
 from app.agent.state import AgentState
 
 
 def main():
     """Run a simple example with the Lean Agent."""
-    # Build the LangGraph state machine
-    graph = build_graph()
-    compiled_graph = graph.compile()
+    # The graph is built and compiled once per process and reused on every call
+    compiled_graph = get_compiled_graph()
     
     # Create initial state with a user goal
     initial_state = AgentState(
@@ -26,13 +25,24 @@ def main():
     
     # Display results
     print("Agent Analysis:")
-    print(f"Final Response: {result.final_response}")
+    print(f"Final Response: {result['final_response']}")
     print("\nConversation History:")
-    for entry in result.conversation_history:
+    for entry in result["conversation_history"]:
         print(f"Tool: {entry['tool']}")
-        print(f"Result: {entry['result']}")
+        # Older turns are compacted to summaries once history exceeds its budget.
+        print(f"Result: {entry.get('result', entry.get('summary'))}")
         print("-" * 40)
 
+    # Many sessions at once: each tool runs once for the whole batch
+    goals = [
+        "Orders wait in a queue for approval before shipment.",
+        "Technicians walk to the warehouse and rework defects by hand.",
+        "Reports are duplicated manually and the backlog keeps growing.",
+    ]
+    print("\nBatch of sessions:")
+    for goal, state in zip(goals, compiled_graph.batch([AgentState(user_goal=goal) for goal in goals])):
+        print(f"- {goal}\n  {state['final_response']}")
+
 
 if __name__ == "__main__":
     main()
@@ -2,10 +2,35 @@
 """Main entry point for the Lean Concepts Agent."""
 
 import argparse
+import os
 import sys
 from pathlib import Path
+from typing import Optional
 
-from app.tools.waste_detector import WasteDetector
+# Tool modules are imported inside each mode so the CLI only pays
+# for what the selected mode uses.
+
+# Files larger than this are always analysed in streaming mode.
+STREAMING_THRESHOLD_BYTES = 32 * 1024 * 1024
+
+
+def print_insights(insights):
+    """Print each insight of a WasteDetector stream as it arrives, then the summary."""
+    count = 0
+    for count, insight in enumerate(insights, 1):
+        if count == 1:
+            print("🚨 Identified Wastes:")
+        # Offsets of each keyword's first occurrence point back into the input.
+        where = ", ".join(f"{span.keyword}@{span.start}" for span in insight.spans)
+        print(f"  {count}. {insight.category.title()}")
+        print(f"     Evidence: {insight.supporting_evidence}{f' (first at {where})' if where else ''}")
+        print(f"     Recommendation: {insight.recommended_action}")
+        print()
+    if not count:
+        print("✅ No obvious wastes detected!")
+
+    result = insights.result()
+    print(f"📊 Summary: {result['summary']}\n")
 
 
 def interactive_mode():
@@ -15,6 +40,8 @@ def interactive_mode():
     print("This tool helps identify wastes in your processes using TIMWOODS categories.")
     print("Enter 'quit' or 'exit' to stop.\n")
     
+    from app.tools.waste_detector import WasteDetector
+
     detector = WasteDetector()
     
     while True:
@@ -26,21 +53,8 @@ def interactive_mode():
                 break
                 
             print("\n🔍 Analyzing process...")
-            result = detector.run({"process_description": process_description})
-            
-            print(f"\n📊 Analysis Results:")
-            print(f"Summary: {result['summary']}\n")
-            
-            if result['wastes']:
-                print("🚨 Identified Wastes:")
-                for i, waste in enumerate(result['wastes'], 1):
-                    print(f"  {i}. {waste['category'].title()}")
-                    print(f"     Evidence: {waste['supporting_evidence']}")
-                    print(f"     Recommendation: {waste['recommended_action']}")
-                    print()
-            else:
-                print("✅ No obvious wastes detected!")
-                
+            # Revised descriptions only rescan the parts that changed.
+            print_insights(detector.iter_run({"process_description": process_description, "session": "interactive"}))
             print("-" * 60)
             
         except KeyboardInterrupt:
@@ -50,39 +64,155 @@ def interactive_mode():
             print(f"❌ Error: {e}")
 
 
-def analyze_file(file_path: Path):
-    """Analyze a process description from a file."""
+def analyze_file(file_path: Path, stream: bool = False, ruleset: Optional[str] = None):
+    """Analyze a process description from a file.
+
+    In streaming mode the file is scanned in fixed-size chunks so memory stays
+    bounded regardless of file size.
+    """
     if not file_path.exists():
         print(f"❌ Error: File {file_path} not found.")
         return
         
     try:
-        process_description = file_path.read_text().strip()
+        from app.tools.waste_detector import WasteDetector
+
         detector = WasteDetector()
+        stream = stream or file_path.stat().st_size > STREAMING_THRESHOLD_BYTES
         
         print(f"🔧 Lean Concepts Agent - File Analysis")
-        print(f"📁 Analyzing: {file_path}")
+        print(f"📁 Analyzing: {file_path}{' (streaming)' if stream else ''}")
         print("=" * 60)
         
-        result = detector.run({"process_description": process_description})
-        
-        print(f"📊 Analysis Results:")
-        print(f"Summary: {result['summary']}\n")
-        
-        if result['wastes']:
-            print("🚨 Identified Wastes:")
-            for i, waste in enumerate(result['wastes'], 1):
-                print(f"  {i}. {waste['category'].title()}")
-                print(f"     Evidence: {waste['supporting_evidence']}")
-                print(f"     Recommendation: {waste['recommended_action']}")
-                print()
+        if stream:
+            insights = detector.iter_file(file_path, ruleset=ruleset)
         else:
-            print("✅ No obvious wastes detected!")
+            process_description = file_path.read_text().strip()
+            insights = detector.iter_run({"process_description": process_description, "ruleset": ruleset})
+        print_insights(insights)
             
     except Exception as e:
         print(f"❌ Error processing file: {e}")
 
 
+def batch_mode(args):
+    """Score a directory of narratives or a JSON-lines file, writing JSON lines."""
+    from app.batch import BatchPipeline, iter_directory_records, iter_jsonl_records, open_output
+    from app.tools.waste_detector import WasteDetector
+
+    if args.input_dir:
+        if not args.input_dir.is_dir():
+            print(f"❌ Error: Directory {args.input_dir} not found.", file=sys.stderr)
+            return 1
+        records = iter_directory_records(args.input_dir, args.glob)
+        source = None
+    elif str(args.jsonl) == "-":
+        records = iter_jsonl_records(sys.stdin)
+        source = None
+    else:
+        if not args.jsonl.exists():
+            print(f"❌ Error: File {args.jsonl} not found.", file=sys.stderr)
+            return 1
+        source = open(args.jsonl, encoding="utf-8")
+        records = iter_jsonl_records(source)
+    if args.ruleset:
+        # Records that name their own ruleset keep it.
+        records = ((record_id, {"ruleset": args.ruleset, **data}) for record_id, data in records)
+
+    dedup = None
+    if args.dedup is not None:
+        from app.dedup import NearDuplicateIndex
+
+        dedup = NearDuplicateIndex(args.dedup, capacity=args.dedup_capacity)
+
+    output = open_output(args.output)
+    pipeline = BatchPipeline(
+        WasteDetector(),
+        workers=args.workers,
+        ordered=not args.unordered,
+        queue_size=args.queue_size,
+        dedup=dedup,
+        dedup_outcomes=args.dedup_outcomes,
+    )
+    try:
+        summary = pipeline.run(records, output)
+    except BrokenPipeError:
+        # The consumer (e.g. ``| head``) stopped reading. Point stdout at
+        # devnull so the interpreter's final flush does not fail again.
+        if output is sys.stdout:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        if source is not None:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"📊 {summary.describe()}", file=sys.stderr)
+    return 0
+
+
+def serve_mode(args):
+    """Serve the tools and the agent graph over HTTP until interrupted."""
+    from app.server import AnalysisServer, serve
+
+    try:
+        server = AnalysisServer.from_settings(host=args.host, port=args.port)
+    except ValueError as exc:
+        print(f"❌ Error: invalid server settings: {exc}", file=sys.stderr)
+        return 1
+    pipelines = ", ".join(sorted(server.pipelines))
+
+    def ready(address):
+        print(f"🌐 Serving {pipelines} on http://{address[0]}:{address[1]} (Ctrl+C to stop)", file=sys.stderr)
+
+    try:
+        serve(server, on_ready=ready)
+    except OSError as exc:
+        print(f"❌ Error: cannot listen on {server.host}:{server.port}: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_mode(args):
+    """Run the mode selected on the command line and return its exit code."""
+    if args.serve:
+        return serve_mode(args)
+    elif args.input_dir or args.jsonl:
+        return batch_mode(args)
+    elif args.file:
+        analyze_file(args.file, stream=args.stream, ruleset=args.ruleset)
+    elif args.demo:
+        # Import and run the demo
+        from simple_demo import main as demo_main
+        demo_main()
+    else:
+        interactive_mode()
+    return 0
+
+
+def profile_mode(args):
+    """Run the selected mode under cProfile and tracemalloc and write the reports."""
+    from app.profiling import Profiler
+
+    if (args.input_dir or args.jsonl) and args.workers is None:
+        # Worker processes are invisible to the profiler, so analyse in-process.
+        args.workers = 1
+    label = " ".join(sys.argv[1:]) or "interactive mode"
+    profiler = Profiler()
+    try:
+        code = profiler.run(label, run_mode, args)
+    finally:
+        if profiler.report is not None:
+            paths = profiler.write(args.profile)
+            print(profiler.report.render(), file=sys.stderr)
+            print(
+                f"📈 Profile written to {paths['report']}, {paths['json']} and {paths['pstats']}",
+                file=sys.stderr,
+            )
+    return code
+
+
 def main():
     """Main entry point with CLI argument parsing."""
     parser = argparse.ArgumentParser(
@@ -92,7 +222,14 @@ def main():
 Examples:
   %(prog)s                     # Interactive mode
   %(prog)s --file process.txt  # Analyze file
+  %(prog)s --file big.log --stream  # Analyze a large file in chunks
+  %(prog)s --file process.txt --ruleset software  # Use a domain taxonomy
+  %(prog)s --file big.log --profile runs/big  # Per-stage CPU and memory profile
   %(prog)s --demo             # Run demo examples
+  %(prog)s --input-dir narratives/ --output results.jsonl  # Batch-score a directory
+  %(prog)s --jsonl records.jsonl --workers 8               # Batch-score JSON lines
+  %(prog)s --jsonl records.jsonl --dedup 0.9              # Analyse one of each near-duplicate cluster
+  %(prog)s --serve --port 8080                             # HTTP service with micro-batching
         """
     )
     
@@ -102,22 +239,119 @@ Examples:
         help="Analyze process description from a text file"
     )
     
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Scan --file in chunks with bounded memory (automatic for very large files)"
+    )
+    
+    parser.add_argument(
+        "--ruleset",
+        help="Waste taxonomy to apply, by id from the rulesets directory (default: built-in TIMWOODS)"
+    )
+    
     parser.add_argument(
         "--demo", "-d",
         action="store_true",
         help="Run demo examples"
     )
     
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        nargs="?",
+        const=Path("profile"),
+        metavar="DIR",
+        help="Profile the selected mode (CPU and allocations) and write reports to DIR (default: ./profile)"
+    )
+    
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument(
+        "--input-dir",
+        type=Path,
+        help="Analyze every matching file in a directory and write JSON lines"
+    )
+    batch.add_argument(
+        "--jsonl",
+        type=Path,
+        help="Analyze JSON-lines records (one tool input per line, '-' for stdin)"
+    )
+    batch.add_argument(
+        "--glob",
+        default="*.txt",
+        help="File pattern used with --input-dir (default: *.txt)"
+    )
+    batch.add_argument(
+        "--output", "-o",
+        type=Path,
+        help="Where to write JSON-lines results (default: stdout)"
+    )
+    batch.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes for batch mode (default: CPU count)"
+    )
+    batch.add_argument(
+        "--unordered",
+        action="store_true",
+        help="Emit results as soon as they finish instead of in input order"
+    )
+    batch.add_argument(
+        "--queue-size",
+        type=int,
+        default=1024,
+        help="Maximum records buffered between pipeline stages"
+    )
+    batch.add_argument(
+        "--dedup",
+        type=float,
+        nargs="?",
+        const=0.9,
+        metavar="THRESHOLD",
+        help="Analyse one record per cluster of near-identical descriptions (Jaccard >= THRESHOLD, default 0.9)"
+    )
+    batch.add_argument(
+        "--dedup-capacity",
+        type=int,
+        default=1 << 17,
+        help="Cluster representatives remembered by --dedup (memory is about 340 bytes each)"
+    )
+    batch.add_argument(
+        "--dedup-outcomes",
+        type=int,
+        default=4096,
+        help="Cluster outputs kept to answer duplicates (each holds one serialised result)"
+    )
+    
+    service = parser.add_argument_group("service mode")
+    service.add_argument(
+        "--serve",
+        action="store_true",
+        help="Serve the tools and the agent graph over HTTP with micro-batching"
+    )
+    service.add_argument(
+        "--host",
+        help="Interface to bind (default: SERVER_HOST or 127.0.0.1)"
+    )
+    service.add_argument(
+        "--port",
+        type=int,
+        help="Port to listen on (default: SERVER_PORT or 8080)"
+    )
+    
     args = parser.parse_args()
     
-    if args.file:
-        analyze_file(args.file)
-    elif args.demo:
-        # Import and run the demo
-        from simple_demo import main as demo_main
-        demo_main()
-    else:
-        interactive_mode()
+    if os.environ.get("TRACING_ENDPOINT"):
+        from app.tracing import configure_from_settings
+        try:
+            configure_from_settings()
+        except ValueError as exc:
+            parser.error(f"invalid TRACING_ENDPOINT: {exc}")
+    
+    if args.profile:
+        sys.exit(profile_mode(args))
+    sys.exit(run_mode(args))
 
 
 if __name__ == "__main__":
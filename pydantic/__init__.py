@@ -1,17 +1,31 @@
 """Lightweight subset of the Pydantic API for offline execution."""
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Dict, Optional
+import json
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, Dict, Mapping, Optional
 
 __all__ = ["BaseModel", "Field"]
 
 
-@dataclass
 class FieldInfo:
-    default: Any = ...
-    default_factory: Optional[Any] = None
-    description: Optional[str] = None
+    __slots__ = ("default", "default_factory", "description")
+
+    def __init__(
+        self,
+        default: Any = ...,
+        default_factory: Optional[Any] = None,
+        description: Optional[str] = None,
+    ) -> None:
+        self.default = default
+        self.default_factory = default_factory
+        self.description = description
+
+    def __repr__(self) -> str:
+        return (
+            f"FieldInfo(default={self.default!r}, default_factory={self.default_factory!r}, "
+            f"description={self.description!r})"
+        )
 
 
 def Field(
@@ -23,21 +37,178 @@ def Field(
     return FieldInfo(default=default, default_factory=default_factory, description=description)
 
 
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+_SCALAR_ANNOTATIONS = {"str", "int", "float", "bool"}
+
+
+def _is_scalar_annotation(annotation: Any) -> bool:
+    """Return whether values of ``annotation`` can be dumped without recursion."""
+
+    if annotation in _SCALAR_TYPES:
+        return True
+    if not isinstance(annotation, str):
+        return False
+    text = annotation.replace(" ", "")
+    if text.startswith("Optional[") and text.endswith("]"):
+        text = text[len("Optional[") : -1]
+    parts = [part for part in text.split("|") if part != "None"]
+    return len(parts) == 1 and parts[0] in _SCALAR_ANNOTATIONS
+
+
+def _missing(field_name: str) -> Any:
+    raise ValueError(f"Missing required field '{field_name}'")
+
+
+def _not_a_mapping(cls: type, data: Any) -> Any:
+    raise ValueError(f"{cls.__name__} expects a mapping, got {type(data).__name__}")
+
+
+def _dump(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, list):
+        return [_dump(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _dump(item) for key, item in value.items()}
+    return value
+
+
+def _encode(value: Any) -> str:
+    kind = type(value)
+    if kind is str:
+        return encode_basestring_ascii(value)
+    if value is None:
+        return "null"
+    if kind is bool:
+        return "true" if value else "false"
+    if kind is int:
+        return int.__repr__(value)
+    if isinstance(value, BaseModel):
+        return value._json_text()
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join([_encode(item) for item in value]) + "]"
+    if isinstance(value, dict):
+        return "{" + ",".join([_encode_key(key) + ":" + _encode(item) for key, item in value.items()]) + "}"
+    return json.dumps(value)
+
+
+def _encode_key(key: Any) -> str:
+    if type(key) is str:
+        return encode_basestring_ascii(key)
+    return encode_basestring_ascii(json.dumps(key).strip('"'))
+
+
+def _compile_methods(
+    fields: Dict[str, FieldInfo], annotations: Dict[str, Any], model_name: str = "model"
+) -> Dict[str, Callable[..., Any]]:
+    """Generate field-specialised ``__init__``, validation and dump functions.
+
+    The generated code reads each field exactly once with no per-field loop,
+    ``FieldInfo`` inspection or ``setattr`` dispatch, which is what the generic
+    implementation paid on every model construction and dump.
+    """
+
+    namespace: Dict[str, Any] = {
+        "_missing": _missing,
+        "_dump": _dump,
+        "_encode": _encode,
+        "_encode_str": encode_basestring_ascii,
+        "_SCALAR_TYPES": _SCALAR_TYPES,
+        "_Mapping": Mapping,
+        "_not_a_mapping": _not_a_mapping,
+    }
+    assign_lines = []
+    dict_items = []
+    dump_items = []
+    json_parts = []
+    for index, (field_name, info) in enumerate(fields.items()):
+        key = repr(field_name)
+        if info.default is not ...:
+            namespace[f"_default_{index}"] = info.default
+            value = f"data.get({key}, _default_{index})"
+        elif info.default_factory is not None:
+            namespace[f"_factory_{index}"] = info.default_factory
+            value = f"data[{key}] if {key} in data else _factory_{index}()"
+        else:
+            value = f"data[{key}] if {key} in data else _missing({key})"
+        assign_lines.append(f"    self.{field_name} = {value}")
+        dict_items.append(f"{key}: {value}")
+
+        if _is_scalar_annotation(annotations.get(field_name)):
+            dump_items.append(f"{key}: v if type(v := self.{field_name}) in _SCALAR_TYPES else _dump(v)")
+            encoded = f"(_encode_str(v) if type(v := self.{field_name}) is str else _encode(v))"
+        else:
+            dump_items.append(f"{key}: _dump(self.{field_name})")
+            encoded = f"_encode(self.{field_name})"
+        separator = "{" if index == 0 else ","
+        json_parts.append(repr(f"{separator}{encode_basestring_ascii(field_name)}:") + " + " + encoded)
+
+    assign_body = "\n".join(assign_lines) or "    pass"
+    json_body = " + ".join(json_parts) + ' + "}"' if json_parts else '"{}"'
+    source = f"""
+def __init__(self, **data):
+{assign_body}
+
+def model_validate(cls, data):
+    if type(data) is not dict and not isinstance(data, _Mapping):
+        _not_a_mapping(cls, data)
+    self = cls.__new__(cls)
+{assign_body}
+    return self
+
+def _validate_dict(cls, data):
+    return {{{", ".join(dict_items)}}}
+
+def model_dump(self):
+    return {{{", ".join(dump_items)}}}
+
+def _json_text(self):
+    return {json_body}
+
+def _dump_json(self):
+    return ({json_body}).encode("ascii")
+"""
+    # A per-model filename keeps profilers from merging models whose methods
+    # share line numbers.
+    exec(compile(source, f"<pydantic-shim {model_name}>", "exec"), namespace)  # noqa: S102 - trusted generated code
+    return {
+        name: namespace[name]
+        for name in ("__init__", "model_validate", "_validate_dict", "model_dump", "_json_text", "_dump_json")
+    }
+
+
 class BaseModelMeta(type):
     def __new__(mcls, name, bases, namespace, **kwargs):
-        annotations = namespace.get("__annotations__", {})
+        annotations: Dict[str, Any] = {}
         fields: Dict[str, FieldInfo] = {}
+        inherited_slots = set()
         for base in bases:
             if hasattr(base, "__fields__"):
                 fields.update(base.__fields__)  # type: ignore[attr-defined]
-        for field_name, annotation in annotations.items():
-            value = namespace.get(field_name, ...)
+                annotations.update(getattr(base, "__field_annotations__", {}))
+                inherited_slots.update(base.__fields__)  # type: ignore[attr-defined]
+        own_annotations = namespace.get("__annotations__", {})
+        for field_name, annotation in own_annotations.items():
+            # Field defaults live in ``__fields__``; removing them from the class
+            # namespace lets each field be stored in a slot.
+            value = namespace.pop(field_name, ...)
             if isinstance(value, FieldInfo):
                 field_info = value
             else:
                 field_info = Field(default=value)
             fields[field_name] = field_info
+            annotations[field_name] = annotation
         namespace["__fields__"] = fields
+        namespace["__field_annotations__"] = annotations
+        namespace.setdefault("__slots__", tuple(name for name in own_annotations if name not in inherited_slots))
+
+        methods = _compile_methods(fields, annotations, name)
+        for method_name, function in methods.items():
+            if method_name in namespace:
+                continue
+            if method_name in ("model_validate", "_validate_dict"):
+                function = classmethod(function)
+            namespace[method_name] = function
         return super().__new__(mcls, name, bases, namespace)
 
 
@@ -45,42 +216,18 @@ class BaseModel(metaclass=BaseModelMeta):
     class Config:
         arbitrary_types_allowed = True
 
-    def __init__(self, **data: Any) -> None:
-        values = self.__class__._validate_dict(data)
-        for key, value in values.items():
-            setattr(self, key, value)
+    def model_dump_json(self) -> str:
+        """Serialise the model to a JSON string without building intermediate dicts.
 
-    @classmethod
-    def _validate_dict(cls, data: Dict[str, Any]) -> Dict[str, Any]:
-        values: Dict[str, Any] = {}
-        for field_name, info in cls.__fields__.items():  # type: ignore[attr-defined]
-            if field_name in data:
-                values[field_name] = data[field_name]
-            else:
-                if info.default is not ...:
-                    values[field_name] = info.default
-                elif info.default_factory is not None:
-                    values[field_name] = info.default_factory()
-                else:
-                    raise ValueError(f"Missing required field '{field_name}'")
-        return values
-
-    @classmethod
-    def model_validate(cls, data: Dict[str, Any]) -> "BaseModel":
-        values = cls._validate_dict(data)
-        instance = cls.__new__(cls)
-        for key, value in values.items():
-            setattr(instance, key, value)
-        return instance
-
-    def model_dump(self) -> Dict[str, Any]:
-        def _dump(value: Any) -> Any:
-            if isinstance(value, BaseModel):
-                return value.model_dump()
-            if isinstance(value, list):
-                return [_dump(item) for item in value]
-            if isinstance(value, dict):
-                return {key: _dump(item) for key, item in value.items()}
-            return value
-
-        return {field_name: _dump(getattr(self, field_name)) for field_name in self.__fields__}  # type: ignore[attr-defined]
+        Like pydantic's, this returns ``str``. Writers that need bytes can call
+        the shim-only ``_dump_json``, which returns compact ASCII JSON bytes.
+        """
+
+        return self._json_text()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {field_name: getattr(self, field_name) for field_name in self.__fields__}  # type: ignore[attr-defined]
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for key, value in state.items():
+            setattr(self, key, value)
@@ -0,0 +1,42 @@
+"""Tests for the shared BaseTool batch execution helpers."""
+import pytest
+
+from app.tools.waste_detector import WasteDetector
+
+ITEMS = [
+    {"process_description": "Parts wait in the warehouse before rework."},
+    {"metrics": {"cycle_time": 3.0}},
+    {"process_description": "The automated pipeline runs smoothly."},
+]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_many_preserves_order_and_reports_errors(workers):
+    tool = WasteDetector()
+    results = list(tool.run_many(ITEMS, workers=workers, chunksize=1))
+
+    assert [result.index for result in results] == [0, 1, 2]
+    assert results[0].output == tool.run(ITEMS[0])
+    assert not results[1].ok
+    assert "process_description" in results[1].error
+    assert results[2].output["wastes"] == []
+
+
+def test_run_many_unordered_yields_every_item():
+    tool = WasteDetector()
+    items = ITEMS * 10
+    results = list(tool.run_many(items, workers=2, chunksize=4, ordered=False))
+
+    assert sorted(result.index for result in results) == list(range(len(items)))
+    assert sum(not result.ok for result in results) == 10
+
+
+def test_arun_offloads_sync_tools():
+    import asyncio
+
+    tool = WasteDetector()
+
+    async def run_all():
+        return await asyncio.gather(*(tool.arun(item) for item in (ITEMS[0], ITEMS[2])))
+
+    assert asyncio.run(run_all()) == [tool.run(ITEMS[0]), tool.run(ITEMS[2])]
@@ -0,0 +1,153 @@
+"""Tests for the streaming batch pipeline."""
+import io
+import json
+
+import pytest
+
+from app.batch import BatchPipeline, iter_directory_records, iter_jsonl_records
+from app.tools.waste_detector import WasteDetector
+
+
+def _run(records, **kwargs):
+    output = io.StringIO()
+    summary = BatchPipeline(WasteDetector(), **kwargs).run(records, output)
+    return summary, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pipeline_preserves_input_order(workers):
+    records = [(str(i), {"process_description": f"Item {i} waits in a queue."}) for i in range(50)]
+    summary, lines = _run(records, workers=workers, chunksize=4, queue_size=8)
+
+    assert [line["id"] for line in lines] == [str(i) for i in range(50)]
+    assert all(line["output"]["wastes"][0]["category"] == "waiting" for line in lines)
+    assert summary.records == 50 and summary.errors == 0
+    assert summary.p99_latency_s >= summary.p50_latency_s > 0
+
+
+def test_jsonl_records_report_invalid_lines_without_aborting():
+    stream = io.StringIO(
+        '{"id": "a", "process_description": "Rework after inspection."}\n'
+        "not json\n"
+        "\n"
+        '{"metrics": {"cycle_time": 2}}\n'
+    )
+    summary, lines = _run(iter_jsonl_records(stream), workers=1)
+
+    assert [line["id"] for line in lines] == ["a", "2", "4"]
+    assert "output" in lines[0]
+    assert lines[1]["error"].startswith("Invalid JSON")
+    assert "process_description" in lines[2]["error"]
+    assert summary.errors == 2
+
+
+def test_directory_records_and_unordered_output(tmp_path):
+    for i in range(6):
+        (tmp_path / f"{i}.txt").write_text(f"Narrative {i}: excess inventory piles up.\n")
+    (tmp_path / "skip.md").write_text("ignored")
+
+    summary, lines = _run(iter_directory_records(tmp_path), workers=2, chunksize=1, ordered=False)
+
+    assert sorted(line["id"] for line in lines) == [f"{i}.txt" for i in range(6)]
+    assert summary.input_bytes == sum(len(f"Narrative {i}: excess inventory piles up.") for i in range(6))
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_dedup_answers_near_duplicates_from_one_representative(ordered):
+    pytest.importorskip("numpy")
+    from app.dedup import NearDuplicateIndex
+
+    base = "Orders wait in a queue for approval before shipment, then technicians rework defects by hand. " * 3
+    records = [
+        ("a", {"process_description": base}),
+        ("b", {"process_description": "Excess inventory piles up in the warehouse between every process step."}),
+        ("a2", {"process_description": base.replace("shipment", "shipments", 1)}),
+        ("a3", {"process_description": base, "ruleset": "missing"}),
+        ("a4", {"process_description": base}),
+    ]
+    summary, lines = _run(records, workers=1, ordered=ordered, dedup=NearDuplicateIndex(0.8))
+
+    by_id = {line["id"]: line for line in lines}
+    if ordered:
+        assert list(by_id) == ["a", "b", "a2", "a3", "a4"]
+    assert by_id["a2"]["duplicate_of"] == by_id["a4"]["duplicate_of"] == "a"
+    assert by_id["a2"]["output"] == by_id["a"]["output"]
+    # Records with other inputs are analysed on their own.
+    assert "duplicate_of" not in by_id["a3"] and "duplicate_of" not in by_id["b"]
+    assert (summary.records, summary.duplicates, summary.clusters) == (5, 2, 3)
+    assert "2 near-duplicates" in summary.describe()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_dedup_savings_are_based_on_measured_analysis_time(workers):
+    pytest.importorskip("numpy")
+    from app.dedup import NearDuplicateIndex
+
+    narratives = [
+        "Orders wait in a queue for approval before shipment every single morning.",
+        "Technicians rework defects by hand after the final inspection finds scratches.",
+        "Excess inventory piles up in the warehouse between the stamping and paint lines.",
+        "Operators walk across the plant to fetch tools that are stored in a distant cage.",
+    ]
+    records = [
+        (f"{i}-{copy}", {"process_description": text * 3}) for copy in range(2) for i, text in enumerate(narratives)
+    ]
+    summary, _ = _run(records, workers=workers, dedup=NearDuplicateIndex(0.8))
+
+    analysed = summary.records - summary.duplicates
+    assert (analysed, summary.duplicates) == (4, 4)
+    assert 0 < summary.analysis_s <= summary.elapsed_s
+    assert summary.saved_s == pytest.approx(summary.analysis_s / analysed * summary.duplicates)
+    # As many duplicates as analysed records can save at most the analysis time itself.
+    assert summary.saved_s <= summary.analysis_s + 1e-9
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_dedup_keeps_a_bounded_number_of_cluster_outputs(ordered):
+    pytest.importorskip("numpy")
+    from app.dedup import NearDuplicateIndex
+
+    texts = [
+        "Orders wait in a queue for approval before shipment every single morning. " * 3,
+        "Technicians rework defects by hand after the final inspection finds scratches. " * 3,
+        "Excess inventory piles up in the warehouse between the stamping and paint lines. " * 3,
+    ]
+    records = [(str(i), {"process_description": text}) for i, text in enumerate(texts)]
+    records += [("0-again", {"process_description": texts[0]}), ("2-again", {"process_description": texts[2]})]
+
+    def run(outcomes):
+        summary, lines = _run(
+            records, workers=1, chunksize=1, ordered=ordered, dedup=NearDuplicateIndex(0.8), dedup_outcomes=outcomes
+        )
+        return summary, {line["id"]: line for line in lines}
+
+    summary, by_id = run(3)
+    assert summary.duplicates == 2 and by_id["0-again"]["duplicate_of"] == "0"
+
+    # Only the two most recent outputs are kept, so the first cluster's is analysed again.
+    summary, by_id = run(2)
+    assert summary.duplicates == 1 and summary.records == 5
+    assert "duplicate_of" not in by_id["0-again"] and by_id["0-again"]["output"] == by_id["0"]["output"]
+    assert by_id["2-again"]["duplicate_of"] == "2"
+
+
+class _BrokenOutput(io.StringIO):
+    def __init__(self, lines):
+        super().__init__()
+        self.lines = lines
+
+    def write(self, text):
+        if self.lines == 0:
+            raise BrokenPipeError("reader went away")
+        self.lines -= 1
+        return super().write(text)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pipeline_stops_when_the_output_fails(workers):
+    records = ((str(i), {"process_description": f"Item {i} waits in a queue."}) for i in range(10_000))
+    output = _BrokenOutput(3)
+
+    with pytest.raises(BrokenPipeError):
+        BatchPipeline(WasteDetector(), workers=workers, chunksize=4, queue_size=4).run(records, output)
+    assert len(output.getvalue().splitlines()) == 3
@@ -0,0 +1,27 @@
+"""Tests for the benchmark narrative generator and regression comparison."""
+from app.tools.waste_detector import TIMWOODS_MATCHER
+from benchmarks.generator import NarrativeGenerator
+from benchmarks.suite import compare
+
+
+def test_generator_is_seeded_and_sized():
+    first = NarrativeGenerator(seed=3).narrative(5_000)
+
+    assert first == NarrativeGenerator(seed=3).narrative(5_000)
+    assert first != NarrativeGenerator(seed=4).narrative(5_000)
+    assert len(first) >= 5_000
+
+
+def test_keyword_density_controls_hits():
+    sparse = NarrativeGenerator(seed=1, keyword_density=0.0).narrative(20_000)
+    dense = NarrativeGenerator(seed=1, keyword_density=1.0).narrative(20_000)
+
+    assert not list(TIMWOODS_MATCHER.finditer(sparse))
+    assert len(list(TIMWOODS_MATCHER.finditer(dense))) > 100
+
+
+def test_compare_flags_only_regressions_above_threshold():
+    baseline = {"results": {"a": {"median_s": 1.0}, "b": {"median_s": 1.0}, "c": {"median_s": 1.0}}}
+    current = {"results": {"a": {"median_s": 1.05}, "b": {"median_s": 1.5}, "d": {"median_s": 9.0}}}
+
+    assert compare(baseline, current, threshold=0.1) == [("b", 1.0, 1.5, 0.5)]
@@ -0,0 +1,157 @@
+"""Tests for the SQLite delta checkpoint store."""
+import sqlite3
+
+import pytest
+
+from app.agent.checkpoint import DELTA, SNAPSHOT, SQLiteDeltaStore, apply_delta, diff_state
+
+
+def _session(store, steps, thread_id="t1"):
+    state = {"user_goal": "Cut waiting", "conversation_history": [], "channel_versions": {"history": 0}}
+    parent = None
+    for step in range(steps):
+        state["conversation_history"].append({"turn": step, "result": {"summary": "x" * 200}})
+        state["channel_versions"] = {"history": step + 1}
+        store.put(thread_id, f"c{step}", state, parent_id=parent, metadata={"step": step})
+        parent = f"c{step}"
+    return state
+
+
+def _rows(path):
+    with sqlite3.connect(path) as connection:
+        return connection.execute("SELECT seq, kind, length(payload) FROM checkpoints ORDER BY seq").fetchall()
+
+
+def test_diff_records_appends_and_nested_changes():
+    old = {"history": [1, 2], "meta": {"a": 1, "b": 2}, "gone": True}
+    new = {"history": [1, 2, 3], "meta": {"a": 1, "b": 5}, "fresh": "yes"}
+
+    ops = diff_state(old, new)
+
+    assert (2, ("history",), [3]) in ops
+    assert apply_delta({"history": [1, 2], "meta": {"a": 1, "b": 2}, "gone": True}, ops) == new
+
+
+def test_latest_checkpoint_is_rebuilt_from_snapshot_and_deltas(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+    store = SQLiteDeltaStore(path)
+    expected = _session(store, 50)
+
+    latest = store.get("t1")
+
+    assert latest.state == expected
+    assert latest.checkpoint_id == "c49" and latest.parent_id == "c48"
+    assert latest.metadata == {"step": 49}
+    kinds = [kind for _, kind, _ in _rows(path)]
+    assert kinds[0] == SNAPSHOT and kinds.count(DELTA) > kinds.count(SNAPSHOT)
+
+
+def test_delta_size_stays_flat_as_history_grows(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+    _session(SQLiteDeltaStore(path, min_snapshot_bytes=1 << 30, max_chain=10_000), 300)
+
+    deltas = [size for _, kind, size in _rows(path) if kind == DELTA]
+
+    assert len(deltas) == 299
+    assert max(deltas[-20:]) <= max(deltas[:20]) + 8
+
+
+def test_snapshots_bound_replay(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+    _session(SQLiteDeltaStore(path, max_chain=16), 100)
+
+    rows = _rows(path)
+    snapshot_seqs = [seq for seq, kind, _ in rows if kind == SNAPSHOT]
+
+    assert max(b - a for a, b in zip(snapshot_seqs, snapshot_seqs[1:] + [len(rows)])) <= 17
+
+
+def test_resume_after_restart_and_historic_reads(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+    first = SQLiteDeltaStore(path)
+    state = _session(first, 20)
+    first.close()
+
+    resumed = SQLiteDeltaStore(path)
+    assert resumed.get("t1").state == state
+    state["conversation_history"].append({"turn": 20})
+    resumed.put("t1", "c20", state, parent_id="c19")
+
+    assert _rows(path)[-1][1] == DELTA
+    assert SQLiteDeltaStore(path).get("t1").state == state
+    assert len(resumed.get("t1", checkpoint_id="c5").state["conversation_history"]) == 6
+    assert [item.checkpoint_id for item in resumed.list("t1", before="c3")] == ["c2", "c1", "c0"]
+    assert [item.checkpoint_id for item in resumed.list("t1", limit=2)] == ["c20", "c19"]
+
+
+def test_two_stores_on_one_file_keep_extending_the_real_head(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+    first, second = SQLiteDeltaStore(path), SQLiteDeltaStore(path)
+    states = []
+
+    def put(store, step):
+        state = {"user_goal": "Cut waiting", "conversation_history": [{"turn": turn} for turn in range(step + 1)]}
+        states.append(state)
+        parent = f"c{step - 1}" if step else None
+        return store.put("t1", f"c{step}", state, parent_id=parent)
+
+    # Each store's cached head goes stale when the other one writes.
+    assert [put(store, step) for step, store in enumerate([first, first, second, first, second, first])] == list(
+        range(6)
+    )
+
+    fresh = SQLiteDeltaStore(path)
+    for step, state in enumerate(states):
+        assert fresh.get("t1", checkpoint_id=f"c{step}").state == state
+    assert DELTA in [kind for _, kind, _ in _rows(path)]
+
+
+def test_branching_writes_a_snapshot(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+    store = SQLiteDeltaStore(path)
+    _session(store, 5)
+
+    store.put("t1", "fork", {"user_goal": "Other"}, parent_id="c2")
+
+    assert _rows(path)[-1][1] == SNAPSHOT
+    assert store.get("t1").state == {"user_goal": "Other"}
+    assert store.get("t1", checkpoint_id="c4").state["conversation_history"][-1]["turn"] == 4
+
+
+def test_writes_and_pruning(tmp_path):
+    store = SQLiteDeltaStore(tmp_path / "sessions.sqlite3", max_chain=4)
+    state = _session(store, 12)
+    store.put_writes("t1", "c0", "task-1", [("history", {"turn": 0})])
+    store.put_writes("t1", "c11", "task-2", [("history", {"turn": 99}), ("n", 1)])
+
+    assert [tuple(write) for write in store.get_writes("t1", "c11")] == [
+        ("task-2", "history", {"turn": 99}),
+        ("task-2", "n", 1),
+    ]
+    assert store.prune("t1") > 0
+    assert store.get("t1").state == state
+    assert store.get_writes("t1", "c0") == []
+    assert store.get("t1", checkpoint_id="c0") is None
+
+
+def test_langgraph_saver_resumes_sessions(tmp_path):
+    pytest.importorskip("langgraph")
+    from app.agent.saver import SQLiteDeltaSaver
+
+    config = {"configurable": {"thread_id": "s1", "checkpoint_ns": ""}}
+    saver = SQLiteDeltaSaver(tmp_path / "sessions.sqlite3")
+    for step in range(3):
+        checkpoint = {
+            "v": 1,
+            "id": f"c{step}",
+            "ts": "",
+            "channel_values": {"history": list(range(step + 1))},
+            "channel_versions": {"history": step + 1},
+            "versions_seen": {},
+        }
+        config = saver.put(config, checkpoint, {"step": step}, {"history": step + 1})
+
+    restored = SQLiteDeltaSaver(tmp_path / "sessions.sqlite3").get_tuple({"configurable": {"thread_id": "s1"}})
+
+    assert restored.checkpoint["channel_values"]["history"] == [0, 1, 2]
+    assert restored.parent_config["configurable"]["checkpoint_id"] == "c1"
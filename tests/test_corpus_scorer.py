@@ -0,0 +1,69 @@
+"""Tests for the vectorised corpus scorer."""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.tools.corpus_scorer import CorpusScorer  # noqa: E402
+from app.tools.keyword_matcher import KeywordMatcher  # noqa: E402
+from app.tools.waste_detector import TIMWOODS_CATEGORIES, TIMWOODS_MATCHER, WasteDetector  # noqa: E402
+from benchmarks.generator import NarrativeGenerator  # noqa: E402
+
+EDGE_CASES = [
+    "",
+    "Too\n many copies wait in the queue.",
+    "Hours spent debugging despite delays.",
+    "ſcrap piles up; the İdle crew waits — rework follows.",
+    "queue",
+    "xdelay _delay delay_",
+]
+
+
+def test_category_sets_match_waste_detector():
+    documents = list(NarrativeGenerator(seed=5, keyword_density=0.4).documents(300, 200)) + EDGE_CASES
+    detector = WasteDetector()
+    expected = [
+        {waste["category"] for waste in detector.run({"process_description": text})["wastes"]} if text else set()
+        for text in documents
+    ]
+
+    scores = CorpusScorer().score(documents, batch_size=64)
+
+    assert scores.category_sets() == expected
+    assert len(scores) == len(documents)
+
+
+@pytest.mark.parametrize("whole_words", [False, True])
+def test_counts_match_matcher_hits(whole_words):
+    matcher = KeywordMatcher(TIMWOODS_CATEGORIES, whole_words=whole_words)
+    documents = list(NarrativeGenerator(seed=9, keyword_density=0.8).documents(100, 150)) + EDGE_CASES
+
+    scores = CorpusScorer(matcher).score(documents)
+
+    assert scores.category_counts.sum(axis=1).tolist() == [len(list(matcher.finditer(text))) for text in documents]
+    dense = scores.keyword_counts.toarray()
+    assert dense.shape == (len(documents), len(matcher.keywords))
+    assert dense.sum() == scores.category_counts.sum()
+
+
+def test_non_ascii_keyword_tables_fall_back_to_the_regex_scan():
+    matcher = KeywordMatcher({"motion": ["tránsito", "walk"]})
+
+    scores = CorpusScorer(matcher).score(["Tránsito and walking.", "nothing"])
+
+    assert scores.category_counts.tolist() == [[2], [0]]
+
+
+def test_summary_reports_scores_and_top_categories():
+    scores = CorpusScorer(TIMWOODS_MATCHER).score(
+        ["Delay after delay in the queue.", "Rework of every defect and bug.", "A smooth flow.", "Idle staff."]
+    )
+
+    summary = scores.summary(top=2)
+
+    assert summary["documents"] == 4
+    assert summary["documents_with_waste"] == 3
+    assert summary["top_categories"] == ["waiting", "defects"]
+    waiting = summary["categories"]["waiting"]
+    assert waiting["hits"] == 4 and waiting["documents"] == 2
+    assert waiting["percentiles"]["p99"] == pytest.approx(float(scores.scores[:, 3].max()), rel=0.05)
+    assert np.allclose(scores.scores, scores.category_counts * 1000.0 / scores.lengths[:, None])
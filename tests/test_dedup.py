@@ -0,0 +1,60 @@
+"""Tests for streaming near-duplicate detection."""
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.dedup import NearDuplicateIndex, lsh_rows  # noqa: E402
+
+TEXT = (
+    "Orders wait in a queue for approval before shipment. Technicians walk to the warehouse, "
+    "collect parts and rework defects by hand while finished goods pile up at the dock."
+)
+
+
+def test_edited_copies_join_the_first_texts_cluster():
+    index = NearDuplicateIndex(0.8)
+    assignments = index.assign_many(
+        [
+            (0, TEXT, None),
+            (1, TEXT.upper(), None),
+            (2, TEXT.replace("shipment", "shipping"), None),
+            (3, "Excess inventory accumulates between every step of the assembly line.", None),
+        ]
+    )
+
+    assert assignments[0].stored and assignments[0].representative is None
+    assert [assignment.representative for assignment in assignments[1:3]] == [0, 0]
+    assert assignments[3].stored
+    assert index.assign(4, TEXT).representative == 0
+    assert index.stats[:3] == (5, 3, 2)
+
+
+def test_context_separates_otherwise_identical_texts():
+    index = NearDuplicateIndex()
+
+    assert index.assign("a", TEXT, "software").stored
+    assert index.assign("b", TEXT, "manufacturing").stored
+    assert index.assign("c", TEXT, "software").representative == "a"
+
+
+def test_capacity_bounds_the_representatives_kept():
+    index = NearDuplicateIndex(capacity=2)
+    texts = [f"{TEXT} Variant {i}: " + "abcdefghij"[i] * 40 for i in range(3)]
+
+    assert [index.assign(i, text).evicted for i, text in enumerate(texts)] == [None, None, 0]
+    # The first text was forgotten, so it starts a new cluster.
+    assert index.assign(3, texts[0]).stored
+    assert index.assign(4, texts[2]).representative == 2
+
+
+def test_short_texts_are_never_clustered():
+    index = NearDuplicateIndex()
+
+    assert index.assign_many([(0, "tiny", None), (1, "tiny", None)]) == [index.assign(2, "tiny")] * 2
+    assert index.stats.unsigned == 3 and index.stats.representatives == 0
+
+
+def test_lsh_rows_keep_recall_at_the_threshold():
+    for threshold in (0.5, 0.8, 0.9, 0.95):
+        rows = lsh_rows(threshold, 64)
+        assert 1 - (1 - threshold**rows) ** (64 // rows) >= 0.95
@@ -0,0 +1,77 @@
+"""Tests for batched and streamed runs of the compiled agent graph."""
+import asyncio
+
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("jinja2")
+pytest.importorskip("pydantic_settings")
+
+from app.agent.graph import get_compiled_graph  # noqa: E402
+from app.agent.state import AgentState  # noqa: E402
+from app.tools.registry import get_tool_registry  # noqa: E402
+
+GOALS = [
+    "Orders wait in a queue for approval before shipment.",
+    "Technicians walk to the warehouse and rework defects by hand.",
+    "Nothing to see here.",
+]
+
+
+def _outcome(state):
+    return state["final_response"], state["latest_result"], state["conversation_history"]
+
+
+def test_batch_matches_invoke_and_runs_the_tool_once():
+    graph = get_compiled_graph()
+    assert get_compiled_graph() is graph
+    detector = get_tool_registry().get("waste_detector")
+    calls = []
+    run_batch = detector.run_batch
+    detector.run_batch = lambda items, analysed=None: calls.append(len(items)) or run_batch(items, analysed)
+    try:
+        expected = [_outcome(graph.invoke(AgentState(user_goal=goal))) for goal in GOALS]
+        states = [AgentState(user_goal=goal) for goal in GOALS]
+
+        assert [_outcome(state) for state in graph.batch(states)] == expected
+        batched = asyncio.run(graph.abatch([{"user_goal": goal} for goal in GOALS]))
+        assert [_outcome(state) for state in batched] == expected
+        assert calls == [len(GOALS), len(GOALS)]
+        # Callers' states are not modified.
+        assert all(state.final_response is None and not state.conversation_history for state in states)
+    finally:
+        del detector.run_batch
+
+
+def test_batch_reports_failures_per_session():
+    results = get_compiled_graph().batch([{"user_goal": GOALS[0]}, {"mode": "analyst"}], return_exceptions=True)
+
+    assert results[0]["final_response"] and isinstance(results[1], Exception)
+    with pytest.raises(Exception):
+        get_compiled_graph().batch([{"mode": "analyst"}])
+
+
+def test_stream_forwards_insights_as_the_tool_yields_them():
+    goal = "Parts move to the warehouse and wait in a queue. Streamed."
+    chunks = list(get_compiled_graph().stream({"user_goal": goal}, stream_mode="custom"))
+
+    assert [chunk["tool_name"] for chunk in chunks] == ["waste_detector"] * 3
+    categories = [chunk["insight"]["category"] for chunk in chunks]
+    assert categories == ["transportation", "inventory", "waiting"]
+    assert chunks[0]["insight"]["spans"] == [["move", 6, 10]]
+
+
+def test_runs_without_a_custom_stream_do_not_forward_insights(monkeypatch):
+    from app.tools.waste_detector import StreamedInsight
+
+    forwarded = []
+    to_dict = StreamedInsight.to_dict
+    monkeypatch.setattr(StreamedInsight, "to_dict", lambda self: forwarded.append(self) or to_dict(self))
+    graph = get_compiled_graph()
+    goal = "Parts move to the warehouse and wait in a queue. Not streamed."
+
+    graph.invoke({"user_goal": goal})
+    list(graph.stream({"user_goal": goal + " Updates."}, stream_mode="updates"))
+    assert forwarded == []
+    chunks = list(graph.stream({"user_goal": goal + " Custom."}, stream_mode=["updates", "custom"]))
+    assert len(forwarded) == 3 and [mode for mode, _ in chunks].count("custom") == 3
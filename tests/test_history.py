@@ -0,0 +1,77 @@
+"""Tests for the bounded, compacting conversation history."""
+import tracemalloc
+
+from app.agent.history import ConversationHistory, ResultArchive
+from app.agent.state import AgentState
+from app.tracing import payload_size
+
+
+def _result(turn):
+    return {
+        "wastes": [
+            {"category": "waiting", "supporting_evidence": f"Turn {turn}: queue, delay.", "recommended_action": "Pull."}
+        ]
+        * 4,
+        "summary": f"Detected potential wastes on turn {turn}. " + "x" * 300,
+    }
+
+
+def test_recent_entries_stay_full_and_latest_is_tracked():
+    history = ConversationHistory(max_bytes=8_000, keep_recent=3)
+    state = AgentState(user_goal="Reduce waiting")
+
+    for turn in range(40):
+        history.record(state, "waste_detector", _result(turn))
+
+    entries = state.conversation_history
+    assert all("result" in entry for entry in entries[-3:])
+    assert state.latest_result is entries[-1]
+    assert state.latest_result["result"]["summary"].startswith("Detected potential wastes on turn 39")
+    assert entries[0]["tool"] == "*"
+    digest = entries[0]["digest"]
+    compacted = [entry for entry in entries[1:] if entry.get("compacted")]
+    assert digest["turns"] + len(compacted) + sum("result" in entry for entry in entries) == 40
+    assert state.history_bytes == sum(payload_size(entry) for entry in entries) <= 8_000
+
+
+def test_compacted_results_resolve_through_the_archive(tmp_path):
+    history = ConversationHistory(max_bytes=6_000, keep_recent=2, archive=ResultArchive(tmp_path / "archive.sqlite3"))
+    state = AgentState(user_goal="Reduce waiting")
+    for turn in range(12):
+        history.record(state, "waste_detector", _result(turn))
+
+    compacted = next(entry for entry in state.conversation_history if entry.get("ref"))
+
+    assert compacted["summary"]["wastes_count"] == 4
+    assert len(compacted["summary"]["summary"]) <= 200
+    assert history.resolve(compacted)["wastes"][0]["category"] == "waiting"
+    assert history.resolve(state.latest_result) is state.latest_result["result"]
+
+
+def test_token_budget_converts_to_bytes():
+    assert ConversationHistory.for_tokens(1_000).max_bytes == 4_000
+
+
+def test_memory_stays_flat_over_thousands_of_turns():
+    history = ConversationHistory(max_bytes=32_000, keep_recent=8)
+    state = AgentState(user_goal="Reduce waiting")
+
+    tracemalloc.start()
+    try:
+        for turn in range(200):
+            history.record(state, "waste_detector", _result(turn))
+        early_current, _ = tracemalloc.get_traced_memory()
+        lengths = []
+        for turn in range(200, 2_500):
+            history.record(state, "waste_detector", _result(turn))
+            lengths.append(len(state.conversation_history))
+        late_current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert max(lengths) < 100
+    assert state.history_bytes <= 32_000
+    assert state.conversation_history[0]["digest"]["turns"] > 2_400
+    # Growth over 2,300 further turns stays well under a single turn's worth
+    # of retained results per hundred turns.
+    assert late_current - early_current < 64_000
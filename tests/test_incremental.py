@@ -0,0 +1,79 @@
+"""Tests for incremental re-analysis of edited descriptions."""
+import pickle
+import random
+
+from app.tools.incremental import IncrementalAnalysis, SessionPool
+from app.tools.keyword_matcher import KeywordMatcher
+from app.tools.waste_detector import TIMWOODS_CATEGORIES, WasteDetector
+from benchmarks.generator import NarrativeGenerator
+
+PIECES = ["too", "many", "too many", " ", "\n", "\n\n", ". ", "! ", "queue", "waiting", "x", "re work", "Delay", "bug"]
+
+
+def _sorted(detected):
+    return {category: sorted(set(keywords)) for category, keywords in detected.items()}
+
+
+def test_random_edits_match_a_full_rescan():
+    rng = random.Random(7)
+    table = {**TIMWOODS_CATEGORIES, "phrases": ["too  many", "re work", "many more items"]}
+    for whole_words in (False, True):
+        matcher = KeywordMatcher(table, whole_words=whole_words)
+        for _ in range(60):
+            session = IncrementalAnalysis(matcher)
+            text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 60)))
+            for _ in range(20):
+                start = rng.randint(0, len(text))
+                stop = rng.randint(start, min(len(text), start + 8))
+                inserted = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 4)))
+                text = text[:start] + inserted + text[stop:]
+
+                assert session.update(text) == _sorted(matcher.detect(text)), repr(text)
+                assert session.matches() == list(matcher.finditer(text)), repr(text)
+
+
+def test_small_edit_rescans_only_nearby_segments():
+    matcher = KeywordMatcher(TIMWOODS_CATEGORIES)
+    text = NarrativeGenerator(seed=3).narrative(200_000)
+    session = IncrementalAnalysis(matcher)
+    session.update(text)
+
+    middle = text.index(". ", len(text) // 2) + 2
+    edited = text[:middle] + "Every order waits in a queue. " + text[middle:]
+
+    assert session.update(edited) == _sorted(matcher.detect(edited))
+    assert session.stats.rescanned_segments < 10
+    assert session.stats.rescanned_chars < 1_000 < session.stats.segments
+
+
+def test_waste_detector_sessions_match_stateless_runs():
+    detector = WasteDetector()
+    drafts = [
+        "Orders wait in a queue.",
+        "Orders wait in a queue. Rework follows every defect.",
+        "Rework follows every defect.\nToo many approvals.",
+    ]
+
+    for draft in drafts:
+        expected = detector.run({"process_description": draft})
+        assert detector.run({"process_description": draft, "session": "draft"}) == expected
+    assert detector.session("draft").text == drafts[-1]
+
+
+def test_session_pool_evicts_and_resets():
+    first = KeywordMatcher({"waiting": ["queue"]})
+    second = KeywordMatcher({"waiting": ["delay"]})
+    pool = SessionPool(max_sessions=2)
+
+    session = pool.get("a", first)
+    session.update("A queue.")
+    assert pool.get("a", first) is session
+    pool.get("b", first)
+    pool.get("a", first)
+    pool.get("c", first)
+
+    assert len(pool) == 2 and pool.get("a", first) is session
+    # A reloaded ruleset starts the session over.
+    assert pool.get("a", second).update("A queue, then a delay.") == {"waiting": ["delay"]}
+    restored = pickle.loads(pickle.dumps(pool))
+    assert restored.max_sessions == 2 and len(restored) == 0
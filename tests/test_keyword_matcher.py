@@ -0,0 +1,79 @@
+"""Unit tests for the compiled keyword matcher."""
+from app.tools.keyword_matcher import KeywordMatch, KeywordMatcher
+
+
+def test_reports_offsets_for_every_hit():
+    matcher = KeywordMatcher({"waiting": ["delay"], "defects": ["error"]})
+    text = "An error caused a Delay, then another error."
+
+    matches = list(matcher.finditer(text))
+
+    assert matches == [
+        KeywordMatch("defects", "error", 3, 8),
+        KeywordMatch("waiting", "delay", 18, 23),
+        KeywordMatch("defects", "error", 38, 43),
+    ]
+    assert [text[match.start : match.end].lower() for match in matches] == ["error", "delay", "error"]
+
+
+def test_requires_word_start():
+    matcher = KeywordMatcher({"defects": ["bug"], "waiting": ["delay"]})
+
+    assert matcher.detect("Hours spent debugging despite delays.") == {"waiting": ["delay"]}
+    assert KeywordMatcher({"waiting": ["delay"]}, whole_words=True).detect("Frequent delays.") == {}
+
+
+def test_matches_phrases_and_nested_keywords():
+    matcher = KeywordMatcher({"overproduction": ["too many", "excess"], "motion": ["too"]})
+    matches = list(matcher.finditer("We print too\n  many copies."))
+
+    assert [(match.category, match.keyword) for match in matches] == [
+        ("motion", "too"),
+        ("overproduction", "too many"),
+    ]
+    assert matches[1].end == len("We print too\n  many")
+
+
+def test_scan_stream_matches_across_chunk_boundaries():
+    import io
+
+    matcher = KeywordMatcher({"overproduction": ["too many"], "waiting": ["delay"], "defects": ["bug"]})
+    text = "x debugging delay " * 7 + "we made too many parts; delays again"
+
+    expected = list(matcher.finditer(text))
+    for chunk_size in (1, 3, 7, 64):
+        assert list(matcher.scan_stream(io.StringIO(text), chunk_size=chunk_size)) == expected
+
+
+def test_scan_stream_keeps_multiword_hits_split_by_long_whitespace_runs():
+    import io
+
+    matcher = KeywordMatcher({"overproduction": ["too many"], "waiting": ["delay"]})
+    text = "a delay " * 3 + "too" + " " * 40 + "many" + "\n\t " * 15 + "delay too \n  many"
+
+    expected = list(matcher.finditer(text))
+    assert [hit.keyword for hit in expected].count("too many") == 2
+    for chunk_size in (1, 2, 5, 11, 32):
+        assert list(matcher.scan_stream(io.StringIO(text), chunk_size=chunk_size)) == expected
+
+
+def test_first_matches_agree_with_every_hit():
+    import io
+
+    table = {"overproduction": ["too many", "excess"], "motion": ["too"], "defects": ["bug"], "waiting": ["delay"]}
+    texts = [
+        "debugging, then a bug; too few and later TOO\n many delays, then delay and excess.",
+        "İdle bug_ too  many_ delayed delay",
+        "excessive excess too",
+        "delay " + "too" + " " * 30 + "many bug " * 3,
+        "",
+    ]
+    for whole_words in (False, True):
+        matcher = KeywordMatcher(table, whole_words=whole_words)
+        for text in texts:
+            first = matcher.first_matches(text)
+            assert matcher.detect(text) == matcher.group(matcher.finditer(text)), (whole_words, text)
+            assert len({(match.keyword, match.category) for match in first}) == len(first)
+            assert set(first) <= set(matcher.finditer(text))
+            for chunk_size in (1, 4, 16):
+                assert list(matcher.scan_stream_first(io.StringIO(text), chunk_size=chunk_size)) == first
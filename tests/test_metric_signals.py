@@ -0,0 +1,117 @@
+"""Tests for metric-based waste signals."""
+import pytest
+
+from app.tools.base import ToolExecutionError
+from app.tools.cache import ToolCache
+from app.tools.metric_signals import MetricAnalyser, as_array
+from app.tools.waste_detector import WasteDetector
+
+np = pytest.importorskip("numpy")
+
+
+def test_chunked_statistics_match_in_memory_results():
+    rng = np.random.default_rng(3)
+    values = rng.lognormal(mean=2.0, sigma=0.6, size=50_000)
+    exact = MetricAnalyser().summarise(values)
+    chunked = MetricAnalyser(chunk_size=4_096, histogram_bins=1 << 14).summarise(values)
+
+    assert chunked.count == exact.count
+    assert chunked.total == pytest.approx(exact.total)
+    assert (chunked.minimum, chunked.maximum) == (exact.minimum, exact.maximum)
+    tolerance = (exact.maximum - exact.minimum) / (1 << 14)
+    for q, value in exact.percentiles.items():
+        assert abs(chunked.percentiles[q] - value) <= 2 * tolerance
+
+    defects = (rng.random(20_000) < 0.01).astype(np.uint8)
+    defects[12_000:12_500] = 1
+    window = 700
+    sums = np.convolve(defects.astype(float), np.ones(window), mode="valid")
+    expected = sums.max() / window
+    assert MetricAnalyser(chunk_size=1_000).rolling_max_rate(defects, window) == pytest.approx(expected)
+    assert MetricAnalyser().rolling_max_rate(defects, window) == pytest.approx(expected)
+
+
+def test_memory_mapped_metrics_merge_with_text_evidence(tmp_path):
+    rng = np.random.default_rng(5)
+    queue = tmp_path / "queue.npy"
+    np.save(queue, rng.exponential(40.0, size=30_000).astype(np.float32))
+    touch = np.lib.format.open_memmap(tmp_path / "touch.npy", mode="w+", dtype=np.float64, shape=(30_000,))
+    touch[:] = rng.exponential(5.0, size=30_000)
+    touch.flush()
+    wip = np.linspace(10, 30, 1_000)
+
+    tool = WasteDetector(cache=ToolCache(max_entries=8))
+    tool.metric_analyser = MetricAnalyser(allow_paths=True)
+    text = "Orders wait in a queue before manual rework."
+    data = {
+        "process_description": text,
+        "metrics": {"queue_time": str(queue), "touch_time": touch, "wip": wip, "defect_rate": 0.001},
+    }
+    output = tool.run(data)
+
+    signals = {signal["statistic"]: signal for signal in output["signals"]}
+    assert signals["queue_to_touch_ratio"]["flagged"] and signals["queue_to_touch_ratio"]["value"] > 3
+    assert signals["growth"]["flagged"] and signals["growth"]["category"] == "inventory"
+    assert not signals["rate"]["flagged"]
+    wastes = {waste["category"]: waste["supporting_evidence"] for waste in output["wastes"]}
+    assert wastes["waiting"].startswith("Keywords identified: queue.")
+    assert "Metrics: queue-to-touch ratio" in wastes["waiting"]
+    assert wastes["inventory"].startswith("Metrics: wip grew")
+    assert "defects" not in wastes
+    text_only = {waste["category"] for waste in tool.run({"process_description": text})["wastes"]}
+    assert text_only == set(wastes) - {"inventory"}
+
+    # Cache keys cover array contents, not just their abbreviated repr.
+    assert tool.run(data) == output
+    changed = {**data, "metrics": {**data["metrics"], "wip": wip[::-1].copy()}}
+    assert not any(signal["flagged"] for signal in tool.run(changed)["signals"] if signal["statistic"] == "growth")
+
+
+def test_plain_text_output_is_unchanged_and_bad_metrics_are_reported():
+    tool = WasteDetector()
+    text = "Parts wait in the warehouse."
+    assert tool.run({"process_description": text, "metrics": {}}) == tool.run({"process_description": text})
+    assert tool.run({"process_description": text})["signals"] == []
+
+    with pytest.raises(ValueError):
+        as_array(["slow", "fast"])
+    trusted = WasteDetector()
+    trusted.metric_analyser = MetricAnalyser(allow_paths=True)
+    with pytest.raises(ToolExecutionError):
+        trusted.run({"process_description": text, "metrics": {"cycle_time": "missing.npy"}})
+
+
+def test_metric_paths_are_rejected_unless_the_analyser_allows_them(tmp_path, monkeypatch):
+    import os
+
+    series = tmp_path / "cycle.npy"
+    np.save(series, np.arange(10.0))
+    data = {"process_description": "Parts wait.", "metrics": {"cycle_time": str(series)}}
+    tool = WasteDetector(cache=ToolCache(max_entries=8))
+
+    def no_file_access(*args, **kwargs):
+        raise AssertionError("metric path was touched")
+
+    monkeypatch.setattr(os, "stat", no_file_access)
+    monkeypatch.setattr(np, "load", no_file_access)
+    with pytest.raises(ValueError, match="not file paths: cycle_time"):
+        tool.run(data)
+    with pytest.raises(ValueError, match="not accepted"):
+        MetricAnalyser().analyse({"cycle_time": series})
+    monkeypatch.undo()
+
+    trusted = WasteDetector()
+    trusted.metric_analyser = MetricAnalyser(allow_paths=True)
+    assert [signal["metric"] for signal in trusted.run(data)["signals"]] == ["cycle_time"]
+
+
+def test_each_metric_series_is_summarised_once():
+    analyser = MetricAnalyser()
+    summarised = []
+    summarise = analyser.summarise
+    analyser.summarise = lambda values: summarised.append(len(values)) or summarise(values)
+    metrics = {"queue_time": np.ones(30), "touch_time": np.ones(20), "cycle_time": np.arange(1.0, 11.0)}
+
+    statistics = [signal.statistic for signal in analyser.analyse(metrics)]
+    assert statistics == ["queue_to_touch_ratio", "queue_share", "p99_to_p50"]
+    assert sorted(summarised) == [10, 20, 30]
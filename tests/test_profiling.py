@@ -0,0 +1,56 @@
+"""Tests for the CLI profiling mode."""
+import json
+import pstats
+
+from app.profiling import JSON_FILENAME, PSTATS_FILENAME, REPORT_FILENAME, Profiler
+from app.tools.waste_detector import WasteDetector
+from benchmarks.generator import NarrativeGenerator
+
+
+def test_profiled_file_analysis_reports_stages_memory_and_files(tmp_path):
+    narrative = tmp_path / "process.txt"
+    narrative.write_text(NarrativeGenerator(seed=2).narrative(400_000), encoding="utf-8")
+    detector = WasteDetector()
+
+    def analyse():
+        streamed = detector.run_file(narrative, chunk_size=64 * 1024)
+        whole = detector.run({"process_description": narrative.read_text(encoding="utf-8")})
+        return streamed, whole
+
+    profiler = Profiler(snapshot_interval=0.01, top=10)
+    streamed, whole = profiler.run("file analysis", analyse)
+    assert streamed == whole
+
+    report = profiler.report
+    stages = report.stages
+    assert list(stages) == ["imports", "file read", "input validation", "matching", "output dumping"]
+    assert stages["matching"].calls == 2 and stages["input validation"].calls == 1
+    assert stages["output dumping"].calls >= 2
+    assert stages["file read"].calls >= 1
+    # Reads inside the streaming scan count as file read, not matching.
+    assert 0 < stages["matching"].seconds + stages["file read"].seconds <= report.wall_s
+    assert report.peak_bytes >= 400_000
+    assert report.allocations and len(report.functions) == 10
+
+    paths = profiler.write(tmp_path / "profile")
+    assert {path.name for path in paths.values()} == {REPORT_FILENAME, JSON_FILENAME, PSTATS_FILENAME}
+    document = json.loads(paths["json"].read_text(encoding="utf-8"))
+    assert document["stages"]["matching"]["calls"] == 2
+    assert document["peak_bytes"] == report.peak_bytes
+    assert "matching" in paths["report"].read_text(encoding="utf-8")
+    assert pstats.Stats(str(paths["pstats"])).total_calls > 0
+
+
+def test_profiled_cli_file_mode_attributes_the_streamed_scan_to_matching(tmp_path, capsys):
+    import main
+
+    narrative = tmp_path / "process.txt"
+    narrative.write_text(NarrativeGenerator(seed=3).narrative(400_000), encoding="utf-8")
+
+    for stream in (False, True):
+        profiler = Profiler(snapshot_interval=0.01)
+        profiler.run("--file", main.analyze_file, narrative, stream)
+        stages = profiler.report.stages
+        assert "Identified Wastes" in capsys.readouterr().out
+        assert stages["matching"].calls >= 1 and stages["matching"].seconds > 0
+        assert stages["matching"].seconds + stages["input validation"].seconds <= profiler.report.wall_s
@@ -0,0 +1,32 @@
+"""Tests for the compiled prompt registry."""
+import os
+
+import pytest
+
+pytest.importorskip("jinja2")
+
+from app.agent.prompts import PROMPT_FILES, PromptRegistry  # noqa: E402
+
+
+def test_reuses_compiled_templates_until_mtime_changes(tmp_path):
+    prompt = tmp_path / "planner_v1.jinja"
+    prompt.write_text("Plan v1")
+    registry = PromptRegistry(tmp_path)
+
+    first = registry.get_template("planner")
+    assert registry.render("planner") == "Plan v1"
+    assert registry.get_template("planner") is first
+
+    prompt.write_text("Plan v2")
+    stat = prompt.stat()
+    os.utime(prompt, (stat.st_atime, stat.st_mtime + 5))
+    assert registry.render("planner") == "Plan v2"
+
+
+def test_warm_up_prerenders_all_prompt_files(tmp_path):
+    for file_name in PROMPT_FILES.values():
+        (tmp_path / file_name).write_text(file_name)
+    registry = PromptRegistry(tmp_path, bytecode_cache_dir=tmp_path / "bytecode")
+
+    registry.warm_up()
+    assert set(registry._rendered) == set(PROMPT_FILES.values())
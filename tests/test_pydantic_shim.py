@@ -0,0 +1,50 @@
+"""Tests for the generated fast paths of the bundled pydantic shim."""
+import json
+import pickle
+from typing import Dict, List, Optional
+
+import pytest
+from pydantic import BaseModel, Field
+
+
+class Item(BaseModel):
+    name: str = Field(..., description="Item name.")
+    score: Optional[float] = Field(default=None, description="Optional score.")
+
+
+class Basket(BaseModel):
+    items: List[Item] = Field(default_factory=list, description="Items in the basket.")
+    tags: Dict[str, int] = Field(default_factory=dict, description="Tag counts.")
+    label: str = "basket"
+
+
+def test_construct_validate_and_dump():
+    basket = Basket.model_validate({"items": [Item(name="a", score=1.5)], "tags": {"x": 1}})
+
+    assert basket.model_dump() == {
+        "items": [{"name": "a", "score": 1.5}],
+        "tags": {"x": 1},
+        "label": "basket",
+    }
+    assert Basket().items is not Basket().items
+    with pytest.raises(ValueError, match="Missing required field 'name'"):
+        Item(score=2.0)
+    with pytest.raises(ValueError, match="expects a mapping"):
+        Item.model_validate("not a mapping")
+
+
+def test_instances_use_slots_and_pickle():
+    item = Item(name="a")
+
+    assert not hasattr(item, "__dict__")
+    with pytest.raises(AttributeError):
+        item.unknown = 1
+    assert pickle.loads(pickle.dumps(item)).model_dump() == item.model_dump()
+
+
+def test_model_dump_json_matches_json_dumps():
+    basket = Basket(items=[Item(name='quote " and é', score=2.0), Item(name="b")], tags={"k": 3})
+
+    assert json.loads(basket.model_dump_json()) == basket.model_dump()
+    assert basket.model_dump_json() == json.dumps(basket.model_dump(), separators=(",", ":"))
+    assert basket._dump_json() == basket.model_dump_json().encode("ascii")
@@ -0,0 +1,150 @@
+"""Tests for file-backed, hot-reloadable waste rulesets."""
+import json
+import os
+import pickle
+from pathlib import Path
+
+import pytest
+
+from app.tools.cache import ToolCache
+from app.tools.rulesets import RulesetError, RulesetRegistry, load_ruleset
+from app.tools.waste_detector import TIMWOODS_CATEGORIES, WasteDetector, builtin_ruleset
+
+REPO_RULESETS = Path(__file__).resolve().parents[1] / "rulesets"
+
+
+def _write(directory, ruleset_id, keywords, action="Fix it.", version="1"):
+    path = directory / f"{ruleset_id}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(
+        json.dumps({"version": version, "categories": {"waiting": {"keywords": keywords, "action": action}}}),
+        encoding="utf-8",
+    )
+    os.replace(tmp, path)
+    return path
+
+
+def _detector(registry):
+    detector = WasteDetector()
+    detector.rulesets = registry
+    return detector
+
+
+def test_shipped_rulesets_compile_and_timwoods_matches_builtin():
+    registry = RulesetRegistry(REPO_RULESETS)
+    assert {"timwoods", "software", "healthcare"} <= set(registry.available())
+    registry.warm_up()
+
+    shipped = load_ruleset(REPO_RULESETS / "timwoods.json")
+    assert shipped.matcher.fingerprint == builtin_ruleset().matcher.fingerprint
+    assert shipped.fingerprint == builtin_ruleset().fingerprint
+    assert set(shipped.matcher.categories) == set(TIMWOODS_CATEGORIES)
+
+
+def test_input_selects_ruleset_and_default_stays_builtin(tmp_path):
+    _write(tmp_path, "software", ["blocked"], action="Limit WIP.")
+    detector = _detector(RulesetRegistry(tmp_path))
+    text = "Deploys are blocked while tickets wait in a queue."
+
+    selected = detector.run({"process_description": text, "ruleset": "software"})
+    assert [(waste["category"], waste["recommended_action"]) for waste in selected["wastes"]] == [
+        ("waiting", "Limit WIP.")
+    ]
+    assert detector.run({"process_description": text}) == WasteDetector().run({"process_description": text})
+
+    with pytest.raises(RulesetError):
+        detector.run({"process_description": text, "ruleset": "missing"})
+    with pytest.raises(RulesetError):
+        detector.run({"process_description": text, "ruleset": "../software"})
+
+
+def test_changed_file_is_swapped_in_and_bad_edits_keep_last_good(tmp_path):
+    path = _write(tmp_path, "team", ["queue"])
+    registry = RulesetRegistry(tmp_path, check_interval=0)
+    first = registry.get("team")
+    assert registry.get("team") is first
+
+    _write(tmp_path, "team", ["backlog"], version="2")
+    os.utime(path, ns=(first.source.stat().st_mtime_ns + 10**9,) * 2)
+    second = registry.get("team")
+    assert second.version == "2" and second is not first
+    # A request that resolved the old version keeps a fully usable matcher.
+    assert first.matcher.detect("a queue") == {"waiting": ["queue"]}
+    assert second.matcher.detect("a queue") == {}
+
+    path.write_text("{not json", encoding="utf-8")
+    os.utime(path, ns=(path.stat().st_mtime_ns + 2 * 10**9,) * 2)
+    assert registry.get("team") is second
+    assert "team" in registry.errors
+
+    restored = pickle.loads(pickle.dumps(registry))
+    assert restored.directory == registry.directory and not restored.errors
+
+
+def test_cached_results_are_keyed_on_ruleset_version(tmp_path):
+    path = _write(tmp_path, "team", ["queue"], action="First.")
+    detector = _detector(RulesetRegistry(tmp_path, check_interval=0))
+    detector.cache = ToolCache()
+    payload = {"process_description": "Orders sit in a queue.", "ruleset": "team"}
+
+    assert detector.run(payload)["wastes"][0]["recommended_action"] == "First."
+    assert detector.run(payload)["wastes"][0]["recommended_action"] == "First."
+    assert detector.cache.stats.hits == 1
+
+    stamp = path.stat().st_mtime_ns
+    _write(tmp_path, "team", ["queue"], action="Second.")
+    os.utime(path, ns=(stamp + 10**9,) * 2)
+    assert detector.run(payload)["wastes"][0]["recommended_action"] == "Second."
+
+
+class _SwappingRegistry:
+    """Hands out a new version of the ruleset on every lookup, as if reloaded each time."""
+
+    def __init__(self):
+        self.lookups = 0
+        self.pinned = None
+
+    def get(self, ruleset_id):
+        self.lookups += 1
+        version = self.pinned or self.lookups
+        actions = {"waiting": f"Version {version}."}
+        return builtin_ruleset()._replace(id=ruleset_id, actions=actions, version=str(version))
+
+
+def test_one_call_keys_and_matches_with_the_same_ruleset_version():
+    import asyncio
+
+    registry = _SwappingRegistry()
+    detector = _detector(registry)
+    payload = {"process_description": "Orders sit in a queue.", "ruleset": "team"}
+    runs = [detector.run, lambda data: asyncio.run(detector.arun(data)), lambda data: detector.iter_run(data).result()]
+
+    for run in runs:
+        detector.cache = ToolCache()
+        registry.pinned = None
+        action = run(payload)["wastes"][0]["recommended_action"]
+        # One lookup per call, and the result is stored under that version's key.
+        assert action == f"Version {registry.lookups}."
+        registry.pinned = registry.lookups
+        key = detector.cache.key_for(detector, detector.parse_input(payload))
+        assert detector.cache.get(detector, key)["wastes"][0]["recommended_action"] == action
+
+
+def test_cli_applies_a_ruleset_from_the_rulesets_directory(tmp_path):
+    import subprocess
+    import sys
+
+    path = tmp_path / "process.txt"
+    path.write_text("Every ticket bounce leaves unmerged work in progress.")
+    root = REPO_RULESETS.parent
+    completed = subprocess.run(
+        [sys.executable, "main.py", "--file", str(path), "--ruleset", "software"],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True,
+    )
+
+    assert "Error" not in completed.stdout
+    assert "ticket bounce" in completed.stdout and "Form cross-functional teams" in completed.stdout
@@ -0,0 +1,158 @@
+"""Tests for the HTTP analysis service and its micro-batching."""
+import asyncio
+import json
+import time
+
+from app.server import AnalysisServer, MicroBatcher, Overloaded
+from app.tools.waste_detector import WasteDetector
+from benchmarks.load_generator import _read_response, _request, fetch
+
+GOALS = [f"Orders wait in a queue before rework ({index})." for index in range(40)]
+
+
+def test_service_batches_concurrent_requests_and_reports_metrics():
+    detector = WasteDetector()
+
+    async def scenario():
+        server = AnalysisServer({"waste_detector": detector}, port=0, max_batch_wait=0.05)
+        await server.start()
+        host, port = server.address
+        try:
+            bodies = [json.dumps({"process_description": goal}).encode() for goal in GOALS]
+            responses = await asyncio.gather(
+                *(fetch(host, port, "POST", "/v1/tools/waste_detector", body) for body in bodies)
+            )
+            # Two requests on one keep-alive connection.
+            reader, writer = await asyncio.open_connection(host, port)
+            replies = []
+            for body in (b"{}", b"[]"):
+                writer.write(_request("POST", "/v1/tools/waste_detector", host, body))
+                await writer.drain()
+                replies.append(await _read_response(reader))
+            writer.close()
+            missing = await fetch(host, port, "POST", "/v1/tools/unknown", b"{}")
+            agent = await fetch(host, port, "POST", "/v1/agent", b"{}")
+            metrics = await fetch(host, port, "GET", "/metrics")
+            document = await fetch(host, port, "GET", "/metrics?format=json")
+            return responses, replies, missing, agent, metrics, document
+        finally:
+            await server.stop()
+
+    responses, replies, missing, agent, metrics, document = asyncio.run(scenario())
+    assert [status for status, _ in responses] == [200] * len(GOALS)
+    assert [json.loads(body) for _, body in responses] == [
+        detector.run({"process_description": goal}) for goal in GOALS
+    ]
+    # Invalid tool input fails alone; a non-object body is rejected before queueing.
+    assert [status for status, _ in replies] == [422, 400]
+    assert "process_description" in json.loads(replies[0][1])["error"]
+    assert missing[0] == 404 and agent[0] == 404
+
+    stats = json.loads(document[1])["pipelines"]["tool:waste_detector"]
+    assert stats["requests"] == len(GOALS) + 1
+    assert stats["batches"] < len(GOALS) and stats["max_batch_size"] > 1
+    assert stats["queue_depth"] == 0 and stats["shed"] == 0
+    text = metrics[1].decode()
+    assert 'lean_agent_queue_depth{pipeline="tool:waste_detector"} 0' in text
+    assert 'lean_agent_latency_seconds{pipeline="tool:waste_detector",quantile="0.99"}' in text
+
+
+def test_overlong_request_lines_and_headers_get_431():
+    async def scenario():
+        server = AnalysisServer({"waste_detector": WasteDetector()}, port=0)
+        await server.start()
+        host, port = server.address
+        try:
+            heads = [
+                b"GET /" + b"a" * 100_000 + b" HTTP/1.1\r\n\r\n",
+                b"GET /healthz HTTP/1.1\r\nX-Big: " + b"b" * 100_000 + b"\r\n\r\n",
+            ]
+            statuses = []
+            for head in heads:
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.write(head)
+                await writer.drain()
+                statuses.append((await _read_response(reader))[0])
+                writer.close()
+            healthy = await fetch(host, port, "GET", "/healthz")
+            return statuses, healthy[0]
+        finally:
+            await server.stop()
+
+    assert asyncio.run(scenario()) == ([431, 431], 200)
+
+
+def test_service_rejects_metric_file_paths():
+    async def scenario():
+        server = AnalysisServer({"waste_detector": WasteDetector()}, port=0)
+        await server.start()
+        host, port = server.address
+        try:
+            body = json.dumps({"process_description": "Parts wait.", "metrics": {"cycle_time": "/etc/hostname.npy"}})
+            return await fetch(host, port, "POST", "/v1/tools/waste_detector", body.encode())
+        finally:
+            await server.stop()
+
+    status, body = asyncio.run(scenario())
+    assert status == 422 and "not file paths: cycle_time" in json.loads(body)["error"]
+
+
+def test_micro_batcher_sheds_load_when_saturated():
+    sizes = []
+
+    def slow(items):
+        sizes.append(len(items))
+        time.sleep(0.05)
+        return [ValueError("odd") if item % 2 else item * 10 for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher(slow, max_batch_size=4, max_wait=0.01, max_queue=6, max_queue_wait=0.12)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(item) for item in range(20)), return_exceptions=True)
+        finally:
+            await batcher.stop()
+            stats.append(batcher.stats)
+
+    stats = []
+    results = asyncio.run(scenario())
+    shed = [result for result in results if isinstance(result, Overloaded)]
+    served = [result for result in results if not isinstance(result, Exception)]
+    # 20 arrivals against a queue of 6: the excess is rejected immediately and
+    # requests that queue behind too many slow batches are dropped later.
+    assert len(shed) == stats[0].shed and len(shed) >= 14
+    assert served and all(result % 20 == 0 for result in served)
+    assert all(isinstance(result, ValueError) for item, result in enumerate(results) if item % 2 and item < 4)
+    assert max(sizes) <= 4 and stats[0].batches == len(sizes)
+
+
+def test_cli_serves_until_interrupted_and_reports_bad_settings():
+    import os
+    import signal
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    root = Path(__file__).resolve().parents[1]
+    command = [sys.executable, "main.py", "--serve", "--host", "127.0.0.1", "--port", "0"]
+    process = subprocess.Popen(command, cwd=root, stderr=subprocess.PIPE, text=True)
+    try:
+        banner = process.stderr.readline()
+        port = int(banner.split("http://127.0.0.1:")[1].split()[0])
+        status, body = asyncio.run(fetch("127.0.0.1", port, "GET", "/healthz"))
+        assert status == 200 and json.loads(body)["status"] == "ok"
+    finally:
+        process.send_signal(signal.SIGINT)
+        process.communicate(timeout=30)
+    assert process.returncode == 0
+
+    broken = subprocess.run(
+        command,
+        cwd=root,
+        env={**os.environ, "SERVER_MAX_QUEUE": "many"},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert broken.returncode == 1
+    assert "SERVER_MAX_QUEUE" in broken.stderr and "Traceback" not in broken.stderr
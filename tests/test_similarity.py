@@ -0,0 +1,59 @@
+"""Tests for the local similarity index over past analyses."""
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.similarity import SimilarityIndex  # noqa: E402
+from benchmarks.bench_similarity_index import perturb  # noqa: E402
+from benchmarks.generator import NarrativeGenerator  # noqa: E402
+
+APPROVAL = (
+    "Our team has a manual approval process where team members wait for managers to review "
+    "documents, causing delays and requiring people to walk back and forth between desks."
+)
+INVENTORY = "The warehouse keeps excess stock of spare parts that sit on shelves for months."
+
+
+def _output(summary):
+    return {"wastes": [], "summary": summary}
+
+
+def test_lookup_reuses_exact_and_near_duplicate_descriptions(tmp_path):
+    index = SimilarityIndex(tmp_path)
+    index.add(APPROVAL, _output("approval"))
+    index.add(INVENTORY, _output("inventory"))
+
+    exact = index.lookup("  " + APPROVAL.upper())
+    assert exact.score == 1.0 and exact.output == _output("approval")
+
+    near = index.lookup(APPROVAL.replace("managers", "team leads"), threshold=0.8)
+    assert near is not None and near.row == 0
+
+    assert index.lookup("Printers jam every morning in the print room.", threshold=0.5) is None
+
+
+def test_index_persists_across_reopen(tmp_path):
+    index = SimilarityIndex(tmp_path, dim=128)
+    index.add_many([(APPROVAL, _output("approval")), (INVENTORY, _output("inventory"))])
+    index.close()
+
+    reopened = SimilarityIndex(tmp_path)
+    assert len(reopened) == 2 and reopened.dim == 128
+    assert reopened.search(INVENTORY, k=1)[0].output == _output("inventory")
+    assert reopened.add("A third analysis.", _output("third")) == 2
+
+
+def test_signature_shortlist_agrees_with_exhaustive_scan(tmp_path):
+    import random
+
+    index = SimilarityIndex(tmp_path, exact_rows=100, candidates=64)
+    narratives = list(NarrativeGenerator(seed=3).documents(2_000, 300))
+    index.add_many((narrative, _output(str(row))) for row, narrative in enumerate(narratives))
+
+    rng = random.Random(5)
+    for row in rng.sample(range(len(narratives)), 25):
+        query = perturb(narratives[row], rng)
+        shortlisted = index.search(query, k=1)[0]
+        exhaustive = index.search(query, k=1, exact=True)[0]
+        assert shortlisted.row == exhaustive.row == row
+        assert shortlisted.score == pytest.approx(exhaustive.score)
@@ -0,0 +1,52 @@
+"""Import-time regression tests for CLI cold start."""
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Budget for the modules the ``--file`` mode imports, in microseconds as
+# reported by ``-X importtime``. Interpreter start-up itself is excluded.
+FILE_MODE_IMPORT_BUDGET_US = 100_000
+
+HEAVY_MODULES = ("asyncio", "concurrent.futures.process", "dataclasses", "hashlib", "jinja2", "langgraph", "sqlite3")
+
+
+def _importtime(statement: str) -> dict:
+    """Return cumulative import time per module for ``statement``.
+
+    Only top-level entries are keyed by their bare name; nested entries keep
+    their indentation so the two cannot be confused.
+    """
+
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        cumulative[name[1:].rstrip()] = int(cumulative_us)
+    return cumulative
+
+
+def test_file_mode_imports_stay_within_budget():
+    best = min(
+        sum(
+            _importtime("import main, app.tools.waste_detector").get(name, 0)
+            for name in ("main", "app.tools.waste_detector")
+        )
+        for _ in range(3)
+    )
+    assert best < FILE_MODE_IMPORT_BUDGET_US, f"--file mode imports took {best / 1000:.1f}ms"
+
+
+def test_cli_and_tool_catalogue_do_not_import_heavy_modules():
+    imported = {name.strip() for name in _importtime("import main, app.tools, app.tools.waste_detector")}
+    assert "app.tools.registry" not in imported
+    assert not [name for name in HEAVY_MODULES if name in imported]
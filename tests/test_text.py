@@ -0,0 +1,97 @@
+"""Tests for the shared text-preprocessing stage."""
+import asyncio
+
+import pytest
+
+from app.text import AnalysedText
+from app.tools.keyword_matcher import KeywordMatcher
+from app.tools.registry import ToolRegistry
+from app.tools.waste_detector import TIMWOODS_CATEGORIES, WasteDetector
+from benchmarks.generator import NarrativeGenerator
+
+GOAL = "Orders WAIT in a queue. Then manual rework happens!\n\nDefects pile up"
+
+
+def test_analysed_text_offsets_tokens_and_sentences():
+    analysed = AnalysedText.from_text(GOAL)
+
+    assert len(analysed.normalised) == len(GOAL)
+    assert analysed.tokens[:3] == ("orders", "wait", "in")
+    assert all(
+        analysed.normalised[start:end] == token
+        for token, start, end in zip(analysed.tokens, analysed.token_starts, analysed.token_ends)
+    )
+    assert [analysed.sentence(index) for index in range(len(analysed.sentences))] == [
+        "Orders WAIT in a queue.",
+        "Then manual rework happens!",
+        "Defects pile up",
+    ]
+    offset = GOAL.index("rework")
+    assert analysed.tokens[analysed.token_at(offset + 2)] == "rework"
+    assert analysed.sentence_at(offset) == 1
+    assert analysed.token_at(GOAL.index(".")) is None
+    # Tokens are interned, so equal tokens share one string object.
+    assert AnalysedText.from_text("queue queue").tokens[0] is AnalysedText.from_text("a queue").tokens[1]
+
+    with pytest.raises(AttributeError):
+        analysed.text = "changed"
+
+
+def test_normalised_text_keeps_offsets_for_length_changing_characters():
+    analysed = AnalysedText.from_text("İstanbul WAITING")
+    assert len(analysed.normalised) == len(analysed.text)
+    assert analysed.tokens[-1] == "waiting"
+
+
+@pytest.mark.parametrize("whole_words", [False, True])
+def test_detect_tokens_matches_full_scan(whole_words):
+    table = {**TIMWOODS_CATEGORIES, "extra": ["hand-off", "too  many", "re work"]}
+    matcher = KeywordMatcher(table, whole_words=whole_words)
+    texts = list(NarrativeGenerator(seed=4, keyword_density=0.6).documents(30, 2_000))
+    texts += ["Too many hand-offs; re work, debugging, Delays and BUGS.", "", "_queue queue_"]
+    for text in texts:
+        analysed = AnalysedText.from_text(text)
+        assert matcher.detect_tokens(text, analysed.tokens, analysed.token_starts) == matcher.detect(text)
+
+
+def test_tools_consume_shared_analysis_only_for_their_own_text():
+    calls = []
+
+    class CountingDetector(WasteDetector):
+        def _run_analysed(self, parsed_input, analysed):
+            calls.append(analysed)
+            return super()._run_analysed(parsed_input, analysed)
+
+    registry = ToolRegistry()
+    registry.register(CountingDetector())
+    analysed = AnalysedText.from_text(GOAL)
+    goal_call = {"tool_name": "waste_detector", "arguments": {"process_description": GOAL}}
+    other_call = {"tool_name": "waste_detector", "arguments": {"process_description": "Idle stock."}}
+
+    results = registry.dispatch([goal_call, other_call], analysed)
+    assert results[0][1] == WasteDetector().run({"process_description": GOAL})
+    assert calls == [analysed]
+
+    async_results = asyncio.run(registry.adispatch([goal_call], analysed))
+    assert async_results == results[:1]
+    assert len(calls) == 2
+    registry.shutdown()
+
+
+def test_graph_shares_the_analysis_without_keeping_it_in_state():
+    from app.agent.graph import AgentNodes
+    from app.agent.history import ConversationHistory
+    from app.agent.state import AgentState
+
+    nodes = AgentNodes(ConversationHistory())
+    call = {"tool_name": "waste_detector", "arguments": {"process_description": GOAL}}
+    state = nodes.preprocessor(AgentState(user_goal=GOAL, pending_tool_calls=[call]))
+
+    analysed = nodes.analysed(state)
+    assert analysed.text == GOAL and nodes.analysed(state) is analysed
+    assert "analysed_text" not in state.model_dump()
+    assert nodes.analysed(AgentState(user_goal=GOAL, pending_tool_calls=[call], session_id="edit")) is None
+
+    assert nodes.route_batch([state]) == [None]
+    assert state.latest_result["result"] == WasteDetector().run({"process_description": GOAL})
+    assert nodes.analysed(state) is None
@@ -0,0 +1,37 @@
+"""Tests for the content-addressed tool result cache."""
+from app.tools.cache import ToolCache
+from app.tools.waste_detector import WasteDetector
+
+PAYLOAD = {"process_description": "Orders wait in a queue before manual rework."}
+
+
+def test_memory_tier_hits_and_evictions():
+    cache = ToolCache(max_entries=1)
+    tool = WasteDetector(cache=cache)
+
+    first = tool.run(PAYLOAD)
+    second = tool.run(PAYLOAD)
+    second["wastes"].clear()
+
+    assert tool.run(PAYLOAD) == first
+    assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+
+    tool.run({"process_description": "Another process."})
+    assert cache.stats.evictions == 1
+
+
+def test_disk_tier_survives_restart_and_invalidates_on_rule_change(tmp_path):
+    expected = WasteDetector(cache=ToolCache(directory=tmp_path)).run(PAYLOAD)
+
+    restarted = ToolCache(directory=tmp_path)
+    assert WasteDetector(cache=restarted).run(PAYLOAD) == expected
+    assert restarted.stats.disk_hits == 1
+
+    class RetunedDetector(WasteDetector):
+        action_templates = {**WasteDetector.action_templates, "waiting": "Add a pull signal."}
+
+    retuned = ToolCache(directory=tmp_path)
+    output = RetunedDetector(cache=retuned).run(PAYLOAD)
+    assert retuned.stats.misses == 1
+    assert retuned.stats.invalidations == 1
+    assert "Add a pull signal." in {waste["recommended_action"] for waste in output["wastes"]}
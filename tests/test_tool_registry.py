@@ -0,0 +1,138 @@
+"""Tests for the shared tool registry and concurrent dispatch."""
+import threading
+import time
+
+import pytest
+from pydantic import BaseModel, Field
+
+from app.tools.base import BaseTool, ToolExecutionError
+from app.tools.registry import ToolRegistry
+from app.tools.waste_detector import WasteDetector
+
+
+class SleepInput(BaseModel):
+    seconds: float = Field(..., description="How long to sleep.")
+
+
+class SleepOutput(BaseModel):
+    slept: float = Field(..., description="Requested sleep duration.")
+
+
+class SleepTool(BaseTool[SleepInput, SleepOutput]):
+    name = "sleep"
+    description = "Sleep for a while."
+    input_schema = SleepInput
+    output_schema = SleepOutput
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _run(self, parsed_input: SleepInput) -> SleepOutput:
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(parsed_input.seconds)
+        with self._lock:
+            self.active -= 1
+        return SleepOutput(slept=parsed_input.seconds)
+
+
+def test_dispatch_runs_concurrently_in_call_order():
+    registry = ToolRegistry(max_workers=8)
+    sleeper = registry.register(SleepTool(), max_concurrency=2)
+    registry.register(WasteDetector())
+    calls = [{"tool_name": "sleep", "arguments": {"seconds": delay}} for delay in (0.2, 0.15, 0.1, 0.05)]
+    calls.insert(2, {"tool_name": "waste_detector", "arguments": {"process_description": "Long delay."}})
+    calls.append({"tool_name": "unknown", "arguments": {}})
+
+    results = registry.dispatch(calls)
+
+    assert [name for name, _ in results] == ["sleep", "sleep", "waste_detector", "sleep", "sleep"]
+    assert [result["slept"] for name, result in results if name == "sleep"] == [0.2, 0.15, 0.1, 0.05]
+    assert sleeper.peak == 2
+    registry.shutdown()
+
+
+def test_dispatch_enforces_timeouts():
+    registry = ToolRegistry()
+    registry.register(SleepTool(), timeout=0.01)
+
+    with pytest.raises(ToolExecutionError, match="timed out"):
+        registry.dispatch([{"tool_name": "sleep", "arguments": {"seconds": 0.2}}])
+    registry.shutdown()
+
+
+def test_adispatch_overlaps_calls_and_enforces_timeouts():
+    import asyncio
+
+    registry = ToolRegistry()
+    registry.register(SleepTool(), max_concurrency=4)
+    calls = [{"tool_name": "sleep", "arguments": {"seconds": delay}} for delay in (0.1, 0.1, 0.1, 0.05)]
+
+    started = time.perf_counter()
+    results = asyncio.run(registry.adispatch(calls))
+    assert time.perf_counter() - started < 0.3
+    assert [result["slept"] for _, result in results] == [0.1, 0.1, 0.1, 0.05]
+
+    registry.register(SleepTool(), timeout=0.01)
+    with pytest.raises(ToolExecutionError, match="timed out"):
+        asyncio.run(registry.adispatch([{"tool_name": "sleep", "arguments": {"seconds": 0.2}}]))
+
+
+def test_dispatch_batch_runs_each_tool_once_per_batch():
+    import asyncio
+
+    registry = ToolRegistry()
+    detector = registry.register(WasteDetector())
+    sleeper = registry.register(SleepTool())
+    batches = []
+    run_batch = detector.run_batch
+    detector.run_batch = lambda items, analysed=None: batches.append(len(items)) or run_batch(items, analysed)
+    sessions = [
+        [{"tool_name": "waste_detector", "arguments": {"process_description": "Long delay."}}],
+        [
+            {"tool_name": "sleep", "arguments": {"seconds": 0.01}},
+            {"tool_name": "waste_detector", "arguments": {"process_description": "Rework every defect."}},
+        ],
+        [{"tool_name": "waste_detector", "arguments": {}}],
+        [],
+    ]
+
+    results = registry.dispatch_batch(sessions)
+
+    assert batches == [3]
+    assert results[0] == [("waste_detector", detector.run({"process_description": "Long delay."}))]
+    assert [name for name, _ in results[1]] == ["sleep", "waste_detector"]
+    # An invalid call fails its own session only.
+    assert isinstance(results[2], Exception) and results[3] == []
+    assert asyncio.run(registry.adispatch_batch(sessions))[:2] == results[:2] and batches == [3, 3]
+
+    registry.register(sleeper, timeout=0.01)
+    timed_out = registry.dispatch_batch([[{"tool_name": "sleep", "arguments": {"seconds": 0.2}}], sessions[0]])
+    assert isinstance(timed_out[0], ToolExecutionError) and timed_out[1] == results[0]
+    registry.shutdown()
+
+
+def test_dispatch_streams_insights_from_tools_that_yield_them():
+    import asyncio
+
+    registry = ToolRegistry()
+    detector = registry.register(WasteDetector())
+    registry.register(SleepTool())
+    calls = [
+        {"tool_name": "waste_detector", "arguments": {"process_description": "Long delay, then rework."}},
+        {"tool_name": "sleep", "arguments": {"seconds": 0.01}},
+    ]
+    streamed = []
+
+    results = registry.dispatch(calls, on_insight=lambda name, insight: streamed.append((name, insight.category)))
+
+    assert results[0] == ("waste_detector", detector.run(calls[0]["arguments"])) and results[1][1]["slept"] == 0.01
+    assert streamed == [("waste_detector", "waiting"), ("waste_detector", "overprocessing")]
+    streamed.clear()
+    assert asyncio.run(registry.adispatch(calls[:1], on_insight=lambda *item: streamed.append(item))) == results[:1]
+    assert [insight.category for _, insight in streamed] == ["waiting", "overprocessing"]
+    registry.shutdown()
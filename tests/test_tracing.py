@@ -0,0 +1,85 @@
+"""Tests for latency instrumentation and trace sinks."""
+import json
+
+import pytest
+
+from app import tracing
+from app.tools.waste_detector import WasteDetector
+
+
+@pytest.fixture
+def restore_tracer():
+    yield
+    tracing.configure_tracing(None)
+
+
+def test_histogram_percentiles_are_close():
+    histogram = tracing.LatencyHistogram()
+    for millis in range(1, 101):
+        histogram.record(millis / 1000)
+
+    assert histogram.count == 100
+    assert histogram.percentile(50) == pytest.approx(0.050, rel=0.05)
+    assert histogram.percentile(99) == pytest.approx(0.099, rel=0.05)
+    assert histogram.percentile(100) == pytest.approx(0.100)
+
+
+def test_tool_runs_are_recorded_and_exported(tmp_path, restore_tracer):
+    path = tmp_path / "spans.jsonl"
+    tracer = tracing.configure_tracing(f"jsonl://{path}")
+    WasteDetector().run({"process_description": "Parts wait in a queue."})
+    tracer.close()
+
+    (line,) = path.read_text().splitlines()
+    record = json.loads(line)
+    assert (record["kind"], record["name"]) == ("tool", "waste_detector")
+    assert record["input_bytes"] > 0 and record["output_bytes"] > 0
+    assert tracer.snapshot()["tool.waste_detector"]["count"] == 1
+
+
+def test_otlp_sink_and_traced_wrapper(tmp_path, restore_tracer):
+    path = tmp_path / "spans.otlp.jsonl"
+    tracer = tracing.configure_tracing(f"otlp-file://{path}")
+    node = tracing.traced("node", "planner", lambda state: state)
+    node({"user_goal": "x"})
+    tracer.close()
+
+    span = json.loads(path.read_text())["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert span["name"] == "node.planner"
+
+
+def test_disabled_tracer_records_nothing(restore_tracer):
+    tracer = tracing.configure_tracing(None)
+    WasteDetector().run({"process_description": "Parts wait in a queue."})
+    assert not tracer.enabled
+    assert tracer.snapshot() == {}
+
+
+def test_cli_configures_tracing_from_the_environment(tmp_path):
+    import os
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    narrative = tmp_path / "process.txt"
+    narrative.write_text("Orders wait in a queue.")
+    root = Path(__file__).resolve().parents[1]
+
+    def cli(endpoint):
+        return subprocess.run(
+            [sys.executable, "main.py", "--file", str(narrative)],
+            cwd=root,
+            env={**os.environ, "TRACING_ENDPOINT": endpoint},
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+
+    spans = tmp_path / "spans.jsonl"
+    completed = cli(f"jsonl://{spans}")
+    assert completed.returncode == 0 and "queue" in completed.stdout
+    assert spans.exists()
+
+    rejected = cli("carrier-pigeon://coop")
+    assert rejected.returncode == 2
+    assert "invalid TRACING_ENDPOINT" in rejected.stderr and "Traceback" not in rejected.stderr
@@ -21,3 +21,41 @@ def test_handles_no_waste_case():
     output = tool.run({"process_description": "The automated pipeline runs smoothly."})
     assert output["wastes"] == []
     assert "no obvious wastes" in output["summary"].lower()
+
+
+def test_ignores_keywords_inside_other_words():
+    tool = WasteDetector()
+    output = tool.run({"process_description": "Engineers spend the afternoon debugging."})
+    assert output["wastes"] == []
+
+
+def test_run_file_streams_same_result(tmp_path):
+    text = "Parts wait in the warehouse queue before rework. " * 50
+    path = tmp_path / "process.txt"
+    path.write_text(text)
+
+    tool = WasteDetector()
+    assert tool.run_file(path, chunk_size=16) == tool.run({"process_description": text})
+
+
+def test_iter_run_yields_final_insights_with_offsets():
+    tool = WasteDetector()
+    text = "Every transport, move, shipment and handoff adds delay before rework."
+    insights = tool.iter_run({"process_description": text})
+
+    # Transportation is final once its last keyword is seen, before the scan ends.
+    first = next(insights)
+    assert first.category == "transportation"
+    assert [text[span.start : span.end] for span in first.spans] == ["transport", "move", "shipment", "handoff"]
+    assert [insight.category for insight in insights] == ["waiting", "overprocessing"]
+    assert insights.result() == tool.run({"process_description": text})
+
+
+def test_iter_file_matches_run_file(tmp_path):
+    path = tmp_path / "process.txt"
+    path.write_text("Parts wait in the warehouse queue before rework. " * 50)
+
+    tool = WasteDetector()
+    insights = tool.iter_file(path, chunk_size=16)
+    assert {insight.category for insight in insights} == {"inventory", "waiting", "overprocessing"}
+    assert insights.result() == tool.run_file(path, chunk_size=16)